@@ -0,0 +1,104 @@
+"""
+Request dependencies for Homlo API
+Database sessions routed between the primary and read replicas per caller,
+with read-your-writes pinning
+"""
+
+from typing import AsyncGenerator, Optional
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import TRACK_WRITES, AsyncSessionLocal, engine, replicas
+from app.core.rate_limit import get_client_identity
+from app.core.redis import get_cache, set_cache
+
+PIN_KEY = "db:pin:{identity}"
+
+
+class PrimarySession(AsyncSession):
+    """Primary session that pins its caller to the primary once it commits a write
+
+    The pin is awaited as part of commit, so it has landed before the
+    endpoint can respond and the caller's next read is routed.
+    """
+
+    async def commit(self) -> None:
+        await super().commit()
+        await pin_written_session(self)
+
+
+PrimarySessionLocal = async_sessionmaker(
+    engine,
+    class_=PrimarySession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+    info={TRACK_WRITES: True},
+)
+
+
+async def pin_to_primary(identity: str) -> None:
+    """Route identity's reads to the primary for the read-your-writes window"""
+    await set_cache(
+        PIN_KEY.format(identity=identity),
+        1,
+        expire=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+        local_ttl=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+    )
+
+
+async def is_pinned_to_primary(identity: str) -> bool:
+    """Whether identity wrote recently enough that replicas may not have it yet"""
+    return await get_cache(PIN_KEY.format(identity=identity)) is not None
+
+
+async def pin_written_session(session: AsyncSession) -> None:
+    """Pin the session's caller if it committed a write since the last pin"""
+    identity = session.info.get("identity")
+    if session.info.pop("committed_writes", False) and identity and replicas.replicas:
+        await pin_to_primary(identity)
+
+
+def _identity(request: Optional[Request]) -> Optional[str]:
+    return get_client_identity(request.scope) if request is not None else None
+
+
+async def get_db(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get a primary database session"""
+    async with PrimarySessionLocal() as session:
+        session.info["identity"] = _identity(request)
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            # Writes committed without AsyncSession.commit, e.g. through
+            # ``async with session.begin()``
+            await pin_written_session(session)
+            await session.close()
+
+
+async def get_read_db(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get a read-only database session
+
+    Routed round-robin to a read replica within the staleness bound, falling
+    back to the primary when no replica qualifies or the caller wrote within
+    the read-your-writes window.
+    """
+    session_factory = None
+    if replicas.replicas:
+        identity = _identity(request)
+        if identity is None or not await is_pinned_to_primary(identity):
+            session_factory = replicas.choose()
+
+    async with (session_factory or AsyncSessionLocal)() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
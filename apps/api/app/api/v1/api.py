@@ -0,0 +1,10 @@
+"""
+API v1 router for Homlo API
+"""
+
+from fastapi import APIRouter
+
+from app.api.v1.endpoints import search
+
+api_router = APIRouter()
+api_router.include_router(search.router, prefix="/search", tags=["search"])
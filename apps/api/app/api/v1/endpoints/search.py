@@ -0,0 +1,56 @@
+"""
+Search endpoints for Homlo API
+"""
+
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_read_db
+from app.services.places import TRIE_TOP_K
+from app.services.search import search_listings, typeahead
+
+router = APIRouter()
+
+
+@router.get("/listings")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    city: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000),
+    check_in: Optional[date] = None,
+    check_out: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Full-text listing search, best match first
+
+    With ``check_in`` and ``check_out`` each result is priced for the stay.
+    """
+    if (check_in is None) != (check_out is None):
+        raise HTTPException(422, "check_in and check_out must be given together")
+    if check_in and check_out <= check_in:
+        raise HTTPException(422, "check_out must be after check_in")
+    return {
+        "results": await search_listings(
+            db,
+            q,
+            city=city,
+            limit=limit,
+            offset=offset,
+            check_in=check_in,
+            check_out=check_out,
+        )
+    }
+
+
+@router.get("/typeahead")
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=TRIE_TOP_K),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Cities, areas and listing titles for a partly typed search"""
+    return await typeahead(db, q, limit)
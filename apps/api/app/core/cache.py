@@ -0,0 +1,85 @@
+"""
+In-process cache layer for Homlo API
+Bounded TTL/LRU cache that sits in front of the Redis cache helpers
+"""
+
+import fnmatch
+import time
+from collections import OrderedDict
+from typing import Any, List, Tuple
+
+from prometheus_client import Counter
+
+from app.core.config import settings
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by tier and result",
+    ["tier", "result"],
+)
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Bounded per-worker TTL/LRU cache
+
+    Values are stored as decoded Python objects and shared between callers,
+    so anything returned from here must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a live entry, refreshing its LRU position"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        """Store value for ttl seconds, evicting the least recently used entry"""
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        """Drop a single entry"""
+        return self._entries.pop(key, _MISSING) is not _MISSING
+
+    def delete_pattern(self, pattern: str) -> int:
+        """Drop entries matching a glob-style pattern"""
+        keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def hottest(self, limit: int) -> List[Tuple[str, float]]:
+        """Most recently used live keys with their remaining TTL in seconds"""
+        now = time.monotonic()
+        hot = []
+        for key, (expires_at, _) in reversed(self._entries.items()):
+            if len(hot) >= limit:
+                break
+            if expires_at > now:
+                hot.append((key, expires_at - now))
+        return hot
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Local cache instance shared by the Redis cache helpers
+local_cache = LocalCache(settings.CACHE_L1_MAX_ENTRIES)
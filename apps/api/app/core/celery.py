@@ -2,10 +2,16 @@
 Celery configuration for background tasks
 """
 
-import os
+import logging
+from datetime import datetime
+
 from celery import Celery
+
+from app.core import celery_metrics
 from app.core.config import settings
 
+logger = logging.getLogger("app.celery")
+
 # Create Celery app
 celery_app = Celery(
     "homlo",
@@ -17,7 +23,7 @@ celery_app = Celery(
         "app.tasks.sms_tasks",
         "app.tasks.booking_tasks",
         "app.tasks.cleanup_tasks",
-    ]
+    ],
 )
 
 # Celery configuration
@@ -26,31 +32,28 @@ celery_app.conf.update(
     task_routes={
         "app.tasks.image_processing.*": {"queue": "images"},
         "app.tasks.email_tasks.*": {"queue": "emails"},
+        # Exact names are matched before patterns: OTPs skip the bulk SMS backlog
+        "app.tasks.sms_tasks.send_otp_sms": {"queue": "otp"},
         "app.tasks.sms_tasks.*": {"queue": "sms"},
         "app.tasks.booking_tasks.*": {"queue": "bookings"},
         "app.tasks.cleanup_tasks.*": {"queue": "cleanup"},
     },
-    
     # Task serialization
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
     timezone=settings.TIMEZONE,
     enable_utc=True,
-    
     # Worker configuration
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
     worker_disable_rate_limits=False,
-    
     # Task execution
     task_always_eager=settings.DEBUG,  # Execute tasks synchronously in debug mode
     task_eager_propagates=True,
-    
     # Result backend
     result_expires=3600,  # 1 hour
     result_persistent=True,
-    
     # Beat schedule (for periodic tasks)
     beat_schedule={
         "cleanup-expired-sessions": {
@@ -69,32 +72,29 @@ celery_app.conf.update(
             "task": "app.tasks.booking_tasks.process_payouts",
             "schedule": 3600.0,  # Every hour
         },
+        "trim-availability-index": {
+            "task": "app.tasks.booking_tasks.trim_availability_index",
+            "schedule": 86400.0,  # Every day
+        },
     },
-    
     # Task time limits
     task_soft_time_limit=300,  # 5 minutes
     task_time_limit=600,  # 10 minutes
-    
     # Worker time limits
     worker_send_task_events=True,
     task_send_sent_event=True,
-    
     # Monitoring
     worker_state_db="worker_state.db",
-    
     # Error handling
     task_reject_on_worker_lost=True,
     task_acks_late=True,
-    
     # Queue configuration
     task_default_queue="default",
     task_default_exchange="default",
     task_default_routing_key="default",
-    
     # Redis specific settings
     broker_connection_retry_on_startup=True,
     broker_connection_max_retries=10,
-    
     # Result backend settings
     result_backend_transport_options={
         "master_name": "mymaster",
@@ -105,16 +105,16 @@ celery_app.conf.update(
 # Task annotations for specific tasks
 celery_app.conf.task_annotations = {
     "app.tasks.image_processing.process_listing_images": {
-        "rate_limit": "10/m",  # 10 per minute
-        "time_limit": 300,     # 5 minutes
+        # No rate limit: throughput is bounded by the worker's process pool
+        "time_limit": 300,  # 5 minutes
     },
     "app.tasks.email_tasks.send_bulk_emails": {
         "rate_limit": "100/m",  # 100 per minute
-        "time_limit": 600,      # 10 minutes
+        "time_limit": 600,  # 10 minutes
     },
     "app.tasks.sms_tasks.send_bulk_sms": {
-        "rate_limit": "50/m",   # 50 per minute
-        "time_limit": 300,      # 5 minutes
+        "rate_limit": "50/m",  # 50 per minute
+        "time_limit": 300,  # 5 minutes
     },
 }
 
@@ -132,31 +132,31 @@ if settings.ENVIRONMENT == "production":
 # Task base class with common functionality
 class HomloTask(celery_app.Task):
     """Base task class with common functionality"""
-    
+
     abstract = True
-    
+
     def on_success(self, retval, task_id, args, kwargs):
         """Task success callback"""
         super().on_success(retval, task_id, args, kwargs)
-        # Log success
-        print(f"Task {task_id} completed successfully")
-    
+        logger.debug(f"Task {self.name}[{task_id}] succeeded")
+
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         """Task failure callback"""
         super().on_failure(exc, task_id, args, kwargs, einfo)
-        # Log failure
-        print(f"Task {task_id} failed: {exc}")
-    
+        logger.error(f"Task {self.name}[{task_id}] failed: {exc!r}")
+
     def on_retry(self, exc, task_id, args, kwargs, einfo):
         """Task retry callback"""
         super().on_retry(exc, task_id, args, kwargs, einfo)
-        # Log retry
-        print(f"Task {task_id} retrying: {exc}")
+        logger.warning(f"Task {self.name}[{task_id}] retrying: {exc!r}")
 
 
 # Register the base task class
 celery_app.Task = HomloTask
 
+# Task and queue metrics, served by each worker on CELERY_METRICS_PORT
+celery_metrics.install(celery_app)
+
 
 # Health check task
 @celery_app.task(bind=True, base=HomloTask)
@@ -184,33 +184,10 @@ def test_task(self, message: str = "Hello from Celery!"):
 @celery_app.task(bind=True, base=HomloTask)
 def monitor_task_queue(self):
     """Monitor task queue status"""
-    from app.core.redis import get_redis
-    import asyncio
-    
-    async def get_queue_info():
-        redis_client = await get_redis()
-        # Get queue lengths
-        queues = ["default", "images", "emails", "sms", "bookings", "cleanup"]
-        queue_info = {}
-        
-        for queue in queues:
-            length = await redis_client.llen(f"celery:{queue}")
-            queue_info[queue] = length
-        
-        return queue_info
-    
-    # Run async function
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        queue_info = loop.run_until_complete(get_queue_info())
-    finally:
-        loop.close()
-    
     return {
-        "queue_info": queue_info,
+        "queue_info": celery_metrics.queue_depth_sampler.sample(max_age=0),
         "worker": self.request.hostname,
-        "timestamp": self.request.utcnow().isoformat(),
+        "timestamp": datetime.utcnow().isoformat(),
     }
 
 
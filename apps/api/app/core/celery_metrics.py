@@ -0,0 +1,259 @@
+"""
+Celery worker metrics for Homlo API
+Task runtime, queue wait, retries and failures from Celery signals, plus
+broker queue depth and prefetch saturation sampled at scrape time
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import redis
+from celery import signals
+from celery.worker import state as worker_state
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.celery")
+
+CELERY_TASK_RUNTIME = Histogram(
+    "celery_task_runtime_seconds",
+    "Task execution time",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+CELERY_TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Time from publishing a task (or its ETA) to a worker starting it",
+    ["task", "queue"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+CELERY_TASK_RETRIES = Counter(
+    "celery_task_retries_total",
+    "Task retries",
+    ["task"],
+)
+CELERY_TASK_FAILURES = Counter(
+    "celery_task_failures_total",
+    "Tasks that raised",
+    ["task", "exception"],
+)
+
+# Message header holding the publish time, set by the producer
+PUBLISHED_AT_HEADER = "published_at"
+
+# Start times of the tasks running in this process
+_started: Dict[str, float] = {}
+
+# Consumer of this worker, set once it is ready (main process only)
+_consumer = None
+
+queue_depth_sampler: Optional["QueueDepthSampler"] = None
+
+
+def task_queues(app) -> List[str]:
+    """Every queue the app routes tasks to"""
+    queues = {
+        route["queue"] for route in app.conf.task_routes.values() if "queue" in route
+    }
+    queues.add(app.conf.task_default_queue)
+    return sorted(queues)
+
+
+class QueueDepthSampler:
+    """Pipelined LLEN over every queue and priority list, cached briefly
+
+    Scrapes from several Prometheus servers within ``max_age`` share one
+    sample, so the broker sees one round trip per interval.
+    """
+
+    def __init__(self, app, max_age: float):
+        self.app = app
+        self.max_age = max_age
+        self._client: Optional[redis.Redis] = None
+        self._lock = threading.Lock()
+        self._sampled_at = 0.0
+        self._depths: Dict[str, int] = {}
+
+    def _keys(self, queue: str) -> List[str]:
+        # Same key layout as kombu's Redis transport
+        options = self.app.conf.broker_transport_options or {}
+        prefix = options.get("global_keyprefix", "")
+        sep = options.get("sep", "\x06\x16")
+        steps = options.get("priority_steps", [0, 3, 6, 9])
+        return [
+            f"{prefix}{queue}{sep}{step}" if step else f"{prefix}{queue}"
+            for step in steps
+        ]
+
+    def sample(self, max_age: Optional[float] = None) -> Dict[str, int]:
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            if time.monotonic() - self._sampled_at < max_age:
+                return self._depths
+
+            if self._client is None:
+                self._client = redis.Redis.from_url(
+                    self.app.conf.broker_url, socket_timeout=5
+                )
+            queues = task_queues(self.app)
+            keys = {queue: self._keys(queue) for queue in queues}
+            pipe = self._client.pipeline(transaction=False)
+            for queue in queues:
+                for key in keys[queue]:
+                    pipe.llen(key)
+            lengths = iter(pipe.execute())
+
+            self._depths = {
+                queue: sum(next(lengths) for _ in keys[queue]) for queue in queues
+            }
+            self._sampled_at = time.monotonic()
+            return self._depths
+
+
+class WorkerCollector:
+    """Queue depth and prefetch state, read when the worker is scraped"""
+
+    def __init__(self, sampler: QueueDepthSampler):
+        self.sampler = sampler
+
+    def collect(self):
+        depth = GaugeMetricFamily(
+            "celery_queue_depth",
+            "Messages waiting in each broker queue",
+            labels=["queue"],
+        )
+        try:
+            for queue, length in self.sampler.sample().items():
+                depth.add_metric([queue], length)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to sample queue depth: {e}")
+        yield depth
+
+        if _consumer is None:
+            return
+        reserved = len(worker_state.reserved_requests)
+        active = len(worker_state.active_requests)
+        limit = _consumer.qos.value if _consumer.qos is not None else 0
+        yield GaugeMetricFamily(
+            "celery_worker_active_tasks",
+            "Tasks being executed by this worker",
+            value=active,
+        )
+        yield GaugeMetricFamily(
+            "celery_worker_prefetched_tasks",
+            "Tasks reserved by this worker but not started yet",
+            value=reserved - active,
+        )
+        yield GaugeMetricFamily(
+            "celery_worker_prefetch_limit",
+            "Tasks this worker may reserve at once",
+            value=limit,
+        )
+        yield GaugeMetricFamily(
+            "celery_worker_prefetch_saturation",
+            "Reserved tasks as a share of the prefetch limit (1 means the worker takes no more)",
+            value=reserved / limit if limit else 0.0,
+        )
+
+
+def _eta_timestamp(eta) -> float:
+    if isinstance(eta, str):
+        eta = datetime.fromisoformat(eta)
+    return eta.timestamp()
+
+
+def _task_name(task, sender=None) -> str:
+    return getattr(task, "name", None) or getattr(sender, "name", None) or "unknown"
+
+
+def install(app) -> None:
+    """Connect the metric signal handlers for ``app``"""
+    global queue_depth_sampler
+    queue_depth_sampler = sampler = QueueDepthSampler(
+        app, settings.CELERY_QUEUE_SAMPLE_INTERVAL
+    )
+
+    @signals.before_task_publish.connect(weak=False)
+    def stamp_published_at(headers=None, **kwargs):
+        if headers is not None:
+            headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+    @signals.task_prerun.connect(weak=False)
+    def task_started(task_id=None, task=None, **kwargs):
+        _started[task_id] = time.perf_counter()
+        request = task.request
+        published_at = request.get(PUBLISHED_AT_HEADER)
+        if published_at is None:
+            return
+        if request.eta:
+            # Time spent waiting for the ETA is not queueing delay
+            try:
+                published_at = max(published_at, _eta_timestamp(request.eta))
+            except ValueError:
+                pass
+        queue = (request.delivery_info or {}).get("routing_key") or "unknown"
+        CELERY_TASK_QUEUE_WAIT.labels(task=task.name, queue=queue).observe(
+            max(0.0, time.time() - published_at)
+        )
+
+    @signals.task_postrun.connect(weak=False)
+    def task_finished(task_id=None, task=None, state=None, **kwargs):
+        started = _started.pop(task_id, None)
+        if started is not None:
+            CELERY_TASK_RUNTIME.labels(
+                task=_task_name(task), state=state or "UNKNOWN"
+            ).observe(time.perf_counter() - started)
+
+    @signals.task_retry.connect(weak=False)
+    def task_retried(sender=None, request=None, **kwargs):
+        CELERY_TASK_RETRIES.labels(task=_task_name(sender)).inc()
+
+    @signals.task_failure.connect(weak=False)
+    def task_failed(sender=None, exception=None, **kwargs):
+        CELERY_TASK_FAILURES.labels(
+            task=_task_name(sender), exception=type(exception).__name__
+        ).inc()
+
+    @signals.worker_ready.connect(weak=False)
+    def serve_metrics(sender=None, **kwargs):
+        global _consumer
+        _consumer = sender
+        if settings.CELERY_METRICS_PORT:
+            start_metrics_server(settings.CELERY_METRICS_PORT, WorkerCollector(sampler))
+
+    @signals.worker_process_shutdown.connect(weak=False)
+    def mark_process_dead(pid=None, **kwargs):
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            from prometheus_client import multiprocess
+
+            multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def start_metrics_server(port: int, collector: WorkerCollector) -> None:
+    """Serve this worker's metrics, including its pool processes'
+
+    Prefork children record into PROMETHEUS_MULTIPROC_DIR when it is set,
+    and the main process aggregates their files on each scrape.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    registry.register(collector)
+    start_http_server(port, registry=registry)
+    logger.info(f"Serving worker metrics on port {port}")
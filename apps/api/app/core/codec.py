@@ -0,0 +1,150 @@
+"""
+Cache value codec for Homlo API
+Serializes values for the Redis cache helpers behind a small header that
+records the format, so serializers and compression can change without
+invalidating what is already cached
+"""
+
+import json
+import zlib
+from typing import Any, Callable, Dict, NamedTuple
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Header: marker, header version, then the serializer id in the low nibble
+# and the compression id in the high one. 0xFF never occurs in UTF-8, so
+# values written as plain text before the header existed are told apart.
+MARKER = 0xFF
+HEADER_VERSION = 1
+HEADER_SIZE = 3
+
+
+class CodecError(ValueError):
+    """A cached value this worker cannot decode"""
+
+
+class Format(NamedTuple):
+    id: int
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        # Non-string keys are stringified as json.dumps does
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _json_loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+# Values that are already str or bytes are stored as they are
+_TEXT = Format(1, lambda value: value.encode(), lambda raw: raw.decode())
+_BYTES = Format(2, bytes, bytes)
+
+SERIALIZERS: Dict[str, Format] = {
+    "json": Format(3, _json_dumps, _json_loads),
+}
+if msgpack is not None:
+    SERIALIZERS["msgpack"] = Format(
+        4,
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda raw: msgpack.unpackb(raw, raw=False, strict_map_key=False),
+    )
+
+COMPRESSORS: Dict[str, Format] = {
+    # Level 1: cached pages are mostly repeated keys, which the fastest
+    # level already removes
+    "zlib": Format(1, lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+if lz4_frame is not None:
+    COMPRESSORS["lz4"] = Format(2, lz4_frame.compress, lz4_frame.decompress)
+
+_SERIALIZERS_BY_ID = {fmt.id: fmt for fmt in (_TEXT, _BYTES, *SERIALIZERS.values())}
+_COMPRESSORS_BY_ID = {fmt.id: fmt for fmt in COMPRESSORS.values()}
+
+
+class CacheCodec:
+    """Encodes values with one serializer and optional compression
+
+    Decoding follows each value's header, so anything written by another
+    configuration (or version) of the codec that this worker knows stays
+    readable.
+    """
+
+    def __init__(
+        self, serializer: str = "json", compression: str = "zlib", threshold: int = 1024
+    ):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown or unavailable cache serializer: {serializer}")
+        if compression != "none" and compression not in COMPRESSORS:
+            raise ValueError(f"Unknown or unavailable cache compression: {compression}")
+        self.serializer = SERIALIZERS[serializer]
+        self.compressor = COMPRESSORS.get(compression)
+        self.threshold = threshold
+
+    def encode(self, value: Any) -> bytes:
+        if isinstance(value, str):
+            serializer = _TEXT
+        elif isinstance(value, (bytes, bytearray)):
+            serializer = _BYTES
+        else:
+            serializer = self.serializer
+        data = serializer.dumps(value)
+        compression = 0
+        if self.compressor is not None and len(data) >= self.threshold:
+            compressed = self.compressor.dumps(data)
+            # Already compact data (images, ids) is kept as it is
+            if len(compressed) < len(data):
+                data, compression = compressed, self.compressor.id
+        return bytes((MARKER, HEADER_VERSION, compression << 4 | serializer.id)) + data
+
+    def decode(self, raw: bytes) -> Any:
+        if not raw or raw[0] != MARKER:
+            return _decode_plain(raw)
+        if len(raw) < HEADER_SIZE or raw[1] != HEADER_VERSION:
+            raise CodecError(
+                f"Unknown cache header version {raw[1] if len(raw) > 1 else None}"
+            )
+        serializer = _SERIALIZERS_BY_ID.get(raw[2] & 0x0F)
+        compression = raw[2] >> 4
+        compressor = _COMPRESSORS_BY_ID.get(compression)
+        if serializer is None or (compression and compressor is None):
+            raise CodecError(f"Unknown cache format {raw[2]:#04x}")
+        data = memoryview(raw)[HEADER_SIZE:]
+        data = compressor.loads(data) if compressor is not None else bytes(data)
+        return serializer.loads(data)
+
+
+def _decode_plain(raw: bytes) -> Any:
+    """Values written before the header: JSON, or else plain text"""
+    text = raw.decode()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+# Codec used by the Redis cache helpers
+cache_codec = CacheCodec(
+    settings.CACHE_SERIALIZER,
+    settings.CACHE_COMPRESSION,
+    settings.CACHE_COMPRESSION_THRESHOLD,
+)
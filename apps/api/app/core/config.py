@@ -4,46 +4,91 @@ Configuration settings for Homlo API
 
 import os
 from typing import List, Optional
-from pydantic import BaseSettings, validator
+
+from pydantic import validator
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     """Application settings"""
-    
+
     # Application
     APP_NAME: str = "Homlo API"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = False
     ENVIRONMENT: str = "development"
-    
+    WEB_APP_URL: str = "https://homlo.pk"
+
     # Database
     DATABASE_URL: str
     DATABASE_TEST_URL: Optional[str] = None
-    
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT: int = 30
+    DATABASE_POOL_RECYCLE: int = 1800
+    # Pre-ping costs a round trip on every checkout. Without it, connections
+    # older than DATABASE_POOL_RECYCLE are replaced, and a disconnect error
+    # invalidates the whole pool so only the request that hit it fails.
+    DATABASE_POOL_PRE_PING: bool = False
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100
+    DATABASE_POOL_PREFILL: int = 0  # connections to open at startup
+    DATABASE_REPLICA_URLS: List[str] = []
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DATABASE_REPLICA_LAG_CHECK_INTERVAL: float = 5.0
+    DATABASE_READ_YOUR_WRITES_SECONDS: int = 10
+
     # JWT
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
-    
+
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     REDIS_TEST_URL: Optional[str] = None
-    
+
+    # Cache
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    CACHE_SERIALIZER: str = "json"  # or "msgpack" when installed
+    CACHE_COMPRESSION: str = "zlib"  # "lz4" when installed, or "none"
+    CACHE_COMPRESSION_THRESHOLD: int = 1024  # bytes
+    CACHE_WARM_KEYS: int = 500  # hottest local cache keys new workers load
+    CACHE_WARM_SNAPSHOT_INTERVAL: float = 60.0  # seconds
+
+    # Sessions
+    SESSION_TTL: int = 86400  # idle timeout, extended as the session is used
+    SESSION_MAX_AGE: int = 30 * 86400
+    SESSION_REFRESH_INTERVAL: int = 300  # how often use extends the idle timeout
+    SESSION_LOCAL_TTL: int = 5  # seconds a worker may answer from its local copy
+
     # MinIO
     MINIO_ROOT_USER: str = "homlo"
     MINIO_ROOT_PASSWORD: str = "homlo123"
     MINIO_ENDPOINT: str = "localhost:9000"
     MINIO_BUCKET_NAME: str = "homlo-assets"
     MINIO_SECURE: bool = False
-    
+
     # SMS
     SMS_PROVIDER: str = "twilio"
     SMS_ACCOUNT_SID: Optional[str] = None
     SMS_AUTH_TOKEN: Optional[str] = None
     SMS_FROM_NUMBER: Optional[str] = None
-    
+    SMS_API_URL: Optional[
+        str
+    ] = None  # overrides the provider's base URL, e.g. a fake provider
+    SMS_CONCURRENCY: int = 0  # concurrent provider calls, 0 uses the provider's default
+    SMS_PRIORITY_RESERVED: int = 2  # provider slots only OTP sends may use
+    SMS_SLOT_LEASE_SECONDS: int = (
+        30  # a crashed worker's provider slots free up after this
+    )
+    SMS_BATCH_SIZE: int = 100  # recipients per call for providers with batch sends
+    SMS_TIMEOUT: float = 10.0
+    SMS_MAX_RETRIES: int = 3
+    SMS_RETRY_BASE_DELAY: float = 0.2
+    SMS_RETRY_MAX_DELAY: float = 5.0
+
     # Email
     SMTP_HOST: str = "localhost"
     SMTP_PORT: int = 1025
@@ -51,70 +96,142 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: Optional[str] = None
     SMTP_TLS: bool = False
     SMTP_FROM_EMAIL: str = "noreply@homlo.pk"
-    
+    SMTP_TIMEOUT: float = 10.0
+    SMTP_RECONNECT_ATTEMPTS: int = 3
+    EMAIL_BULK_CONCURRENCY: int = 100  # messages rendered ahead of the senders
+    EMAIL_BULK_CONNECTIONS: int = 1
+
     # Payment Gateways
     EASYPAISA_API_KEY: Optional[str] = None
     EASYPAISA_API_SECRET: Optional[str] = None
     EASYPAISA_SANDBOX: bool = True
-    
+
     JAZZCASH_API_KEY: Optional[str] = None
     JAZZCASH_API_SECRET: Optional[str] = None
     JAZZCASH_SANDBOX: bool = True
-    
+
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
     CORS_ALLOW_CREDENTIALS: bool = True
-    
+
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     RATE_LIMIT_PER_HOUR: int = 1000
-    
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_EXEMPT_PATHS: List[str] = ["/healthz", "/readyz", "/metrics"]
+    RATE_LIMIT_TRUSTED_PROXIES: List[
+        str
+    ] = []  # IPs or CIDRs whose X-Forwarded-For is honoured
+
+    # Availability index
+    AVAILABILITY_WINDOW_DAYS: int = 548  # about 18 months ahead
+
+    # Geo index
+    GEO_INDEX_ENABLED: bool = True
+    GEO_INDEX_CHANNEL: str = "listings:geo"
+
+    # Price quotes
+    QUOTE_CACHE_TTL: int = 3600
+
+    # Search
+    TYPEAHEAD_CACHE_TTL: int = 60
+
+    # Startup
+    STARTUP_WARMUP_TIMEOUT: float = 30.0  # seconds per warmup step
+
+    # Booking admission
+    BOOKING_LEASE_TTL_MS: int = 5000
+    BOOKING_LEASE_WAIT_SECONDS: float = 2.0
+    BOOKING_INTERVAL_CACHE_TTL: int = 30
+
+    # Chat history
+    CHAT_HISTORY_SIZE: int = 200  # newest messages cached per thread
+    CHAT_HISTORY_TTL: int = 7 * 86400
+    CHAT_RECEIPT_FLUSH_INTERVAL: float = 2.0
+
+    # WebSocket presence
+    # How often a worker refreshes its sockets' presence
+    WS_HEARTBEAT_INTERVAL: float = 15.0
+    WS_PRESENCE_TIMEOUT: float = 45.0  # sockets not seen for this long are stale
+    WS_SWEEP_INTERVAL: float = 30.0
+    WS_SWEEP_BATCH_SIZE: int = 500
+    # A socket that cannot take a message in time, or falls this many
+    # messages behind, is closed rather than delaying the rest
+    WS_SEND_TIMEOUT: float = 5.0
+    WS_SEND_QUEUE_SIZE: int = 100
+
+    # Scheduled booking jobs
+    BOOKING_JOB_CHUNK_SIZE: int = 500
+    BOOKING_JOB_MAX_CHUNKS: int = 200  # per run, the rest waits for the next run
+    BOOKING_REMINDER_LEAD_DAYS: int = 1
+    PAYOUT_DELAY_DAYS: int = 1  # after check-in
+    PAYOUT_LOOKBACK_DAYS: int = 7  # rescanned every run for late payments
+    PAYOUT_HOST_FEE_PERCENT: float = 3.0
+
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png", "image/webp"]
     ALLOWED_DOCUMENT_TYPES: List[str] = ["application/pdf", "image/jpeg", "image/png"]
-    
+
+    # Image processing
+    IMAGE_PROCESS_WORKERS: int = 0  # 0 uses every core
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_WEBP_METHOD: int = 2  # 0 (fastest) to 6 (smallest)
+
     # Security
     SECURE_COOKIES: bool = False
     SESSION_COOKIE_SECURE: bool = False
     SESSION_COOKIE_HTTPONLY: bool = True
     SESSION_COOKIE_SAMESITE: str = "lax"
-    
+
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "json"
-    
+    LOG_QUEUE_ENABLED: bool = True
+    LOG_QUEUE_MAX_SIZE: int = 10000
+    LOG_QUEUE_FULL_POLICY: str = "drop"  # drop or block
+    LOG_ACCESS_SAMPLE_RATE: float = 1.0
+
     # Timezone
     TIMEZONE: str = "Asia/Karachi"
-    
+
     # Celery
     CELERY_BROKER_URL: Optional[str] = None
     CELERY_RESULT_BACKEND: Optional[str] = None
-    
+    CELERY_METRICS_PORT: int = 9808  # per worker, 0 disables
+    CELERY_QUEUE_SAMPLE_INTERVAL: float = 5.0
+
     @validator("CELERY_BROKER_URL", pre=True, always=True)
     def set_celery_broker_url(cls, v, values):
         if v is None:
             return values.get("REDIS_URL")
         return v
-    
+
     @validator("CELERY_RESULT_BACKEND", pre=True, always=True)
     def set_celery_result_backend(cls, v, values):
         if v is None:
             return values.get("REDIS_URL")
         return v
-    
+
     @validator("CORS_ORIGINS", pre=True)
     def parse_cors_origins(cls, v):
         if isinstance(v, str):
             return [i.strip() for i in v.split(",")]
         return v
-    
-    @validator("ALLOWED_IMAGE_TYPES", "ALLOWED_DOCUMENT_TYPES", pre=True)
+
+    @validator(
+        "ALLOWED_IMAGE_TYPES",
+        "ALLOWED_DOCUMENT_TYPES",
+        "RATE_LIMIT_EXEMPT_PATHS",
+        "RATE_LIMIT_TRUSTED_PROXIES",
+        "DATABASE_REPLICA_URLS",
+        pre=True,
+    )
     def parse_list_types(cls, v):
         if isinstance(v, str):
-            return [i.strip() for i in v.split(",")]
+            return [i.strip() for i in v.split(",") if i.strip()]
         return v
-    
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -127,8 +244,10 @@ settings = Settings()
 
 # Development overrides
 if settings.DEBUG:
-    settings.CORS_ORIGINS.extend([
-        "http://localhost:3001",
-        "http://127.0.0.1:3000",
-        "http://127.0.0.1:3001",
-    ])
+    settings.CORS_ORIGINS.extend(
+        [
+            "http://localhost:3001",
+            "http://127.0.0.1:3000",
+            "http://127.0.0.1:3001",
+        ]
+    )
@@ -3,29 +3,115 @@ Database configuration and session management
 """
 
 import asyncio
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import itertools
+import re
+import time
+from typing import AsyncGenerator, List, Optional, Sequence, Tuple
+
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import MetaData, event, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.pool import NullPool
-from sqlalchemy import MetaData
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from app.core.config import settings
 
+# Connection pool metrics
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured database connection pool size")
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Database connections currently checked out"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Database connections open beyond the pool size"
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check out a database connection",
+    buckets=(
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+    ),
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Replication lag of each read replica", ["replica"]
+)
+
+# Replication lag in seconds; 0 when the replica has replayed everything it received
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long checkouts wait for a connection"""
+
+    def _do_get(self):
+        start_time = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start_time)
+
+
 # Database URL conversion for async
-def get_async_database_url() -> str:
-    """Convert PostgreSQL URL to async format"""
-    if settings.DATABASE_URL.startswith("postgresql://"):
-        return settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
-    return settings.DATABASE_URL
+def to_async_url(url: str) -> str:
+    """Convert a PostgreSQL URL to the asyncpg dialect"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def get_connect_args(url: str) -> dict:
+    """Driver-specific connection arguments"""
+    if url.startswith("postgresql+asyncpg://"):
+        return {"statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE}
+    return {}
+
+
+def create_pooled_engine(url: str) -> AsyncEngine:
+    """Create an async engine using the configured connection pool"""
+    return create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        connect_args=get_connect_args(url),
+    )
+
 
 # Create async engine
-engine = create_async_engine(
-    get_async_database_url(),
-    echo=settings.DEBUG,
-    poolclass=NullPool if settings.DEBUG else None,
-    pool_pre_ping=True,
-    pool_recycle=300,
-)
+engine = create_pooled_engine(to_async_url(settings.DATABASE_URL))
+
+# Pool gauges are read from the pool at scrape time
+DB_POOL_SIZE.set_function(lambda: engine.sync_engine.pool.size())
+DB_POOL_CHECKED_OUT.set_function(lambda: engine.sync_engine.pool.checkedout())
+DB_POOL_OVERFLOW.set_function(lambda: max(0, engine.sync_engine.pool.overflow()))
 
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -36,6 +122,159 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+
+class Replica:
+    """A read replica engine with its last measured replication lag"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_pooled_engine(to_async_url(url))
+        self.session_factory = async_sessionmaker(
+            self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autocommit=False,
+            autoflush=False,
+        )
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+
+    def is_fresh(self) -> bool:
+        """Whether the replica is within the staleness bound"""
+        measured_recently = (
+            time.monotonic() - self.checked_at
+            < settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL * 3
+        )
+        return (
+            self.lag is not None
+            and measured_recently
+            and self.lag <= settings.DATABASE_REPLICA_MAX_LAG_SECONDS
+        )
+
+
+class ReplicaSet:
+    """Round-robin router over read replicas, skipping any that lag too far
+
+    A replica is only used once its lag has been measured, so reads stay on the
+    primary until the lag monitor has run.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(str(index), url) for index, url in enumerate(urls)]
+        self._counter = itertools.count()
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    def choose(self) -> Optional[async_sessionmaker]:
+        """Pick the next fresh replica's session factory, or None if there is none"""
+        fresh = [replica for replica in self.replicas if replica.is_fresh()]
+        if not fresh:
+            return None
+        return fresh[next(self._counter) % len(fresh)].session_factory
+
+    async def check_lag(self) -> None:
+        """Measure replication lag on every replica"""
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    lag = (await conn.execute(text(REPLICA_LAG_QUERY))).scalar()
+                replica.lag = float(lag or 0)
+                replica.checked_at = time.monotonic()
+                DB_REPLICA_LAG.labels(replica=replica.name).set(replica.lag)
+            except Exception:
+                replica.lag = None
+
+    async def monitor(self) -> None:
+        """Refresh replica lag periodically"""
+        while True:
+            await self.check_lag()
+            await asyncio.sleep(settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL)
+
+    def start(self) -> None:
+        """Start the background lag monitor"""
+        if self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self.monitor())
+
+    async def close(self) -> None:
+        """Stop the lag monitor and dispose replica engines"""
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+# Read replicas (empty when DATABASE_REPLICA_URLS is not set)
+replicas = ReplicaSet(settings.DATABASE_REPLICA_URLS)
+
+# Write tracking for read-your-writes routing
+# Sessions created with TRACK_WRITES in their info record whether they
+# committed a write, whatever issued it: the ORM unit of work, or raw SQL
+# through text(), which neither flushes nor shows up as an ORM
+# insert/update/delete. The dependency layer reads "committed_writes" to pin
+# the caller to the primary. Statements are only inspected on the primary,
+# and only for those sessions.
+TRACK_WRITES = "track_writes"
+_WRITE_STATEMENT = re.compile(r"^\s*(INSERT|UPDATE|DELETE|MERGE|COPY)\b", re.IGNORECASE)
+_WRITING_CTE = re.compile(
+    r"^\s*WITH\b.*\b(INSERT|UPDATE|DELETE)\b", re.IGNORECASE | re.DOTALL
+)
+
+
+def is_write_statement(statement: str) -> bool:
+    """Whether SQL text modifies data"""
+    return bool(_WRITE_STATEMENT.match(statement) or _WRITING_CTE.match(statement))
+
+
+@event.listens_for(Session, "after_begin")
+def _track_connection_writes(session, transaction, connection):
+    """Point the connection's writes at the session using it"""
+    if session.info.get(TRACK_WRITES):
+        connection.info["session_info"] = session.info
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _untrack_connection_writes(dbapi_connection, connection_record):
+    """Forget the session when the connection goes back to the pool"""
+    connection_record.info.pop("session_info", None)
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _mark_statement_writes(conn, cursor, statement, parameters, context, executemany):
+    """Remember that the session executed an INSERT, UPDATE or DELETE"""
+    session_info = conn.info.get("session_info")
+    if session_info is None or session_info.get("has_writes"):
+        return
+    if (
+        context.isinsert
+        or context.isupdate
+        or context.isdelete
+        or is_write_statement(statement)
+    ):
+        session_info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_writes(session, flush_context):
+    """Remember that the session wrote through the ORM unit of work"""
+    if session.info.get(TRACK_WRITES):
+        session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed_writes(session):
+    if session.info.pop("has_writes", False):
+        session.info["committed_writes"] = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_writes(session):
+    session.info.pop("has_writes", None)
+
+
 # Base class for models
 Base = declarative_base()
 
@@ -43,68 +282,203 @@ Base = declarative_base()
 metadata = MetaData()
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency to get database session"""
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
-
-
 async def init_db() -> None:
     """Initialize database tables"""
     async with engine.begin() as conn:
         # Import all models to ensure they are registered
-        from app.models import user, listing, booking, review, message, transaction
-        
+        from app.models import booking, listing, message, review, transaction, user
+
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
-        
+
         # Create indexes
         await conn.run_sync(create_indexes)
 
 
+async def prefill_pool(size: int, statements: Sequence[Tuple[str, dict]] = ()) -> int:
+    """Open up to ``size`` pooled connections ahead of the first requests
+
+    Each ``(sql, params)`` statement is run once on every connection, so
+    the driver has it prepared and cached there before real traffic uses
+    it; run them with parameters that match nothing. Returns the number of
+    connections that were opened successfully.
+    """
+    size = min(size, settings.DATABASE_POOL_SIZE)
+    results = await asyncio.gather(
+        *(engine.connect() for _ in range(size)), return_exceptions=True
+    )
+    connections = [conn for conn in results if not isinstance(conn, BaseException)]
+
+    async def prepare(conn):
+        await conn.execute(text("SELECT 1"))
+        for sql, params in statements:
+            await conn.execute(text(sql), params)
+        await conn.rollback()
+
+    try:
+        await asyncio.gather(*(prepare(conn) for conn in connections))
+    finally:
+        for conn in connections:
+            await conn.close()
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors and not connections:
+        raise errors[0]
+    return len(connections)
+
+
 def create_indexes(metadata):
     """Create database indexes"""
     from sqlalchemy import Index, text
-    
+
     # Create spatial index for listings
     metadata.create_all(engine, checkfirst=True)
-    
+
     # Create additional indexes
     with engine.connect() as conn:
         # Spatial index for PostGIS
-        conn.execute(text("""
+        conn.execute(
+            text(
+                """
             CREATE INDEX IF NOT EXISTS idx_listings_geog 
             ON listings USING GIST (geog);
-        """))
-        
-        # Full-text search index
-        conn.execute(text("""
-            CREATE INDEX IF NOT EXISTS idx_listings_search 
-            ON listings USING GIN (to_tsvector('english', title || ' ' || description));
-        """))
-        
+        """
+            )
+        )
+
+        # Full-text search: a stored vector kept current by a trigger, so
+        # queries and ranking read it instead of recomputing it per row.
+        # Title weighs most (A), then city and area (B), then description (C).
+        conn.execute(
+            text(
+                """
+            ALTER TABLE listings ADD COLUMN IF NOT EXISTS search_vector tsvector;
+        """
+            )
+        )
+        conn.execute(
+            text(
+                """
+            CREATE OR REPLACE FUNCTION listings_search_vector_update()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                NEW.search_vector :=
+                    setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(NEW.city, '') || ' ' || coalesce(NEW.area, '')), 'B') ||
+                    setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C');
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+        """
+            )
+        )
+        conn.execute(
+            text(
+                """
+            DROP TRIGGER IF EXISTS trg_listings_search_vector ON listings;
+        """
+            )
+        )
+        conn.execute(
+            text(
+                """
+            CREATE TRIGGER trg_listings_search_vector
+            BEFORE INSERT OR UPDATE OF title, description, city, area ON listings
+            FOR EACH ROW EXECUTE FUNCTION listings_search_vector_update();
+        """
+            )
+        )
+        # Rows written before the trigger existed are backfilled in batches
+        # by scripts/backfill_search_vectors.py rather than here, where one
+        # UPDATE would rewrite the whole table on startup
+        conn.execute(
+            text(
+                """
+            DROP INDEX IF EXISTS idx_listings_search;
+        """
+            )
+        )
+        conn.execute(
+            text(
+                """
+            CREATE INDEX IF NOT EXISTS idx_listings_search_vector
+            ON listings USING GIN (search_vector);
+        """
+            )
+        )
+
+        # Trigram index for listing title typeahead; GiST rather than GIN so
+        # it can also return titles nearest first
+        conn.execute(
+            text(
+                """
+            DROP INDEX IF EXISTS idx_listings_title_trgm;
+        """
+            )
+        )
+        conn.execute(
+            text(
+                """
+            CREATE INDEX IF NOT EXISTS idx_listings_title_trgm_gist
+            ON listings USING GIST (title gist_trgm_ops);
+        """
+            )
+        )
+
         # Composite indexes for common queries
-        conn.execute(text("""
+        conn.execute(
+            text(
+                """
             CREATE INDEX IF NOT EXISTS idx_listings_city_type 
             ON listings (city, type, status);
-        """))
-        
-        conn.execute(text("""
+        """
+            )
+        )
+
+        conn.execute(
+            text(
+                """
             CREATE INDEX IF NOT EXISTS idx_bookings_dates_status 
             ON bookings (check_in, check_out, status);
-        """))
-        
+        """
+            )
+        )
+
+        # Final guard against double bookings: no two pending or confirmed
+        # bookings of a listing may share a night. Admission serializes
+        # attempts with a lease, but a lease can expire mid-transaction.
+        conn.execute(
+            text(
+                """
+            CREATE EXTENSION IF NOT EXISTS btree_gist;
+        """
+            )
+        )
+        conn.execute(
+            text(
+                """
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_constraint WHERE conname = 'bookings_no_overlap'
+                ) THEN
+                    ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap
+                    EXCLUDE USING gist (
+                        listing_id WITH =, daterange(check_in, check_out) WITH &&
+                    )
+                    WHERE (status IN ('pending', 'confirmed'));
+                END IF;
+            END $$;
+        """
+            )
+        )
+
         conn.commit()
 
 
 async def close_db() -> None:
     """Close database connections"""
+    await replicas.close()
     await engine.dispose()
 
 
@@ -113,13 +487,13 @@ async def get_test_db() -> AsyncGenerator[AsyncSession, None]:
     """Get test database session"""
     if not settings.DATABASE_TEST_URL:
         raise ValueError("Test database URL not configured")
-    
+
     test_engine = create_async_engine(
         settings.DATABASE_TEST_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
         echo=False,
         poolclass=NullPool,
     )
-    
+
     TestSessionLocal = async_sessionmaker(
         test_engine,
         class_=AsyncSession,
@@ -127,7 +501,7 @@ async def get_test_db() -> AsyncGenerator[AsyncSession, None]:
         autocommit=False,
         autoflush=False,
     )
-    
+
     async with TestSessionLocal() as session:
         try:
             yield session
@@ -143,15 +517,15 @@ async def init_test_db() -> None:
     """Initialize test database"""
     if not settings.DATABASE_TEST_URL:
         raise ValueError("Test database URL not configured")
-    
+
     test_engine = create_async_engine(
         settings.DATABASE_TEST_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
         echo=False,
         poolclass=NullPool,
     )
-    
+
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
-    
+
     await test_engine.dispose()
@@ -2,22 +2,43 @@
 Logging configuration for Homlo API
 """
 
+import atexit
+import copy
+import json
 import logging
 import logging.config
+import logging.handlers
+import queue
+import random
 import sys
+import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter
 
 from app.core.config import settings
 
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+    ["logger"],
+)
+
+# Background listener owning the real handlers when queue mode is enabled
+_queue_listener: Optional["RoutingQueueListener"] = None
+
 
 def setup_logging() -> logging.Logger:
     """Setup application logging"""
-    
+
+    # Stop the listener from a previous call before its handlers are replaced
+    stop_queue_listener()
+
     # Create logs directory if it doesn't exist
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
-    
+
     # Logging configuration
     log_config = {
         "version": 1,
@@ -28,15 +49,19 @@ def setup_logging() -> logging.Logger:
                 "datefmt": "%Y-%m-%d %H:%M:%S",
             },
             "json": {
-                "()": "pythonjsonlogger.jsonlogger.JsonFormatter",
-                "format": "%(timestamp)s %(level)s %(name)s %(message)s",
-                "datefmt": "%Y-%m-%d %H:%M:%S",
+                "()": "app.core.logging.JsonFormatter",
             },
             "detailed": {
                 "format": "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s",
                 "datefmt": "%Y-%m-%d %H:%M:%S",
             },
         },
+        "filters": {
+            "access_sampler": {
+                "()": "app.core.logging.AccessLogSampler",
+                "sample_rate": settings.LOG_ACCESS_SAMPLE_RATE,
+            },
+        },
         "handlers": {
             "console": {
                 "class": "logging.StreamHandler",
@@ -80,6 +105,12 @@ def setup_logging() -> logging.Logger:
                 "level": "DEBUG" if settings.DEBUG else "INFO",
                 "propagate": False,
             },
+            "app.access": {  # Request access logs
+                "handlers": ["console", "access_file"],
+                "filters": ["access_sampler"],
+                "level": "INFO",
+                "propagate": False,
+            },
             "uvicorn": {  # Uvicorn logger
                 "handlers": ["console", "file"],
                 "level": "INFO",
@@ -112,27 +143,182 @@ def setup_logging() -> logging.Logger:
             },
         },
     }
-    
+
     # Apply logging configuration
     logging.config.dictConfig(log_config)
-    
+
+    # Move file and stream I/O off the calling thread
+    if settings.LOG_QUEUE_ENABLED:
+        start_queue_listener(list(log_config["loggers"]))
+
     # Get main application logger
     logger = logging.getLogger("app")
-    
+
     # Set log level based on environment
     if settings.DEBUG:
         logger.setLevel(logging.DEBUG)
     else:
         logger.setLevel(logging.INFO)
-    
+
     # Log startup message
     logger.info(f"Logging configured for {settings.ENVIRONMENT} environment")
     logger.info(f"Log level: {settings.LOG_LEVEL}")
     logger.info(f"Log format: {settings.LOG_FORMAT}")
-    
+
     return logger
 
 
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that forwards records to a fixed set of target handlers
+
+    When the queue is full the record is either dropped (and counted) or the
+    caller blocks until the listener catches up, depending on ``policy``.
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        targets: List[logging.Handler],
+        policy: str = "drop",
+    ):
+        super().__init__(log_queue)
+        self.targets = tuple(targets)
+        self.block = policy == "block"
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge args and render exception text so the record is safe to hand off"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put the record on the queue along with its target handlers"""
+        try:
+            self.queue.put((self.targets, record), block=self.block)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(logger=record.name).inc()
+
+
+class RoutingQueueListener(logging.handlers.QueueListener):
+    """Queue listener that dispatches each record to the handlers it was queued for"""
+
+    def __init__(self, log_queue: queue.Queue, handlers: List[logging.Handler]):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+
+    def handle(self, item) -> None:
+        """Emit a queued record on its target handlers"""
+        targets, record = item
+        for handler in targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def start_queue_listener(logger_names: List[str]) -> None:
+    """Replace the handlers of the given loggers with queue handlers
+
+    A single background thread then owns every file and stream handler.
+    """
+    global _queue_listener
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_MAX_SIZE)
+    queue_handlers: Dict[tuple, BoundedQueueHandler] = {}
+    targets = set()
+
+    for name in logger_names:
+        logger = logging.getLogger(name or None)
+        handlers = tuple(logger.handlers)
+        if not handlers:
+            continue
+        if handlers not in queue_handlers:
+            queue_handlers[handlers] = BoundedQueueHandler(
+                log_queue, list(handlers), settings.LOG_QUEUE_FULL_POLICY
+            )
+        targets.update(handlers)
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handlers[handlers])
+
+    _queue_listener = RoutingQueueListener(log_queue, list(targets))
+    _queue_listener.start()
+
+
+def stop_queue_listener() -> None:
+    """Flush queued records and stop the background listener"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+atexit.register(stop_queue_listener)
+
+
+class JsonFormatter(logging.Formatter):
+    """Fast JSON formatter including any ``extra`` fields on the record"""
+
+    # Attributes every LogRecord has; anything else came in through ``extra``
+    RESERVED_ATTRS = frozenset(
+        vars(logging.LogRecord("", 0, "", 0, "", None, None))
+    ) | {"message", "asctime"}
+
+    def __init__(self):
+        super().__init__()
+        self._cached_second = None
+        self._cached_timestamp = ""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format record as a single JSON line"""
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_timestamp = time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(second)
+            )
+
+        data = {
+            "timestamp": f"{self._cached_timestamp}.{int(record.msecs):03d}",
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self.RESERVED_ATTRS:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+
+        return json.dumps(data, default=str)
+
+
+class AccessLogSampler(logging.Filter):
+    """Keep only a fraction of successful access log records
+
+    Records with a 4xx/5xx ``status_code`` are always kept.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Decide whether to keep the record"""
+        if self.sample_rate >= 1.0:
+            return True
+        if getattr(record, "status_code", 200) >= 400:
+            return True
+        return random.random() < self.sample_rate
+
+
+_exception_formatter = logging.Formatter()
+
+
 def get_logger(name: str) -> logging.Logger:
     """Get a logger with the specified name"""
     return logging.getLogger(f"app.{name}")
@@ -141,38 +327,38 @@ def get_logger(name: str) -> logging.Logger:
 # Custom log formatter for structured logging
 class StructuredFormatter(logging.Formatter):
     """Custom formatter for structured logging"""
-    
+
     def format(self, record: logging.LogRecord) -> str:
         """Format log record with additional context"""
         # Add extra fields to record
-        if not hasattr(record, 'timestamp'):
+        if not hasattr(record, "timestamp"):
             record.timestamp = self.formatTime(record)
-        
-        if not hasattr(record, 'level'):
+
+        if not hasattr(record, "level"):
             record.level = record.levelname
-        
-        if not hasattr(record, 'logger'):
+
+        if not hasattr(record, "logger"):
             record.logger = record.name
-        
+
         # Format message
         message = super().format(record)
-        
+
         # Add extra context if available
-        if hasattr(record, 'extra_data'):
+        if hasattr(record, "extra_data"):
             message += f" | Extra: {record.extra_data}"
-        
+
         return message
 
 
 # Context manager for logging context
 class LogContext:
     """Context manager for adding context to logs"""
-    
+
     def __init__(self, logger: logging.Logger, **context):
         self.logger = logger
         self.context = context
         self.old_context = {}
-    
+
     def __enter__(self):
         # Store old context
         for key, value in self.context.items():
@@ -180,7 +366,7 @@ class LogContext:
                 self.old_context[key] = getattr(self.logger, key)
             setattr(self.logger, key, value)
         return self.logger
-    
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         # Restore old context
         for key, value in self.old_context.items():
@@ -193,31 +379,38 @@ class LogContext:
 # Logging decorator
 def log_function_call(logger: logging.Logger = None):
     """Decorator to log function calls"""
+
     def decorator(func):
         def wrapper(*args, **kwargs):
             if logger is None:
                 func_logger = get_logger(func.__module__)
             else:
                 func_logger = logger
-            
-            func_logger.debug(f"Calling {func.__name__} with args={args}, kwargs={kwargs}")
+
+            func_logger.debug(
+                f"Calling {func.__name__} with args={args}, kwargs={kwargs}"
+            )
             try:
                 result = func(*args, **kwargs)
                 func_logger.debug(f"{func.__name__} returned {result}")
                 return result
             except Exception as e:
-                func_logger.error(f"{func.__name__} failed with error: {e}", exc_info=True)
+                func_logger.error(
+                    f"{func.__name__} failed with error: {e}", exc_info=True
+                )
                 raise
+
         return wrapper
+
     return decorator
 
 
 # Performance logging
 def log_performance(logger: logging.Logger = None):
     """Decorator to log function performance"""
-    import time
     import functools
-    
+    import time
+
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
@@ -225,7 +418,7 @@ def log_performance(logger: logging.Logger = None):
                 func_logger = get_logger(func.__module__)
             else:
                 func_logger = logger
-            
+
             start_time = time.time()
             try:
                 result = func(*args, **kwargs)
@@ -234,7 +427,12 @@ def log_performance(logger: logging.Logger = None):
                 return result
             except Exception as e:
                 duration = time.time() - start_time
-                func_logger.error(f"{func.__name__} failed after {duration:.3f}s with error: {e}", exc_info=True)
+                func_logger.error(
+                    f"{func.__name__} failed after {duration:.3f}s with error: {e}",
+                    exc_info=True,
+                )
                 raise
+
         return wrapper
+
     return decorator
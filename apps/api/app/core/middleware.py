@@ -0,0 +1,141 @@
+"""
+HTTP middleware for Homlo API
+Pure ASGI request metrics and access logging
+"""
+
+import logging
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Prometheus metrics
+# Requests are labelled with the matched route template (e.g.
+# /api/v1/listings/{listing_id}) so path parameters do not create new series.
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "Total HTTP requests",
+    ["method", "endpoint", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "endpoint"],
+    buckets=(
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.075,
+        0.1,
+        0.25,
+        0.5,
+        0.75,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    ),
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size",
+    ["method", "endpoint"],
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed",
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware recording Prometheus metrics and an access log line
+
+    Unlike ``BaseHTTPMiddleware`` this does not spawn a task or re-stream the
+    response body per request, so streaming responses pass straight through.
+    """
+
+    def __init__(self, app, logger_name: str = "app.access"):
+        self.app = app
+        self.logger = logging.getLogger(logger_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            duration = time.perf_counter() - start_time
+            endpoint = get_route_template(scope, root_path)
+
+            REQUEST_COUNT.labels(
+                method=method, endpoint=endpoint, status=status_code
+            ).inc()
+            REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(duration)
+            RESPONSE_SIZE.labels(method=method, endpoint=endpoint).observe(
+                response_size
+            )
+
+            if self.logger.isEnabledFor(logging.INFO):
+                client = scope.get("client")
+                self.logger.info(
+                    "%s %s %s in %.3fs",
+                    method,
+                    path,
+                    status_code,
+                    duration,
+                    extra={
+                        "method": method,
+                        "path": path,
+                        "route": endpoint,
+                        "status_code": status_code,
+                        "duration": duration,
+                        "response_size": response_size,
+                        "client_ip": client[0] if client else None,
+                        "user_agent": get_header(scope, b"user-agent"),
+                    },
+                )
+
+
+def get_route_template(scope, root_path: str = "") -> str:
+    """Get the path template of the route that handled the request"""
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", UNMATCHED_ROUTE)
+
+    # Mounted apps (e.g. /static) only extend root_path with their prefix
+    if "endpoint" in scope:
+        mount_path = scope.get("root_path", "")[len(root_path) :]
+        if mount_path:
+            return f"{mount_path}/{{path}}"
+
+    return UNMATCHED_ROUTE
+
+
+def get_header(scope, name: bytes):
+    """Get a request header value from an ASGI scope"""
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
@@ -0,0 +1,240 @@
+"""
+Rate limiting middleware for Homlo API
+Local token-bucket pre-filter in front of a Redis sliding-window limiter
+"""
+
+import ipaddress
+import json
+import math
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from jose import JWTError, jwt
+from prometheus_client import Counter
+
+from app.core.config import settings
+from app.core.redis import hit_sliding_window
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "http_rate_limit_rejections_total",
+    "Requests rejected by the rate limiter",
+    ["source"],
+)
+
+
+class LocalTokenBucket:
+    """Per-worker token buckets keyed by client identity
+
+    The bucket refills at the per-minute limit, so a well-behaved client never
+    drains it and every request is decided by Redis. A client that bursts past
+    the limit, or that Redis has already rejected, is turned away locally
+    without a network hop until its bucket refills.
+    """
+
+    def __init__(self, rate_per_minute: int, max_clients: int = 10000):
+        self.capacity = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60.0
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def acquire(self, identity: str) -> Tuple[bool, int]:
+        """Take a token for identity, returning (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        bucket = self._buckets.get(identity)
+        if bucket is None:
+            bucket = [self.capacity, now]
+            self._buckets[identity] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(identity)
+            tokens, updated = bucket
+            bucket[0] = min(
+                self.capacity, tokens + (now - updated) * self.refill_per_second
+            )
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0
+
+        retry_after = math.ceil((1 - bucket[0]) / self.refill_per_second)
+        return False, retry_after
+
+    def penalize(self, identity: str, retry_after: int) -> None:
+        """Drain identity's bucket so it stays rejected locally for retry_after"""
+        bucket = self._buckets.get(identity)
+        if bucket is not None:
+            bucket[0] = 1 - retry_after * self.refill_per_second
+            bucket[1] = time.monotonic()
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware enforcing per-minute and per-hour limits per user or IP"""
+
+    def __init__(
+        self,
+        app,
+        per_minute: Optional[int] = None,
+        per_hour: Optional[int] = None,
+        exempt_paths: Optional[List[str]] = None,
+    ):
+        self.app = app
+        self.per_minute = per_minute or settings.RATE_LIMIT_PER_MINUTE
+        self.per_hour = per_hour or settings.RATE_LIMIT_PER_HOUR
+        self.limits = [(self.per_minute, 60), (self.per_hour, 3600)]
+        self.exempt_paths = set(
+            exempt_paths
+            if exempt_paths is not None
+            else settings.RATE_LIMIT_EXEMPT_PATHS
+        )
+        self.prefilter = LocalTokenBucket(self.per_minute)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        identity = get_client_identity(scope)
+
+        allowed, retry_after = self.prefilter.acquire(identity)
+        if not allowed:
+            RATE_LIMIT_REJECTIONS.labels(source="local").inc()
+            await self._reject(send, retry_after)
+            return
+
+        allowed, remaining, retry_after, limit = await hit_sliding_window(
+            identity, self.limits
+        )
+        if not allowed:
+            RATE_LIMIT_REJECTIONS.labels(source="redis").inc()
+            self.prefilter.penalize(identity, retry_after)
+            await self._reject(send, retry_after, limit)
+            return
+
+        if remaining < 0:
+            # Redis unavailable, fail open without advertising a budget
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-ratelimit-limit", str(limit).encode()))
+                headers.append((b"x-ratelimit-remaining", str(remaining).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def _reject(
+        self, send, retry_after: int, limit: Optional[int] = None
+    ) -> None:
+        """Send a 429 response reporting the limit of the window that rejected it"""
+        body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(retry_after, 1)).encode()),
+                    (b"x-ratelimit-limit", str(limit or self.per_minute).encode()),
+                    (b"x-ratelimit-remaining", b"0"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+# Verified bearer tokens, so each token's signature is checked once per worker
+_verified_tokens: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+VERIFIED_TOKENS_MAX = 10000
+
+_trusted_proxies = [
+    ipaddress.ip_network(proxy, strict=False)
+    for proxy in settings.RATE_LIMIT_TRUSTED_PROXIES
+]
+
+
+def get_client_identity(scope) -> str:
+    """Identify the caller by verified user id, otherwise by client IP
+
+    A bearer token counts only once its signature and expiry are verified,
+    so random tokens do not buy a fresh budget; they are limited by IP.
+    """
+    authorization = forwarded_for = None
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            authorization = value
+        elif name == b"x-forwarded-for":
+            forwarded_for = value
+
+    if authorization is not None and authorization[:7].lower() == b"bearer ":
+        user_id = _verify_token(authorization[7:].strip())
+        if user_id is not None:
+            return f"user:{user_id}"
+
+    client = scope.get("client")
+    return f"ip:{client_ip(client[0] if client else None, forwarded_for)}"
+
+
+def _verify_token(token: bytes) -> Optional[str]:
+    """The user id (``sub``) of a valid access token"""
+    now = time.time()
+    verified = _verified_tokens.get(token)
+    if verified is not None:
+        user_id, expires_at = verified
+        if expires_at > now:
+            _verified_tokens.move_to_end(token)
+            return user_id
+        del _verified_tokens[token]
+
+    try:
+        payload = jwt.decode(
+            token.decode("latin-1"),
+            settings.JWT_SECRET_KEY,
+            algorithms=[settings.JWT_ALGORITHM],
+        )
+    except JWTError:
+        return None
+    user_id = payload.get("sub")
+    if not user_id:
+        return None
+
+    _verified_tokens[token] = (str(user_id), float(payload.get("exp", now + 60)))
+    if len(_verified_tokens) > VERIFIED_TOKENS_MAX:
+        _verified_tokens.popitem(last=False)
+    return str(user_id)
+
+
+def client_ip(peer: Optional[str], forwarded_for: Optional[bytes]) -> str:
+    """The client address, trusting X-Forwarded-For only from trusted proxies
+
+    Each trusted proxy appends the address it received the request from, so
+    the right-most hop that is not a trusted proxy is the client; anything
+    to its left was sent by the client and may be forged.
+    """
+    if peer is None:
+        return "unknown"
+    if not forwarded_for or not _is_trusted_proxy(peer):
+        return peer
+    hops = [
+        hop.strip() for hop in forwarded_for.decode("latin-1").split(",") if hop.strip()
+    ]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+@lru_cache(maxsize=4096)
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_proxies)
@@ -2,19 +2,29 @@
 Redis configuration and client management
 """
 
+import asyncio
 import json
-from typing import Optional, Any, Dict
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
 import redis.asyncio as redis
+from prometheus_client import Counter
+
+from app.core.cache import CACHE_REQUESTS, local_cache
+from app.core.codec import CodecError, cache_codec
 from app.core.config import settings
 
 # Redis client instance
 redis_client: Optional[redis.Redis] = None
 
+# Client returning raw bytes, for bitmaps and other binary values
+binary_redis_client: Optional[redis.Redis] = None
+
 
 async def init_redis() -> redis.Redis:
     """Initialize Redis connection"""
     global redis_client
-    
+
     if redis_client is None:
         redis_client = redis.from_url(
             settings.REDIS_URL,
@@ -25,10 +35,10 @@ async def init_redis() -> redis.Redis:
             retry_on_timeout=True,
             health_check_interval=30,
         )
-        
+
         # Test connection
         await redis_client.ping()
-    
+
     return redis_client
 
 
@@ -39,70 +49,484 @@ async def get_redis() -> redis.Redis:
     return redis_client
 
 
+async def get_binary_redis() -> redis.Redis:
+    """Get Redis client instance that does not decode responses"""
+    global binary_redis_client
+    if binary_redis_client is None:
+        binary_redis_client = redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=False,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            retry_on_timeout=True,
+            health_check_interval=30,
+        )
+    return binary_redis_client
+
+
 async def close_redis() -> None:
     """Close Redis connection"""
-    global redis_client
+    global redis_client, binary_redis_client, _sliding_window_script
     if redis_client:
         await redis_client.close()
         redis_client = None
+        _sliding_window_script = None
+    if binary_redis_client:
+        await binary_redis_client.close()
+        binary_redis_client = None
 
 
 # Cache functions
-async def set_cache(key: str, value: Any, expire: int = 3600) -> bool:
-    """Set cache value with expiration"""
+# Values are stored through ``cache_codec`` on the binary client. Keys can
+# additionally be held in the per-worker local cache (opt in with
+# ``local_ttl``). Every write and delete is announced on a pub/sub channel in
+# the same pipeline, so other workers drop their local copy of the key.
+_MISSING = object()
+_invalidation_task: Optional[asyncio.Task] = None
+_invalidations_subscribed: Optional[asyncio.Event] = None
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Identifies this worker's own invalidation messages
+WORKER_ID = uuid.uuid4().hex
+
+# Keys per UNLINK/SCAN batch when invalidating
+INVALIDATION_BATCH_SIZE = 500
+
+CACHE_INVALIDATIONS = Counter(
+    "cache_invalidations_total",
+    "Cache invalidation calls",
+    ["method"],
+)
+CACHE_INVALIDATED_KEYS = Counter(
+    "cache_invalidated_keys_total",
+    "Cache keys removed by invalidation",
+    ["method"],
+)
+
+
+async def set_cache(
+    key: str,
+    value: Any,
+    expire: int = 3600,
+    local_ttl: Optional[int] = None,
+    tags: Optional[List[str]] = None,
+) -> bool:
+    """Set cache value with expiration
+
+    ``tags`` (e.g. ``listing:{id}``, ``city:{name}``) register the key so it
+    can later be removed with ``invalidate_tags``.
+    """
     try:
-        redis_client = await get_redis()
-        if isinstance(value, (dict, list)):
-            value = json.dumps(value)
-        return await redis_client.setex(key, expire, value)
+        redis_client = await get_binary_redis()
+        if local_ttl and settings.CACHE_L1_ENABLED:
+            local_cache.set(key, value, min(local_ttl, expire))
+        else:
+            local_cache.delete(key)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.setex(key, expire, cache_codec.encode(value))
+            for tag in tags or []:
+                tag_key = f"cache:tag:{tag}"
+                pipe.sadd(tag_key, key)
+                # The tag set must outlive every member: NX covers a new set,
+                # GT extends an existing one
+                pipe.expire(tag_key, expire, nx=True)
+                pipe.expire(tag_key, expire, gt=True)
+            publish_invalidation(pipe, "key", key)
+            result = await pipe.execute()
+        return bool(result[0])
     except Exception:
         return False
 
 
-async def get_cache(key: str) -> Optional[Any]:
+async def get_cache(key: str, local_ttl: Optional[int] = None) -> Optional[Any]:
     """Get cache value"""
+    if settings.CACHE_L1_ENABLED:
+        value = local_cache.get(key, _MISSING)
+        if value is not _MISSING:
+            CACHE_REQUESTS.labels(tier="l1", result="hit").inc()
+            return value
+        CACHE_REQUESTS.labels(tier="l1", result="miss").inc()
+
     try:
-        redis_client = await get_redis()
+        redis_client = await get_binary_redis()
         value = await redis_client.get(key)
         if value:
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value
+            CACHE_REQUESTS.labels(tier="l2", result="hit").inc()
+            value = cache_codec.decode(value)
+            if local_ttl and settings.CACHE_L1_ENABLED:
+                local_cache.set(key, value, local_ttl)
+            return value
+        CACHE_REQUESTS.labels(tier="l2", result="miss").inc()
         return None
     except Exception:
         return None
 
 
+async def get_cache_many(keys: List[str]) -> List[Optional[Any]]:
+    """Get several cache values in one round trip, None for misses"""
+    if not keys:
+        return []
+    try:
+        redis_client = await get_binary_redis()
+        values = await redis_client.mget(keys)
+    except Exception:
+        return [None] * len(keys)
+
+    results = []
+    for value in values:
+        if value:
+            try:
+                value = cache_codec.decode(value)
+            except (CodecError, UnicodeDecodeError):
+                # Written in a format this worker does not know; a miss
+                value = None
+            results.append(value)
+        else:
+            results.append(None)
+    hits = sum(result is not None for result in results)
+    CACHE_REQUESTS.labels(tier="l2", result="hit").inc(hits)
+    CACHE_REQUESTS.labels(tier="l2", result="miss").inc(len(keys) - hits)
+    return results
+
+
+async def set_cache_many(
+    values: Dict[str, Any],
+    expire: int = 3600,
+    tags: Optional[Dict[str, List[str]]] = None,
+) -> bool:
+    """Set several cache values in one round trip
+
+    ``tags`` maps a key to the tags it should be registered under.
+    """
+    if not values:
+        return True
+    try:
+        redis_client = await get_binary_redis()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                local_cache.delete(key)
+                pipe.setex(key, expire, cache_codec.encode(value))
+                for tag in (tags or {}).get(key, []):
+                    tag_key = f"cache:tag:{tag}"
+                    pipe.sadd(tag_key, key)
+                    pipe.expire(tag_key, expire, nx=True)
+                    pipe.expire(tag_key, expire, gt=True)
+            publish_invalidation(pipe, "keys", "\n".join(values))
+            await pipe.execute()
+        return True
+    except Exception:
+        return False
+
+
+async def get_or_compute(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    expire: int = 3600,
+    local_ttl: Optional[int] = None,
+) -> Optional[Any]:
+    """Get cache value, computing and storing it on a miss
+
+    Concurrent misses for the same key within a worker share a single call to
+    ``compute`` instead of each recomputing it. The computation runs in its own
+    task so a cancelled caller does not cancel it for the others. ``None``
+    results are not cached.
+    """
+    value = await get_cache(key, local_ttl=local_ttl)
+    if value is not None:
+        return value
+
+    task = _inflight.get(key)
+    if task is None:
+
+        async def compute_and_store():
+            result = await compute()
+            if result is not None:
+                await set_cache(key, result, expire, local_ttl=local_ttl)
+            return result
+
+        task = asyncio.ensure_future(compute_and_store())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+    return await asyncio.shield(task)
+
+
 async def delete_cache(key: str) -> bool:
     """Delete cache key"""
+    local_cache.delete(key)
     try:
         redis_client = await get_redis()
-        return bool(await redis_client.delete(key))
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            publish_invalidation(pipe, "key", key)
+            result = await pipe.execute()
+        return bool(result[0])
     except Exception:
         return False
 
 
+async def invalidate_tags(*tags: str) -> int:
+    """Delete every cache key registered under the given tags
+
+    Costs O(members) with pipelined UNLINK rather than a keyspace scan.
+    Returns the number of keys removed.
+    """
+    removed = 0
+    try:
+        redis_client = await get_redis()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.smembers(f"cache:tag:{tag}")
+            tag_members = await pipe.execute()
+
+        for tag, members in zip(tags, tag_members):
+            members = list(members)
+            for start in range(0, len(members), INVALIDATION_BATCH_SIZE):
+                chunk = members[start : start + INVALIDATION_BATCH_SIZE]
+                removed += await _unlink_keys(
+                    redis_client, chunk, tag_key=f"cache:tag:{tag}"
+                )
+    except Exception:
+        pass
+
+    CACHE_INVALIDATIONS.labels(method="tag").inc()
+    CACHE_INVALIDATED_KEYS.labels(method="tag").inc(removed)
+    return removed
+
+
 async def clear_pattern(pattern: str) -> int:
-    """Clear cache keys matching pattern"""
+    """Clear cache keys matching pattern
+
+    Walks the keyspace with incremental SCAN so Redis is never blocked; prefer
+    ``invalidate_tags`` for anything on a hot path.
+    """
+    local_cache.delete_pattern(pattern)
+    removed = 0
     try:
         redis_client = await get_redis()
-        keys = await redis_client.keys(pattern)
-        if keys:
-            return await redis_client.delete(*keys)
-        return 0
+        chunk = []
+        async for key in redis_client.scan_iter(
+            match=pattern, count=INVALIDATION_BATCH_SIZE
+        ):
+            chunk.append(key)
+            if len(chunk) >= INVALIDATION_BATCH_SIZE:
+                removed += await _unlink_keys(redis_client, chunk)
+                chunk = []
+        if chunk:
+            removed += await _unlink_keys(redis_client, chunk)
     except Exception:
+        pass
+
+    CACHE_INVALIDATIONS.labels(method="pattern").inc()
+    CACHE_INVALIDATED_KEYS.labels(method="pattern").inc(removed)
+    return removed
+
+
+async def _unlink_keys(
+    redis_client: redis.Redis, keys: List[str], tag_key: Optional[str] = None
+) -> int:
+    """UNLINK a batch of keys and announce it, returning how many existed"""
+    for key in keys:
+        local_cache.delete(key)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.unlink(*keys)
+        if tag_key:
+            # Only drop the members we removed, so keys tagged meanwhile survive
+            pipe.srem(tag_key, *keys)
+        publish_invalidation(pipe, "keys", "\n".join(keys))
+        result = await pipe.execute()
+    return result[0]
+
+
+def publish_invalidation(pipe, kind: str, target: str) -> None:
+    """Queue an invalidation message for other workers' local caches on ``pipe``
+
+    ``kind`` is "key" for one key or "keys" for newline-separated keys.
+    """
+    if settings.CACHE_L1_ENABLED:
+        pipe.publish(
+            settings.CACHE_INVALIDATION_CHANNEL, f"{kind} {WORKER_ID} {target}"
+        )
+
+
+def _apply_invalidation(message: str) -> None:
+    """Apply an invalidation message received from another worker"""
+    kind, origin, target = message.split(" ", 2)
+    if origin == WORKER_ID:
+        return
+    if kind == "key":
+        local_cache.delete(target)
+    elif kind == "keys":
+        for key in target.split("\n"):
+            local_cache.delete(key)
+    elif kind == "pattern":
+        local_cache.delete_pattern(target)
+    else:
+        local_cache.clear()
+
+
+async def _listen_for_invalidations() -> None:
+    """Drop local cache entries invalidated by other workers"""
+    while True:
+        pubsub = None
+        try:
+            redis_client = await get_redis()
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            # Anything cached while we were not subscribed may be stale
+            local_cache.clear()
+            _invalidations_subscribed.set()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _apply_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            local_cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            if pubsub is not None:
+                await pubsub.close()
+
+
+async def start_cache_invalidation_listener() -> None:
+    """Start the pub/sub listener for local cache invalidation
+
+    Returns once subscribed; the listener clears the local cache when it
+    subscribes, so anything warmed before that would be lost.
+    """
+    global _invalidation_task, _invalidations_subscribed
+    if settings.CACHE_L1_ENABLED and _invalidation_task is None:
+        _invalidations_subscribed = asyncio.Event()
+        _invalidation_task = asyncio.create_task(_listen_for_invalidations())
+        await asyncio.wait_for(_invalidations_subscribed.wait(), timeout=10)
+
+
+async def stop_cache_invalidation_listener() -> None:
+    """Stop the local cache invalidation listener"""
+    global _invalidation_task
+    if _invalidation_task is not None:
+        _invalidation_task.cancel()
+        try:
+            await _invalidation_task
+        except asyncio.CancelledError:
+            pass
+        _invalidation_task = None
+    local_cache.clear()
+
+
+# Local cache warming
+# Workers periodically share the keys hottest in their local cache, so a new
+# worker can load them before it takes traffic.
+HOT_KEYS_KEY = "cache:l1:hot"
+HOT_KEYS_BATCH_SIZE = 500
+
+
+async def record_hot_keys(limit: int) -> int:
+    """Publish this worker's most recently used local cache keys"""
+    hot = local_cache.hottest(limit)
+    if not hot:
+        return 0
+    redis_client = await get_redis()
+    await redis_client.set(HOT_KEYS_KEY, json.dumps(hot), ex=3600)
+    return len(hot)
+
+
+async def warm_local_cache() -> int:
+    """Load the keys other workers found hottest into the local cache
+
+    Each key keeps the remaining local TTL it had when it was recorded.
+    Returns the number of entries loaded.
+    """
+    if not settings.CACHE_L1_ENABLED:
         return 0
+    redis_client = await get_redis()
+    hot = json.loads(await redis_client.get(HOT_KEYS_KEY) or "[]")
+    loaded = 0
+    for start in range(0, len(hot), HOT_KEYS_BATCH_SIZE):
+        batch = hot[start : start + HOT_KEYS_BATCH_SIZE]
+        values = await get_cache_many([key for key, _ in batch])
+        for (key, ttl), value in zip(batch, values):
+            if value is not None:
+                local_cache.set(key, value, ttl)
+                loaded += 1
+    return loaded
 
 
 # Rate limiting functions
+# Sliding-window counter: each window is a hash of per-bucket counts, and the
+# estimate is the previous bucket weighted by its remaining overlap plus the
+# current bucket. All windows are checked first and only incremented when every
+# one of them admits the request, so a rejected call never consumes quota.
+# The binding window is the one with the least remaining (or, on rejection,
+# the longest wait), and its limit is returned with the result.
+SLIDING_WINDOW_LUA = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local allowed = 1
+local remaining = -1
+local retry_after = 0
+local binding = 0
+local buckets = {}
+
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i]) * 1000
+    local bucket = math.floor(now_ms / window)
+    local elapsed = now_ms - bucket * window
+    local counts = redis.call('HMGET', KEYS[i], bucket, bucket - 1)
+    local curr = tonumber(counts[1] or '0')
+    local prev = tonumber(counts[2] or '0')
+    local estimate = prev * (window - elapsed) / window + curr
+    buckets[i] = bucket
+
+    if estimate + 1 > limit then
+        allowed = 0
+        local wait = window - elapsed
+        if curr + 1 <= limit and prev > 0 then
+            wait = math.max(0, window - (limit - 1 - curr) * window / prev - elapsed)
+        end
+        wait = math.ceil(wait / 1000)
+        if wait >= retry_after then
+            retry_after = wait
+            binding = limit
+        end
+    elseif allowed == 1 then
+        local left = math.floor(limit - estimate - 1)
+        if remaining < 0 or left < remaining then
+            remaining = left
+            binding = limit
+        end
+    end
+end
+
+if allowed == 1 then
+    for i = 1, #KEYS do
+        local window = tonumber(ARGV[2 * i]) * 1000
+        redis.call('HINCRBY', KEYS[i], buckets[i], 1)
+        redis.call('HDEL', KEYS[i], buckets[i] - 2)
+        redis.call('PEXPIRE', KEYS[i], window * 2)
+    end
+else
+    remaining = 0
+end
+
+return {allowed, remaining, retry_after, binding}
+"""
+
+_sliding_window_script = None
+
+
 async def increment_rate_limit(key: str, window: int = 60) -> int:
     """Increment rate limit counter"""
     try:
         redis_client = await get_redis()
-        current = await redis_client.incr(key)
-        if current == 1:
-            await redis_client.expire(key, window)
+        # INCR and EXPIRE NX go out as one MULTI/EXEC so the key can never be
+        # left behind without a TTL
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, window, nx=True)
+            current, _ = await pipe.execute()
         return current
     except Exception:
         return 0
@@ -118,91 +542,133 @@ async def check_rate_limit(key: str, limit: int) -> bool:
         return True
 
 
-# Session management
-async def set_session(session_id: str, user_data: Dict[str, Any], expire: int = 86400) -> bool:
-    """Set user session data"""
-    return await set_cache(f"session:{session_id}", user_data, expire)
+async def hit_sliding_window(
+    key: str, limits: List[Tuple[int, int]]
+) -> Tuple[bool, int, int, int]:
+    """Check and consume a sliding-window rate limit in a single round trip
+
+    ``limits`` is a list of ``(limit, window_seconds)`` pairs that are enforced
+    together. Returns ``(allowed, remaining, retry_after_seconds, limit)``,
+    where ``limit`` is that of the binding window. Fails open when Redis is
+    unavailable.
+    """
+    global _sliding_window_script
+    try:
+        redis_client = await get_redis()
+        if _sliding_window_script is None:
+            _sliding_window_script = redis_client.register_script(SLIDING_WINDOW_LUA)
+        keys = [f"ratelimit:{key}:{window}" for _, window in limits]
+        args = [value for pair in limits for value in pair]
+        allowed, remaining, retry_after, limit = await _sliding_window_script(
+            keys=keys, args=args, client=redis_client
+        )
+        return bool(allowed), int(remaining), int(retry_after), int(limit)
+    except Exception:
+        return True, -1, 0, 0
 
 
-async def get_session(session_id: str) -> Optional[Dict[str, Any]]:
-    """Get user session data"""
-    return await get_cache(f"session:{session_id}")
+# Notification caching
+# Each user has a capped list of recent notifications (newest first) and an
+# unread counter next to it. Writes for many users go out as pipelined
+# chunks, one round trip per chunk instead of several per user.
+NOTIFICATIONS_KEY = "notifications:user:{user_id}"
+NOTIFICATIONS_UNREAD_KEY = "notifications:user:{user_id}:unread"
+NOTIFICATIONS_MAX = 50
+NOTIFICATIONS_TTL = 86400  # 24 hours
 
+# Users per pipeline when fanning out
+NOTIFICATION_BATCH_SIZE = 1000
 
-async def delete_session(session_id: str) -> bool:
-    """Delete user session"""
-    return await delete_cache(f"session:{session_id}")
 
+def _queue_notification(pipe, user_id: str, payload: str) -> None:
+    key = NOTIFICATIONS_KEY.format(user_id=user_id)
+    unread_key = NOTIFICATIONS_UNREAD_KEY.format(user_id=user_id)
+    pipe.lpush(key, payload)
+    pipe.ltrim(key, 0, NOTIFICATIONS_MAX - 1)
+    pipe.expire(key, NOTIFICATIONS_TTL)
+    pipe.incr(unread_key)
+    pipe.expire(unread_key, NOTIFICATIONS_TTL)
 
-# WebSocket connection management
-async def add_ws_connection(user_id: str, connection_id: str) -> bool:
-    """Add WebSocket connection for user"""
+
+async def add_user_notification(user_id: str, notification: Dict[str, Any]) -> bool:
+    """Add user notification to cache"""
     try:
         redis_client = await get_redis()
-        await redis_client.sadd(f"ws:user:{user_id}", connection_id)
-        await redis_client.expire(f"ws:user:{user_id}", 3600)  # 1 hour
+        async with redis_client.pipeline(transaction=False) as pipe:
+            _queue_notification(pipe, user_id, json.dumps(notification))
+            await pipe.execute()
         return True
     except Exception:
         return False
 
 
-async def remove_ws_connection(user_id: str, connection_id: str) -> bool:
-    """Remove WebSocket connection for user"""
+async def add_bulk_notifications(
+    user_ids: Sequence[str],
+    notification: Dict[str, Any],
+    batch_size: int = NOTIFICATION_BATCH_SIZE,
+) -> int:
+    """Add the same notification for many users
+
+    The notification is serialized once and the writes are pipelined
+    ``batch_size`` users at a time. Returns how many users were notified;
+    a chunk that fails is skipped, so the count can fall short.
+    """
+    payload = json.dumps(notification)
+    notified = 0
     try:
         redis_client = await get_redis()
-        await redis_client.srem(f"ws:user:{user_id}", connection_id)
-        return True
     except Exception:
-        return False
+        return 0
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start : start + batch_size]
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for user_id in chunk:
+                    _queue_notification(pipe, user_id, payload)
+                await pipe.execute()
+            notified += len(chunk)
+        except Exception:
+            continue
+    return notified
 
 
-async def get_user_ws_connections(user_id: str) -> list:
-    """Get all WebSocket connections for user"""
+async def get_user_notifications(user_id: str, limit: int = 20) -> list:
+    """Get user notifications from cache"""
+    key = NOTIFICATIONS_KEY.format(user_id=user_id)
     try:
         redis_client = await get_redis()
-        return await redis_client.smembers(f"ws:user:{user_id}")
+        notifications = await redis_client.lrange(key, 0, limit - 1)
+        return [json.loads(n) for n in notifications]
     except Exception:
         return []
 
 
-# Chat message caching
-async def cache_chat_message(thread_id: str, message_data: Dict[str, Any]) -> bool:
-    """Cache recent chat message"""
-    key = f"chat:thread:{thread_id}:recent"
-    return await set_cache(key, message_data, 86400)  # 24 hours
-
-
-async def get_recent_chat_message(thread_id: str) -> Optional[Dict[str, Any]]:
-    """Get recent chat message for thread"""
-    key = f"chat:thread:{thread_id}:recent"
-    return await get_cache(key)
-
-
-# Notification caching
-async def add_user_notification(user_id: str, notification: Dict[str, Any]) -> bool:
-    """Add user notification to cache"""
-    key = f"notifications:user:{user_id}"
+async def get_notifications_with_unread(
+    user_id: str, limit: int = 20
+) -> Tuple[list, int]:
+    """Get user notifications and their unread count in one round trip"""
     try:
         redis_client = await get_redis()
-        # Add to list (newest first)
-        await redis_client.lpush(key, json.dumps(notification))
-        # Keep only last 50 notifications
-        await redis_client.ltrim(key, 0, 49)
-        await redis_client.expire(key, 86400)  # 24 hours
-        return True
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.lrange(NOTIFICATIONS_KEY.format(user_id=user_id), 0, limit - 1)
+            pipe.get(NOTIFICATIONS_UNREAD_KEY.format(user_id=user_id))
+            notifications, unread = await pipe.execute()
+        # Only the newest NOTIFICATIONS_MAX are kept, so no more can be unread
+        return [json.loads(n) for n in notifications], min(
+            int(unread or 0), NOTIFICATIONS_MAX
+        )
     except Exception:
-        return False
+        return [], 0
 
 
-async def get_user_notifications(user_id: str, limit: int = 20) -> list:
-    """Get user notifications from cache"""
-    key = f"notifications:user:{user_id}"
+async def mark_notifications_read(user_id: str) -> bool:
+    """Reset user's unread notification count"""
     try:
         redis_client = await get_redis()
-        notifications = await redis_client.lrange(key, 0, limit - 1)
-        return [json.loads(n) for n in notifications]
+        await redis_client.delete(NOTIFICATIONS_UNREAD_KEY.format(user_id=user_id))
+        return True
     except Exception:
-        return []
+        return False
 
 
 # Health check
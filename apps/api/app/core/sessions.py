@@ -0,0 +1,243 @@
+"""
+Session store for Homlo API
+Sessions are kept in Redis in a compact binary form, held briefly in the
+per-worker local cache, slide forward on use, and are indexed per user so
+logging out everywhere touches only that user's sessions
+"""
+
+import json
+import logging
+import struct
+import time
+import uuid
+from typing import Any, Dict, Optional, Set, Tuple
+
+from prometheus_client import Counter
+
+from app.core.cache import local_cache
+from app.core.config import settings
+from app.core.redis import get_binary_redis, publish_invalidation
+
+logger = logging.getLogger("app.sessions")
+
+SESSION_LOOKUPS = Counter(
+    "session_lookups_total",
+    "Session lookups by where they were answered",
+    ["result"],
+)
+
+SESSION_KEY = "session:{session_id}"
+# Ids of a user's sessions; may hold ids that have since expired
+USER_SESSIONS_KEY = "session:user:{user_id}"
+
+# Encoding: format version, role, user id, created and last refreshed as
+# epoch seconds, then any other fields as compact JSON. The common session
+# of a user id and a role is 26 bytes and decodes without a JSON parse.
+SESSION_FORMAT_VERSION = 1
+_HEADER = struct.Struct(">BB16sII")
+_ROLES = ("guest", "host", "admin")
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES, 1)}
+_NO_USER = bytes(16)
+
+# Delete every session of a user and its index in one step, so a session
+# created concurrently is either removed or stays indexed. Returns the ids
+# of the sessions that still existed.
+REVOKE_LUA = """
+local removed = {}
+for _, id in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if redis.call('UNLINK', ARGV[1] .. id) == 1 then
+        table.insert(removed, id)
+    end
+end
+redis.call('DEL', KEYS[1])
+return removed
+"""
+
+_revoke_script = None
+_refreshing: Set[str] = set()
+
+
+def encode_session(data: Dict[str, Any], created_at: int, refreshed_at: int) -> bytes:
+    """Pack session data with its timestamps"""
+    extras = dict(data)
+    user_bytes = _NO_USER
+    user_id = extras.get("user_id")
+    if user_id is not None:
+        try:
+            user_bytes = uuid.UUID(str(user_id)).bytes
+            if str(user_id) == str(uuid.UUID(bytes=user_bytes)):
+                del extras["user_id"]
+            else:
+                # Not in canonical form; keep it as given
+                user_bytes = _NO_USER
+        except ValueError:
+            user_bytes = _NO_USER
+    role = _ROLE_CODES.get(extras.get("role"), 0)
+    if role:
+        del extras["role"]
+    header = _HEADER.pack(
+        SESSION_FORMAT_VERSION, role, user_bytes, created_at, refreshed_at
+    )
+    if not extras:
+        return header
+    return header + json.dumps(extras, separators=(",", ":")).encode()
+
+
+def decode_session(raw: bytes) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """Unpack (data, created_at, refreshed_at), or None for an unknown format"""
+    if raw[:1] == b"{":
+        # Stored as JSON by the generic cache helpers; rewritten on refresh
+        now = int(time.time())
+        return json.loads(raw), now, now - settings.SESSION_REFRESH_INTERVAL
+    if len(raw) < _HEADER.size or raw[0] != SESSION_FORMAT_VERSION:
+        return None
+    _, role, user_bytes, created_at, refreshed_at = _HEADER.unpack_from(raw)
+    data = json.loads(raw[_HEADER.size :]) if len(raw) > _HEADER.size else {}
+    if user_bytes != _NO_USER:
+        # Same as str(uuid.UUID(bytes=...)) at a quarter of the cost
+        h = user_bytes.hex()
+        data["user_id"] = f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+    if role:
+        data["role"] = _ROLES[role - 1]
+    return data, created_at, refreshed_at
+
+
+def _cache_locally(key: str, entry: Tuple[Dict[str, Any], int, int]) -> None:
+    # Without L1 there is no invalidation listener to drop revoked sessions
+    if settings.CACHE_L1_ENABLED:
+        local_cache.set(key, entry, settings.SESSION_LOCAL_TTL)
+
+
+async def set_session(session_id: str, user_data: Dict[str, Any]) -> bool:
+    """Store a session and index it under its user
+
+    The session expires after SESSION_TTL without use and SESSION_MAX_AGE
+    after it was created, whichever comes first.
+    """
+    key = SESSION_KEY.format(session_id=session_id)
+    now = int(time.time())
+    try:
+        redis_client = await get_binary_redis()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(key, encode_session(user_data, now, now), ex=settings.SESSION_TTL)
+            if user_data.get("user_id") is not None:
+                index_key = USER_SESSIONS_KEY.format(user_id=user_data["user_id"])
+                pipe.sadd(index_key, session_id)
+                # No session outlives SESSION_MAX_AGE, so neither does the
+                # index of the newest one: NX covers a new set, GT extends it
+                pipe.expire(index_key, settings.SESSION_MAX_AGE, nx=True)
+                pipe.expire(index_key, settings.SESSION_MAX_AGE, gt=True)
+            publish_invalidation(pipe, "key", key)
+            result = await pipe.execute()
+        local_cache.delete(key)
+        return bool(result[0])
+    except Exception as e:
+        logger.warning(f"Failed to store session: {e}")
+        return False
+
+
+async def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """Get a session's data, or None if it does not exist or has expired
+
+    Answered from the local cache for up to SESSION_LOCAL_TTL seconds. The
+    idle timeout is pushed forward at most once per
+    SESSION_REFRESH_INTERVAL, not on every request.
+    """
+    key = SESSION_KEY.format(session_id=session_id)
+    entry = local_cache.get(key) if settings.CACHE_L1_ENABLED else None
+    if entry is not None:
+        SESSION_LOOKUPS.labels(result="local").inc()
+    else:
+        try:
+            redis_client = await get_binary_redis()
+            raw = await redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read session: {e}")
+            return None
+        entry = decode_session(raw) if raw is not None else None
+        if entry is None:
+            SESSION_LOOKUPS.labels(result="missing").inc()
+            return None
+        SESSION_LOOKUPS.labels(result="redis").inc()
+        _cache_locally(key, entry)
+
+    data, created_at, refreshed_at = entry
+    now = int(time.time())
+    if now - created_at >= settings.SESSION_MAX_AGE:
+        await delete_session(session_id)
+        return None
+    if (
+        now - refreshed_at >= settings.SESSION_REFRESH_INTERVAL
+        and session_id not in _refreshing
+    ):
+        await _refresh_session(session_id, data, created_at, now)
+    # Cached entries are shared between requests
+    return dict(data)
+
+
+async def _refresh_session(
+    session_id: str, data: Dict[str, Any], created_at: int, now: int
+) -> None:
+    """Restart a session's idle timeout and record when that happened"""
+    key = SESSION_KEY.format(session_id=session_id)
+    _refreshing.add(session_id)
+    try:
+        redis_client = await get_binary_redis()
+        # XX: a session revoked since it was read must stay gone
+        refreshed = await redis_client.set(
+            key, encode_session(data, created_at, now), ex=settings.SESSION_TTL, xx=True
+        )
+        if refreshed:
+            _cache_locally(key, (data, created_at, now))
+        else:
+            local_cache.delete(key)
+    except Exception as e:
+        # Retried on the next request
+        logger.warning(f"Failed to refresh session: {e}")
+    finally:
+        _refreshing.discard(session_id)
+
+
+async def delete_session(session_id: str) -> bool:
+    """Delete a session (log out)"""
+    key = SESSION_KEY.format(session_id=session_id)
+    local_cache.delete(key)
+    try:
+        redis_client = await get_binary_redis()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            publish_invalidation(pipe, "key", key)
+            result = await pipe.execute()
+        # A stale id left in the user's index is dropped on revocation
+        return bool(result[0])
+    except Exception:
+        return False
+
+
+async def revoke_user_sessions(user_id: str) -> int:
+    """Delete every session of a user (log out everywhere)
+
+    Costs O(user's sessions): their ids come from the user's index rather
+    than a keyspace scan. Returns the number of sessions revoked.
+    """
+    global _revoke_script
+    redis_client = await get_binary_redis()
+    if _revoke_script is None:
+        _revoke_script = redis_client.register_script(REVOKE_LUA)
+    ids = await _revoke_script(
+        keys=[USER_SESSIONS_KEY.format(user_id=user_id)],
+        args=[SESSION_KEY.format(session_id="")],
+        client=redis_client,
+    )
+    keys = [SESSION_KEY.format(session_id=session_id.decode()) for session_id in ids]
+    for key in keys:
+        local_cache.delete(key)
+    if keys:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                publish_invalidation(pipe, "keys", "\n".join(keys))
+                await pipe.execute()
+        except Exception as e:
+            # Other workers drop their copies within SESSION_LOCAL_TTL anyway
+            logger.warning(f"Failed to announce revoked sessions: {e}")
+    return len(keys)
@@ -0,0 +1,154 @@
+"""
+Startup warmup for Homlo API
+Times each startup phase, and warms a new worker before it reports ready:
+pooled connections with the hot statements prepared, the geo index, and a
+local cache loaded with what the other workers are serving
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+
+from prometheus_client import Gauge
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.startup")
+
+STARTUP_PHASE_SECONDS = Gauge(
+    "app_startup_phase_seconds",
+    "Duration of each startup phase of this worker",
+    ["phase"],
+    multiprocess_mode="mostrecent",
+)
+
+_tasks: List[asyncio.Task] = []
+
+
+class Startup:
+    """Timings of this worker's startup phases, and whether it is ready"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = round(seconds, 4)
+        STARTUP_PHASE_SECONDS.labels(phase=name).set(seconds)
+        logger.info(f"Startup phase {name} took {seconds * 1000:.0f}ms")
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.record("total", time.perf_counter() - self.started_at)
+
+
+startup = Startup()
+
+
+def _hot_statements() -> List[Tuple[str, dict]]:
+    """Statements on hot paths, with parameters that match nothing"""
+    from app.services.search import SEARCH_QUERY, TITLE_TYPEAHEAD_QUERY
+
+    return [
+        (SEARCH_QUERY, {"query": "", "city": None, "limit": 0, "offset": 0}),
+        (TITLE_TYPEAHEAD_QUERY, {"query": "", "limit": 0}),
+    ]
+
+
+async def _prefill_pool() -> None:
+    from app.core.database import prefill_pool
+
+    if settings.DATABASE_POOL_PREFILL:
+        opened = await prefill_pool(settings.DATABASE_POOL_PREFILL, _hot_statements())
+        logger.info(f"Database pool prefilled with {opened} connections")
+
+
+async def _load_geo_index() -> None:
+    from app.services.geo_index import geo_index, wait_for_geo_index
+
+    if settings.GEO_INDEX_ENABLED and not await wait_for_geo_index(
+        settings.STARTUP_WARMUP_TIMEOUT
+    ):
+        logger.warning(
+            "Geo index is not loaded; nearby search uses PostGIS until it is"
+        )
+    elif geo_index.ready:
+        logger.info(f"Geo index ready with {len(geo_index)} listings")
+
+
+async def _warm_local_cache(session_factory) -> None:
+    from app.core.redis import warm_local_cache
+    from app.services.places import CITIES
+    from app.services.search import MIN_TITLE_QUERY_LENGTH, typeahead
+
+    loaded = await warm_local_cache()
+    # The first keystrokes of a city name are the most common typeahead
+    async with session_factory() as db:
+        for city in CITIES:
+            await typeahead(db, city["name"][:MIN_TITLE_QUERY_LENGTH])
+    logger.info(
+        f"Local cache warmed with {loaded} hot keys and {len(CITIES)} city suggestions"
+    )
+
+
+async def warm_up(session_factory) -> None:
+    """Run the warmup steps, then mark the worker ready
+
+    A step that fails or takes longer than STARTUP_WARMUP_TIMEOUT is logged
+    and skipped: a worker that is slow for its first requests is better
+    than one that never becomes ready.
+    """
+    steps = [
+        ("db_pool", _prefill_pool),
+        ("geo_index", _load_geo_index),
+        ("local_cache", lambda: _warm_local_cache(session_factory)),
+    ]
+    for name, step in steps:
+        async with startup.phase(name):
+            try:
+                await asyncio.wait_for(step(), settings.STARTUP_WARMUP_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Startup warmup step {name} failed: {e!r}")
+    startup.mark_ready()
+
+
+async def _record_hot_keys() -> None:
+    from app.core.redis import record_hot_keys
+
+    while True:
+        await asyncio.sleep(settings.CACHE_WARM_SNAPSHOT_INTERVAL)
+        try:
+            await record_hot_keys(settings.CACHE_WARM_KEYS)
+        except Exception as e:
+            logger.warning(f"Failed to record hot cache keys: {e}")
+
+
+def start_warmup(session_factory) -> None:
+    """Warm up in the background; readiness checks fail until it is done"""
+    if _tasks:
+        return
+    _tasks.append(asyncio.create_task(warm_up(session_factory)))
+    if settings.CACHE_L1_ENABLED:
+        _tasks.append(asyncio.create_task(_record_hot_keys()))
+
+
+async def stop_warmup() -> None:
+    for task in _tasks:
+        task.cancel()
+    for task in _tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _tasks.clear()
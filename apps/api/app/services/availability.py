@@ -0,0 +1,436 @@
+"""
+Availability index for date-range search
+Per-listing Redis bitmaps of blocked days over a rolling window, one bit per
+day from a base day stored in each key
+"""
+
+import logging
+import uuid
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_binary_redis
+
+logger = logging.getLogger("app.availability")
+
+# Booking statuses that hold the listing's nights
+BLOCKING_BOOKING_STATUSES = ("pending", "confirmed")
+
+# Calendar blocks and bookings are kept in separate bitmaps so either can be
+# cleared without checking the other; a day is unavailable if set in either.
+CALENDAR_KEY = "avail:calendar:{listing_id}"
+BOOKED_KEY = "avail:booked:{listing_id}"
+
+# Each value is a 4-byte big-endian header holding the key's base day (a
+# proleptic ordinal, always a multiple of 8 so whole bytes can be dropped),
+# followed by one bit per day from the base. Writes move the base up to the
+# start of the window, so a bitmap spans the window rather than every day
+# since it was created.
+HEADER_SIZE = 4
+
+_LUA_BASE = """
+local function decode_base(header)
+    local b1, b2, b3, b4 = string.byte(header, 1, 4)
+    return ((b1 * 256 + b2) * 256 + b3) * 256 + b4
+end
+
+local function encode_base(base)
+    return string.char(
+        math.floor(base / 16777216) % 256, math.floor(base / 65536) % 256,
+        math.floor(base / 256) % 256, base % 256
+    )
+end
+"""
+
+# ARGV: the window's base day, then (day, bit) pairs. Drops the bytes before
+# the window's base, then sets the bits; with no pairs it only trims, and
+# does not create missing keys. Days before the base are in the past and
+# are ignored.
+SET_DAYS_LUA = (
+    _LUA_BASE
+    + """
+local floor = tonumber(ARGV[1])
+local header = redis.call('GETRANGE', KEYS[1], 0, 3)
+local base
+if #header < 4 then
+    if #ARGV == 1 then
+        return 0
+    end
+    base = floor
+    redis.call('SET', KEYS[1], encode_base(base))
+else
+    base = decode_base(header)
+    if floor - base >= 8 then
+        local shift = math.floor((floor - base) / 8)
+        local bits = redis.call('GETRANGE', KEYS[1], 4 + shift, -1)
+        base = base + shift * 8
+        redis.call('SET', KEYS[1], encode_base(base) .. bits)
+    end
+end
+for i = 2, #ARGV, 2 do
+    local offset = tonumber(ARGV[i]) - base
+    if offset >= 0 then
+        redis.call('SETBIT', KEYS[1], 32 + offset, tonumber(ARGV[i + 1]))
+    end
+end
+return 1
+"""
+)
+
+# ARGV: first day (a multiple of 8) and width in bytes. Returns each key's
+# bytes from that day, aligned across keys whatever their base; days before
+# a key's base read as free.
+READ_DAYS_LUA = (
+    _LUA_BASE
+    + """
+local first_day = tonumber(ARGV[1])
+local width = tonumber(ARGV[2])
+local chunks = {}
+for i = 1, #KEYS do
+    local chunk = ''
+    local header = redis.call('GETRANGE', KEYS[i], 0, 3)
+    if #header == 4 then
+        local first = (first_day - decode_base(header)) / 8
+        if first >= 0 then
+            chunk = redis.call('GETRANGE', KEYS[i], 4 + first, 3 + first + width)
+        elseif first + width > 0 then
+            chunk = string.rep(string.char(0), -first) .. redis.call('GETRANGE', KEYS[i], 4, 3 + first + width)
+        end
+    end
+    chunks[i] = chunk
+end
+return chunks
+"""
+)
+
+_set_days_script = None
+_read_days_script = None
+
+
+def day_number(day: date) -> int:
+    """Absolute day number of a day"""
+    return day.toordinal()
+
+
+def index_window(today: Optional[date] = None) -> Tuple[date, date]:
+    """Range of days [start, end) kept in the index"""
+    today = today or date.today()
+    return today - timedelta(days=1), today + timedelta(
+        days=settings.AVAILABILITY_WINDOW_DAYS
+    )
+
+
+def index_base(window_start: date) -> int:
+    """Base day for bitmaps covering a window starting at window_start"""
+    return day_number(window_start) // 8 * 8
+
+
+def encode_bitmap(base: int, days: np.ndarray) -> bytes:
+    """Stored value for boolean day array ``days`` starting at day ``base``"""
+    return base.to_bytes(HEADER_SIZE, "big") + np.packbits(days).tobytes()
+
+
+def _scripts(redis_client):
+    global _set_days_script, _read_days_script
+    if _set_days_script is None:
+        _set_days_script = redis_client.register_script(SET_DAYS_LUA)
+        _read_days_script = redis_client.register_script(READ_DAYS_LUA)
+    return _set_days_script, _read_days_script
+
+
+async def _set_days(key: str, days: Dict[date, bool]) -> None:
+    """Set or clear the bits for the given days in one script call"""
+    redis_client = await get_binary_redis()
+    set_days, _ = _scripts(redis_client)
+    args = [index_base(index_window()[0])]
+    for day, blocked in days.items():
+        args += [day_number(day), int(blocked)]
+    await set_days(keys=[key], args=args, client=redis_client)
+
+
+async def _read_days(
+    redis_client, keys: Sequence[str], first_day: int, width: int
+) -> List[bytes]:
+    """``width`` bytes of each key's bitmap from ``first_day``, zero padded"""
+    _, read_days = _scripts(redis_client)
+    chunks = await read_days(
+        keys=list(keys), args=[first_day, width], client=redis_client
+    )
+    return [chunk.ljust(width, b"\0") for chunk in chunks]
+
+
+def _date_range(start: date, end: date) -> List[date]:
+    """Days in [start, end)"""
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+async def update_booking_days(
+    listing_id: str, check_in: date, check_out: date, status: str
+) -> None:
+    """Reflect a booking's nights in the index after it is created or changes status
+
+    When a booking's dates change, call this for the old range with a
+    non-blocking status first.
+    """
+    blocked = status in BLOCKING_BOOKING_STATUSES
+    await _set_days(
+        BOOKED_KEY.format(listing_id=listing_id),
+        {day: blocked for day in _date_range(check_in, check_out)},
+    )
+
+
+async def update_calendar_days(listing_id: str, days: Dict[date, bool]) -> None:
+    """Reflect host calendar changes ({day: is_blocked}) in the index"""
+    if days:
+        await _set_days(CALENDAR_KEY.format(listing_id=listing_id), days)
+
+
+async def set_calendar_days(
+    db: AsyncSession, listing_id: str, days: Dict[date, bool]
+) -> None:
+    """Save a host's calendar changes ({day: is_blocked}) and update the index
+
+    Only blocked days are stored as calendars rows; unblocking a day deletes
+    its row. The index is updated once the rows are committed.
+    """
+    if not days:
+        return
+    listing_id = str(listing_id)
+    await db.execute(
+        text("DELETE FROM calendars WHERE listing_id = :listing_id AND date = :day"),
+        [{"listing_id": listing_id, "day": day} for day in days],
+    )
+    blocked = [day for day, is_blocked in days.items() if is_blocked]
+    if blocked:
+        await db.execute(
+            text(
+                """
+                INSERT INTO calendars (id, listing_id, date, is_blocked, created_at)
+                VALUES (:id, :listing_id, :day, TRUE, CURRENT_TIMESTAMP)
+            """
+            ),
+            [
+                {"id": str(uuid.uuid4()), "listing_id": listing_id, "day": day}
+                for day in blocked
+            ],
+        )
+    await db.commit()
+
+    try:
+        await update_calendar_days(listing_id, days)
+    except Exception as e:
+        # check_index --repair brings the index back in line
+        logger.warning(
+            f"Failed to update availability index for listing {listing_id}: {e}"
+        )
+
+
+async def free_listings(
+    listing_ids: Sequence[str], check_in: date, check_out: date
+) -> List[str]:
+    """Return the listings among listing_ids with no blocked night in [check_in, check_out)
+
+    Fetches only the bytes covering the stay for every listing in a single
+    script call, then tests all of them at once with NumPy bit operations.
+    """
+    if check_in >= check_out:
+        raise ValueError("check_out must be after check_in")
+    window_start, window_end = index_window()
+    if check_in < window_start or check_out > window_end:
+        raise ValueError("Date range is outside the availability index window")
+    if not listing_ids:
+        return []
+
+    start, end = day_number(check_in), day_number(check_out)
+    first_day = start // 8 * 8
+    width = (end - first_day + 7) // 8
+
+    keys = []
+    for listing_id in listing_ids:
+        keys += [
+            CALENDAR_KEY.format(listing_id=listing_id),
+            BOOKED_KEY.format(listing_id=listing_id),
+        ]
+    redis_client = await get_binary_redis()
+    # Bitmaps shorter than the range read as zero (free)
+    raw = b"".join(await _read_days(redis_client, keys, first_day, width))
+    packed = np.frombuffer(raw, dtype=np.uint8).reshape(len(listing_ids), 2, width)
+    blocked = np.unpackbits(packed[:, 0] | packed[:, 1], axis=1)
+    stay = blocked[:, start - first_day : end - first_day]
+    is_free = ~stay.any(axis=1)
+
+    return [listing_id for listing_id, free in zip(listing_ids, is_free) if free]
+
+
+async def load_expected_bitmaps(
+    db: AsyncSession, window: Optional[Tuple[date, date]] = None
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Build (calendar, booked) day arrays per listing from the SQL tables
+
+    Arrays are boolean, indexed by day number minus ``index_base`` of the
+    window start, and run to the end of the window; only days inside the
+    window are populated.
+    """
+    window_start, window_end = window or index_window()
+    base = index_base(window_start)
+    length = day_number(window_end) - base
+    bitmaps: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def bitmaps_for(listing_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        if listing_id not in bitmaps:
+            bitmaps[listing_id] = (
+                np.zeros(length, dtype=bool),
+                np.zeros(length, dtype=bool),
+            )
+        return bitmaps[listing_id]
+
+    calendar_rows = await db.execute(
+        text(
+            """
+            SELECT listing_id::text, date FROM calendars
+            WHERE is_blocked AND date >= :start AND date < :end
+        """
+        ),
+        {"start": window_start, "end": window_end},
+    )
+    for listing_id, day in calendar_rows:
+        bitmaps_for(listing_id)[0][day_number(day) - base] = True
+
+    booking_rows = await db.execute(
+        text(
+            """
+            SELECT listing_id::text, check_in, check_out FROM bookings
+            WHERE status = ANY(:statuses) AND check_out > :start AND check_in < :end
+        """
+        ),
+        {
+            "statuses": list(BLOCKING_BOOKING_STATUSES),
+            "start": window_start,
+            "end": window_end,
+        },
+    )
+    for listing_id, check_in, check_out in booking_rows:
+        first = day_number(max(check_in, window_start)) - base
+        last = day_number(min(check_out, window_end)) - base
+        bitmaps_for(listing_id)[1][first:last] = True
+
+    return bitmaps
+
+
+async def rebuild_index(db: AsyncSession, batch_size: int = 1000) -> int:
+    """Rebuild every listing's bitmaps from the SQL tables
+
+    Keys without any blocked day in the window are removed. Incremental
+    updates that land while the rebuild runs can be overwritten, so run
+    ``check_index`` afterwards. Returns the number of listings written.
+    """
+    base = index_base(index_window()[0])
+    bitmaps = await load_expected_bitmaps(db)
+    expected_keys = set()
+    redis_client = await get_binary_redis()
+
+    items = list(bitmaps.items())
+    for start in range(0, len(items), batch_size):
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for listing_id, (calendar, booked) in items[start : start + batch_size]:
+                for key, days in ((CALENDAR_KEY, calendar), (BOOKED_KEY, booked)):
+                    key = key.format(listing_id=listing_id)
+                    if days.any():
+                        expected_keys.add(key.encode())
+                        pipe.set(key, encode_bitmap(base, days))
+            await pipe.execute()
+
+    stale = []
+    async for key in redis_client.scan_iter(match="avail:*", count=batch_size):
+        if key not in expected_keys:
+            stale.append(key)
+    for start in range(0, len(stale), batch_size):
+        await redis_client.unlink(*stale[start : start + batch_size])
+
+    return len(bitmaps)
+
+
+async def trim_index(batch_size: int = 1000) -> int:
+    """Drop the bytes before the window from every bitmap
+
+    Writes trim the keys they touch; this catches listings that have not
+    changed since their window moved on. Returns the number of keys checked.
+    """
+    redis_client = await get_binary_redis()
+    set_days, _ = _scripts(redis_client)
+    floor = index_base(index_window()[0])
+    checked = 0
+    keys = []
+    async for key in redis_client.scan_iter(match="avail:*", count=batch_size):
+        keys.append(key)
+        if len(keys) == batch_size:
+            checked += await _trim_keys(redis_client, set_days, keys, floor)
+            keys = []
+    if keys:
+        checked += await _trim_keys(redis_client, set_days, keys, floor)
+    return checked
+
+
+async def _trim_keys(redis_client, set_days, keys: List[bytes], floor: int) -> int:
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            await set_days(keys=[key], args=[floor], client=pipe)
+        await pipe.execute()
+    return len(keys)
+
+
+async def check_index(
+    db: AsyncSession,
+    listing_ids: Optional[Sequence[str]] = None,
+    batch_size: int = 1000,
+) -> Dict[str, List[date]]:
+    """Compare the index with the SQL tables inside the window
+
+    Checks listing_ids, or every listing with blocked days in either source
+    when omitted. Returns {listing_id: [days that disagree]} for inconsistent
+    listings.
+    """
+    window_start, window_end = index_window()
+    base = index_base(window_start)
+    start, end = day_number(window_start) - base, day_number(window_end) - base
+    width = (end + 7) // 8
+    bitmaps = await load_expected_bitmaps(db, (window_start, window_end))
+    redis_client = await get_binary_redis()
+
+    if listing_ids is None:
+        indexed = set()
+        async for key in redis_client.scan_iter(match="avail:*"):
+            indexed.add(key.decode().rsplit(":", 1)[1])
+        listing_ids = sorted(indexed | set(bitmaps))
+
+    empty = np.zeros(end, dtype=bool)
+    mismatches: Dict[str, List[date]] = {}
+
+    for chunk_start in range(0, len(listing_ids), batch_size):
+        chunk = listing_ids[chunk_start : chunk_start + batch_size]
+        keys = []
+        for listing_id in chunk:
+            keys += [
+                CALENDAR_KEY.format(listing_id=listing_id),
+                BOOKED_KEY.format(listing_id=listing_id),
+            ]
+        raw = await _read_days(redis_client, keys, base, width)
+
+        for i, listing_id in enumerate(chunk):
+            expected = bitmaps.get(listing_id, (empty, empty))
+            bad = np.zeros(end - start, dtype=bool)
+            for actual_raw, expected_days in zip(raw[2 * i : 2 * i + 2], expected):
+                actual = np.unpackbits(np.frombuffer(actual_raw, dtype=np.uint8))
+                actual = actual[start:end].astype(bool)
+                bad |= actual != expected_days[start:end]
+            if bad.any():
+                mismatches[listing_id] = [
+                    window_start + timedelta(days=int(i)) for i in np.flatnonzero(bad)
+                ]
+
+    return mismatches
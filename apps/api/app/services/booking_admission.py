@@ -0,0 +1,324 @@
+"""
+Booking admission for Homlo API
+Serializes booking attempts per listing and rejects conflicting stays early
+"""
+
+import asyncio
+import bisect
+import logging
+import random
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import local_cache
+from app.core.config import settings
+from app.core.redis import delete_cache, get_redis
+from app.services.availability import BLOCKING_BOOKING_STATUSES, update_booking_days
+
+logger = logging.getLogger("app.booking_admission")
+
+BOOKING_ADMISSIONS = Counter(
+    "booking_admissions_total",
+    "Booking attempts by outcome",
+    ["result"],
+)
+BOOKING_LEASE_WAIT = Histogram(
+    "booking_lease_wait_seconds",
+    "Time spent waiting for a listing's booking lease",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+LEASE_KEY = "booking:lease:{listing_id}"
+INTERVALS_KEY = "booking:intervals:{listing_id}"
+
+# Postgres exclusion_violation, raised by the bookings overlap constraint
+EXCLUSION_VIOLATION = "23P01"
+
+# Release the lease only if we still hold it
+RELEASE_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_release_lease_script = None
+
+# Per-worker queue in front of the Redis lease, so waiters in one worker do
+# not all poll Redis; entries disappear once no attempt holds them
+_listing_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+class BookingConflict(Exception):
+    """The requested stay overlaps an existing booking"""
+
+
+class BookingBusy(Exception):
+    """The listing's booking lease could not be acquired in time"""
+
+
+class BookedIntervals:
+    """Immutable sorted set of non-overlapping [check_in, check_out) day ranges"""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, ranges=()):
+        ranges = sorted((start.toordinal(), end.toordinal()) for start, end in ranges)
+        self.starts = tuple(start for start, _ in ranges)
+        self.ends = tuple(end for _, end in ranges)
+
+    def overlaps(self, check_in: date, check_out: date) -> bool:
+        """Whether [check_in, check_out) overlaps any booked range"""
+        # Only the last range starting before check_out can overlap, since
+        # ranges never overlap each other
+        i = bisect.bisect_left(self.starts, check_out.toordinal())
+        return i > 0 and self.ends[i - 1] > check_in.toordinal()
+
+    def add(self, check_in: date, check_out: date) -> "BookedIntervals":
+        """Copy with another range added"""
+        added = BookedIntervals()
+        i = bisect.bisect_left(self.starts, check_in.toordinal())
+        added.starts = self.starts[:i] + (check_in.toordinal(),) + self.starts[i:]
+        added.ends = self.ends[:i] + (check_out.toordinal(),) + self.ends[i:]
+        return added
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+async def load_booked_intervals(db: AsyncSession, listing_id: str) -> BookedIntervals:
+    """Load a listing's current and future blocking bookings"""
+    result = await db.execute(
+        text(
+            """
+            SELECT check_in, check_out FROM bookings
+            WHERE listing_id = :listing_id AND status IN :statuses AND check_out > :today
+        """
+        ).bindparams(bindparam("statuses", expanding=True)),
+        {
+            "listing_id": listing_id,
+            "statuses": list(BLOCKING_BOOKING_STATUSES),
+            "today": date.today(),
+        },
+    )
+    return BookedIntervals(
+        (_as_date(check_in), _as_date(check_out)) for check_in, check_out in result
+    )
+
+
+def _remember_intervals(listing_id: str, intervals: BookedIntervals) -> None:
+    if settings.CACHE_L1_ENABLED:
+        local_cache.set(
+            INTERVALS_KEY.format(listing_id=listing_id),
+            intervals,
+            settings.BOOKING_INTERVAL_CACHE_TTL,
+        )
+
+
+async def forget_booked_intervals(listing_id: str) -> None:
+    """Drop cached intervals in every worker, e.g. after a booking is cancelled"""
+    await delete_cache(INTERVALS_KEY.format(listing_id=listing_id))
+
+
+async def _acquire_lease(key: str, deadline: float) -> Optional[str]:
+    """Take the Redis lease, retrying with jittered backoff until deadline"""
+    redis_client = await get_redis()
+    token = uuid.uuid4().hex
+    delay = 0.005
+    while True:
+        if await redis_client.set(
+            key, token, nx=True, px=settings.BOOKING_LEASE_TTL_MS
+        ):
+            return token
+        if time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(delay * (0.5 + random.random()))
+        delay = min(delay * 2, 0.1)
+
+
+async def _release_lease(key: str, token: str) -> None:
+    global _release_lease_script
+    try:
+        redis_client = await get_redis()
+        if _release_lease_script is None:
+            _release_lease_script = redis_client.register_script(RELEASE_LEASE_LUA)
+        await _release_lease_script(keys=[key], args=[token])
+    except Exception:
+        # The lease expires on its own
+        pass
+
+
+@asynccontextmanager
+async def listing_lease(db: AsyncSession, listing_id: str):
+    """Hold the exclusive right to book a listing
+
+    Attempts queue on a per-worker lock first, then on a Redis lease shared
+    by all workers. If Redis is unavailable, a transaction-scoped Postgres
+    advisory lock is taken instead. Raises BookingBusy if the lease is not
+    acquired within BOOKING_LEASE_WAIT_SECONDS.
+    """
+    started = time.monotonic()
+    deadline = started + settings.BOOKING_LEASE_WAIT_SECONDS
+
+    lock = _listing_locks.get(listing_id)
+    if lock is None:
+        lock = _listing_locks[listing_id] = asyncio.Lock()
+    try:
+        await asyncio.wait_for(
+            lock.acquire(), timeout=settings.BOOKING_LEASE_WAIT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise BookingBusy(listing_id)
+
+    try:
+        key = LEASE_KEY.format(listing_id=listing_id)
+        try:
+            token = await _acquire_lease(key, deadline)
+            redis_available = True
+        except Exception as e:
+            logger.warning(f"Booking lease unavailable, using advisory lock: {e}")
+            token, redis_available = None, False
+
+        if not redis_available:
+            await db.execute(
+                text("SELECT pg_advisory_xact_lock(hashtextextended(:key, 0))"),
+                {"key": key},
+            )
+        elif token is None:
+            raise BookingBusy(listing_id)
+        BOOKING_LEASE_WAIT.observe(time.monotonic() - started)
+
+        try:
+            yield
+        finally:
+            if token is not None:
+                await _release_lease(key, token)
+    finally:
+        lock.release()
+
+
+def is_overlap_violation(error: IntegrityError) -> bool:
+    """Whether an insert failed on the bookings overlap exclusion constraint
+
+    Other integrity errors (a missing listing or guest, NOT NULL) are bugs
+    rather than taken dates and must not surface as BookingConflict.
+    """
+    return getattr(error.orig, "sqlstate", None) == EXCLUSION_VIOLATION
+
+
+async def _insert_booking(db: AsyncSession, values: Dict[str, Any]) -> str:
+    booking_id = str(values.get("id") or uuid.uuid4())
+    now = datetime.utcnow()
+    await db.execute(
+        text(
+            """
+            INSERT INTO bookings (
+                id, listing_id, guest_id, check_in, check_out, guests_count, status,
+                total_pkr, currency, payment_status, cancellation_policy, created_at, updated_at
+            ) VALUES (
+                :id, :listing_id, :guest_id, :check_in, :check_out, :guests_count, :status,
+                :total_pkr, :currency, :payment_status, :cancellation_policy, :created_at, :updated_at
+            )
+        """
+        ),
+        {
+            "id": booking_id,
+            "listing_id": str(values["listing_id"]),
+            "guest_id": str(values["guest_id"]),
+            "check_in": values["check_in"],
+            "check_out": values["check_out"],
+            "guests_count": values.get("guests_count", 1),
+            "status": values.get("status", "pending"),
+            "total_pkr": values.get("total_pkr"),
+            "currency": values.get("currency", "PKR"),
+            "payment_status": values.get("payment_status", "pending"),
+            "cancellation_policy": values.get("cancellation_policy"),
+            "created_at": now,
+            "updated_at": now,
+        },
+    )
+    return booking_id
+
+
+async def admit_booking(
+    db: AsyncSession,
+    booking: Dict[str, Any],
+    prepare: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None,
+) -> str:
+    """Create a booking unless its stay conflicts with an existing one
+
+    ``booking`` holds the bookings columns (listing_id, guest_id, check_in,
+    check_out, ...). Stays that overlap this worker's cached intervals are
+    rejected without touching the database. Everything else is checked
+    against Postgres while holding the listing's lease, then ``prepare`` (e.g.
+    pricing) runs and its values are merged into the row before the insert.
+    The exclusion constraint stays the final guard. Returns the booking id;
+    raises BookingConflict or BookingBusy.
+    """
+    listing_id = str(booking["listing_id"])
+    check_in, check_out = booking["check_in"], booking["check_out"]
+    if check_in >= check_out:
+        raise ValueError("check_out must be after check_in")
+
+    cached = local_cache.get(INTERVALS_KEY.format(listing_id=listing_id))
+    if cached is not None and cached.overlaps(check_in, check_out):
+        BOOKING_ADMISSIONS.labels(result="rejected_early").inc()
+        raise BookingConflict(listing_id)
+
+    try:
+        async with listing_lease(db, listing_id):
+            intervals = await load_booked_intervals(db, listing_id)
+            if intervals.overlaps(check_in, check_out):
+                _remember_intervals(listing_id, intervals)
+                BOOKING_ADMISSIONS.labels(result="rejected_locked").inc()
+                raise BookingConflict(listing_id)
+
+            values = dict(booking)
+            if prepare is not None:
+                values.update(await prepare())
+
+            try:
+                booking_id = await _insert_booking(db, values)
+                await db.commit()
+            except IntegrityError as e:
+                await db.rollback()
+                if not is_overlap_violation(e):
+                    raise
+                await forget_booked_intervals(listing_id)
+                BOOKING_ADMISSIONS.labels(result="rejected_db").inc()
+                raise BookingConflict(listing_id)
+
+            status = values.get("status", "pending")
+            if status in BLOCKING_BOOKING_STATUSES:
+                _remember_intervals(listing_id, intervals.add(check_in, check_out))
+    except BookingBusy:
+        BOOKING_ADMISSIONS.labels(result="busy").inc()
+        raise
+
+    BOOKING_ADMISSIONS.labels(result="admitted").inc()
+    try:
+        await update_booking_days(listing_id, check_in, check_out, status)
+    except Exception as e:
+        logger.warning(
+            f"Failed to update availability index for listing {listing_id}: {e}"
+        )
+    return booking_id
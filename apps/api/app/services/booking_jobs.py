@@ -0,0 +1,383 @@
+"""
+Scheduled booking jobs for Homlo API
+Booking reminders and host payouts, walked incrementally from a persisted
+high-water mark in fixed-size keyset chunks
+"""
+
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger("app.booking_jobs")
+
+BOOKING_JOB_ITEMS = Counter(
+    "booking_job_items_total",
+    "Bookings handled by the scheduled booking jobs",
+    ["job", "result"],
+)
+BOOKING_JOB_LAG = Gauge(
+    "booking_job_lag_seconds",
+    "How long the oldest pending booking had been due when the job last ran",
+    ["job"],
+    multiprocess_mode="mostrecent",
+)
+
+JOB_CURSOR_KEY = "jobs:{job}:cursor"
+JOB_LAST_RUN_KEY = "jobs:{job}:last_run"
+REMINDER_SENT_KEY = "booking:reminder:{booking_id}"
+
+# Sorts before every booking id of a day
+NIL_ID = "00000000-0000-0000-0000-000000000000"
+
+# Payout ids are derived from the booking id, so the primary key admits at
+# most one payout per booking however often a chunk runs
+PAYOUT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "https://homlo.pk/payouts")
+
+REMINDER_SUBJECT = "Your stay in {{ city }} starts on {{ check_in }}"
+
+# Cursors are "YYYY-MM-DD|uuid", which sort as text the way (check_in, id)
+# sorts in Postgres; an overlapping run can never move the mark backwards
+ADVANCE_CURSOR_LUA = """
+local current = redis.call('GET', KEYS[1])
+if not current or ARGV[1] > current then
+    redis.call('SET', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+Cursor = Tuple[date, str]
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    return f"{cursor[0].isoformat()}|{cursor[1]}"
+
+
+def decode_cursor(value: Optional[str]) -> Optional[Cursor]:
+    if not value:
+        return None
+    day, booking_id = value.split("|", 1)
+    return date.fromisoformat(day), booking_id
+
+
+class BookingJob(ABC):
+    """Which bookings a scheduled job handles and when each becomes due
+
+    A booking is due ``due_offset`` days from its check-in. Runs walk due
+    bookings in (check_in, id) order from the job's high-water mark.
+    """
+
+    name = ""
+    # SQL condition on the bookings row ``b``
+    eligible = "TRUE"
+
+    @abstractmethod
+    def due_offset(self) -> int:
+        """Days from check-in until a booking is due"""
+
+    def due_until(self, today: date) -> date:
+        """Latest check-in that is due today"""
+        return today - timedelta(days=self.due_offset())
+
+    def due_at(self, check_in: date) -> datetime:
+        return datetime.combine(
+            check_in + timedelta(days=self.due_offset()), datetime.min.time()
+        )
+
+    @abstractmethod
+    def scan_start(self, cursor: Optional[Cursor], today: date) -> Cursor:
+        """Key the run's scan starts after, given the job's mark"""
+
+    def params(self) -> Dict[str, Any]:
+        return {}
+
+
+class ReminderJob(BookingJob):
+    """Reminder emails for confirmed stays starting within the lead time
+
+    Stays that have already started are skipped; bookings confirmed after
+    the mark passed their check-in already got the confirmation email.
+    """
+
+    name = "booking_reminders"
+    eligible = "b.status = 'confirmed'"
+
+    def due_offset(self) -> int:
+        return -settings.BOOKING_REMINDER_LEAD_DAYS
+
+    def scan_start(self, cursor: Optional[Cursor], today: date) -> Cursor:
+        return max(cursor, (today, NIL_ID)) if cursor else (today, NIL_ID)
+
+
+class PayoutJob(BookingJob):
+    """Host payouts for paid stays, due a fixed delay after check-in
+
+    The last PAYOUT_LOOKBACK_DAYS of due check-ins are rescanned on every
+    run so payments completed late are still paid out; bookings that
+    already have their payout are filtered out in the scan. A mark further
+    behind means a backlog, which is walked from the mark. The first run
+    starts at the lookback rather than paying out all history.
+    """
+
+    name = "payouts"
+    eligible = (
+        "b.status IN ('confirmed', 'completed') AND b.payment_status = 'completed' "
+        "AND NOT EXISTS (SELECT 1 FROM payouts p "
+        "WHERE p.id = uuid_generate_v5(CAST(:namespace AS uuid), b.id::text))"
+    )
+
+    def due_offset(self) -> int:
+        return settings.PAYOUT_DELAY_DAYS
+
+    def scan_start(self, cursor: Optional[Cursor], today: date) -> Cursor:
+        lookback = self.due_until(today) - timedelta(days=settings.PAYOUT_LOOKBACK_DAYS)
+        return min(cursor, (lookback, NIL_ID)) if cursor else (lookback, NIL_ID)
+
+    def params(self) -> Dict[str, Any]:
+        return {"namespace": str(PAYOUT_NAMESPACE)}
+
+
+REMINDERS = ReminderJob()
+PAYOUTS = PayoutJob()
+JOBS = {job.name: job for job in (REMINDERS, PAYOUTS)}
+
+
+async def _scan_page(
+    db, job: BookingJob, after: Cursor, until: date, limit: int
+) -> List[Tuple[str, date]]:
+    result = await db.execute(
+        text(
+            f"""
+            SELECT b.id::text, b.check_in FROM bookings b
+            WHERE {job.eligible}
+              AND (b.check_in, b.id) > (:after_day, CAST(:after_id AS uuid))
+              AND b.check_in <= :until
+            ORDER BY b.check_in, b.id
+            LIMIT :limit
+        """
+        ),
+        {
+            "after_day": after[0],
+            "after_id": after[1],
+            "until": until,
+            "limit": limit,
+            **job.params(),
+        },
+    )
+    return [(booking_id, check_in) for booking_id, check_in in result]
+
+
+async def plan_run(job_name: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """Keyset-walk the bookings due since the job's mark and split them into chunks
+
+    Reads at most BOOKING_JOB_MAX_CHUNKS pages of BOOKING_JOB_CHUNK_SIZE ids;
+    ``cursor`` is the key of the last booking planned, to be committed once
+    every chunk has been handled. ``lag_seconds`` is how long the oldest
+    pending booking has been due.
+    """
+    from app.core.database import AsyncSessionLocal
+
+    started_at = time.time()
+    job = JOBS[job_name]
+    today = today or date.today()
+    redis = await get_redis()
+    mark = decode_cursor(await redis.get(JOB_CURSOR_KEY.format(job=job.name)))
+    after = job.scan_start(mark, today)
+    until = job.due_until(today)
+
+    chunks: List[List[str]] = []
+    oldest: Optional[date] = None
+    backlog = False
+    async with AsyncSessionLocal() as db:
+        while True:
+            page = await _scan_page(
+                db, job, after, until, settings.BOOKING_JOB_CHUNK_SIZE
+            )
+            if not page:
+                break
+            oldest = oldest or page[0][1]
+            chunks.append([booking_id for booking_id, _ in page])
+            after = (page[-1][1], page[-1][0])
+            if len(page) < settings.BOOKING_JOB_CHUNK_SIZE:
+                break
+            if len(chunks) == settings.BOOKING_JOB_MAX_CHUNKS:
+                # More due bookings than one run takes; the next run continues
+                backlog = True
+                break
+
+    lag = (
+        max(0.0, (datetime.now() - job.due_at(oldest)).total_seconds())
+        if oldest
+        else 0.0
+    )
+    BOOKING_JOB_LAG.labels(job=job.name).set(lag)
+    return {
+        "job": job.name,
+        "started_at": started_at,
+        "cursor": encode_cursor(after) if chunks else None,
+        "chunks": chunks,
+        "scanned": sum(len(chunk) for chunk in chunks),
+        "lag_seconds": round(lag, 1),
+        "backlog": backlog,
+    }
+
+
+async def finish_run(
+    plan: Dict[str, Any], results: Sequence[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Commit the run's mark once every chunk is done and record its counts"""
+    job = plan["job"]
+    redis = await get_redis()
+    if plan["cursor"]:
+        await redis.eval(
+            ADVANCE_CURSOR_LUA, 1, JOB_CURSOR_KEY.format(job=job), plan["cursor"]
+        )
+
+    counts: Dict[str, Any] = {}
+    for result in results:
+        for key, value in result.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                counts[key] = counts.get(key, 0) + value
+    for key, value in counts.items():
+        if key != "processed" and isinstance(value, int):
+            BOOKING_JOB_ITEMS.labels(job=job, result=key).inc(value)
+
+    summary = {
+        "job": job,
+        "finished_at": datetime.utcnow().isoformat(),
+        "seconds": round(time.time() - plan["started_at"], 3),
+        "cursor": plan["cursor"],
+        "chunks": len(results),
+        "scanned": plan["scanned"],
+        "lag_seconds": plan["lag_seconds"],
+        "backlog": plan["backlog"],
+        **counts,
+    }
+    await redis.set(JOB_LAST_RUN_KEY.format(job=job), json.dumps(summary))
+    logger.info(f"Scheduled job {job} finished: {summary}")
+    return summary
+
+
+async def send_reminders(booking_ids: Sequence[str]) -> Dict[str, Any]:
+    """Email the reminder for each booking that has not had one yet
+
+    Each booking is claimed with SET NX before sending and released if its
+    message fails, so overlapping or retried chunks never send twice.
+    """
+    from app.core.database import AsyncSessionLocal
+    from app.services.mailer import send_bulk
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            text(
+                """
+                SELECT b.id::text, b.check_in, b.check_out, b.guests_count, b.total_pkr,
+                       g.email, g.name, l.title, l.city, h.name
+                FROM bookings b
+                JOIN users g ON g.id = b.guest_id
+                JOIN listings l ON l.id = b.listing_id
+                JOIN users h ON h.id = l.host_id
+                WHERE b.id = ANY(CAST(:ids AS uuid[])) AND b.status = 'confirmed'
+            """
+            ),
+            {"ids": list(booking_ids)},
+        )
+        rows = result.all()
+
+    redis = await get_redis()
+    ttl = (settings.BOOKING_REMINDER_LEAD_DAYS + 2) * 86400
+    async with redis.pipeline(transaction=False) as pipe:
+        for row in rows:
+            pipe.set(REMINDER_SENT_KEY.format(booking_id=row[0]), "1", nx=True, ex=ttl)
+        claimed = [row for row, ok in zip(rows, await pipe.execute()) if ok]
+
+    outcome = {
+        "processed": len(booking_ids),
+        "sent": 0,
+        "failed": 0,
+        "skipped": len(booking_ids) - len(claimed),
+    }
+    if not claimed:
+        return outcome
+
+    recipients = [
+        {
+            "email": email,
+            "context": {
+                "guest_name": guest_name,
+                "listing_title": title,
+                "city": city,
+                "check_in": check_in.isoformat(),
+                "check_out": check_out.isoformat(),
+                "guests_count": guests_count,
+                "total_pkr": total_pkr,
+                "host_name": host_name,
+                "booking_url": f"{settings.WEB_APP_URL}/bookings/{booking_id}",
+            },
+        }
+        for booking_id, check_in, check_out, guests_count, total_pkr, email, guest_name, title, city, host_name in claimed
+    ]
+    sent = await send_bulk("booking_reminder", REMINDER_SUBJECT, recipients)
+
+    failed = [claimed[failure["index"]][0] for failure in sent["failures"]]
+    if failed:
+        await redis.delete(
+            *(REMINDER_SENT_KEY.format(booking_id=booking_id) for booking_id in failed)
+        )
+    if sent["aborted"]:
+        raise ConnectionError(
+            f"Reminder chunk aborted, {len(failed)} bookings released"
+        )
+
+    outcome.update(sent=len(claimed) - len(failed), failed=len(failed))
+    return outcome
+
+
+async def create_payouts(booking_ids: Sequence[str]) -> Dict[str, Any]:
+    """Create a pending host payout for each booking that has none yet
+
+    The payout id is derived from the booking id, so a retried or
+    overlapping chunk inserts nothing twice.
+    """
+    from app.core.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            text(
+                f"""
+                INSERT INTO payouts (id, user_id, amount_pkr, status, requested_at, created_at)
+                SELECT uuid_generate_v5(CAST(:namespace AS uuid), b.id::text), l.host_id,
+                       round(b.total_pkr * (100 - CAST(:fee_percent AS numeric)) / 100, 2),
+                       'pending', now(), now()
+                FROM bookings b
+                JOIN listings l ON l.id = b.listing_id
+                WHERE b.id = ANY(CAST(:ids AS uuid[])) AND {PAYOUTS.eligible}
+                ON CONFLICT (id) DO NOTHING
+                RETURNING amount_pkr
+            """
+            ),
+            {
+                "ids": list(booking_ids),
+                "fee_percent": settings.PAYOUT_HOST_FEE_PERCENT,
+                **PAYOUTS.params(),
+            },
+        )
+        amounts = [amount for amount, in result]
+        await db.commit()
+
+    return {
+        "processed": len(booking_ids),
+        "created": len(amounts),
+        "skipped": len(booking_ids) - len(amounts),
+        "amount_pkr": float(sum(amounts)),
+    }
@@ -0,0 +1,425 @@
+"""
+Chat history for Homlo API
+Keeps the newest messages of each thread in Redis, pages through history
+with cursors, and writes read receipts to Postgres in batches
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger("app.chat_history")
+
+CHAT_HISTORY_READS = Counter(
+    "chat_history_reads_total",
+    "Chat history pages by where they were served from",
+    ["source"],
+)
+CHAT_RECEIPTS_FLUSHED = Counter(
+    "chat_read_receipts_flushed_total",
+    "Read receipts written to Postgres",
+)
+
+# Message ids of a thread scored by created_at in microseconds, so equal
+# scores are rare and ties fall back to id order like the SQL does
+THREAD_MESSAGES_KEY = "chat:thread:{thread_id}:messages"
+# Message payloads by id, plus COMPLETE_FIELD once the log holds the whole thread
+THREAD_PAYLOADS_KEY = "chat:thread:{thread_id}:payloads"
+COMPLETE_FIELD = "_complete"
+
+# Receipts waiting to be written: "{thread_id}:{reader_id}" -> "{up_to}:{read_at}"
+# in microseconds; a newer receipt for the same reader replaces an older one
+PENDING_RECEIPTS_KEY = "chat:receipts:pending"
+
+# Add a message and drop the oldest beyond the size limit
+APPEND_LUA = """
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[4])
+if excess > 0 then
+    local dropped = redis.call('ZRANGE', KEYS[1], 0, excess - 1)
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, excess - 1)
+    redis.call('HDEL', KEYS[2], COMPLETE_FIELD, unpack(dropped))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return 1
+""".replace(
+    "COMPLETE_FIELD", repr(COMPLETE_FIELD)
+)
+
+# Newest ARGV[1] messages, or those before message ARGV[2]; nil when the
+# cursor message is not cached
+PAGE_LUA = """
+local start = 0
+if ARGV[2] ~= '' then
+    local rank = redis.call('ZREVRANK', KEYS[1], ARGV[2])
+    if not rank then
+        return false
+    end
+    start = rank + 1
+end
+local ids = redis.call('ZREVRANGE', KEYS[1], start, start + tonumber(ARGV[1]) - 1)
+local complete = redis.call('HEXISTS', KEYS[2], COMPLETE_FIELD)
+if #ids == 0 then
+    return {complete}
+end
+return {complete, unpack(redis.call('HMGET', KEYS[2], unpack(ids)))}
+""".replace(
+    "COMPLETE_FIELD", repr(COMPLETE_FIELD)
+)
+
+# Mark cached messages from the other participant up to ARGV[2] as read at
+# ARGV[3] and queue the receipt, keeping the furthest one per reader
+MARK_READ_LUA = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+if #ids > 0 then
+    local payloads = redis.call('HMGET', KEYS[2], unpack(ids))
+    for i, payload in ipairs(payloads) do
+        if payload then
+            local message = cjson.decode(payload)
+            if message.sender_id ~= ARGV[1] and message.read_at == cjson.null then
+                message.read_at = ARGV[4]
+                redis.call('HSET', KEYS[2], ids[i], cjson.encode(message))
+            end
+        end
+    end
+end
+local current = redis.call('HGET', KEYS[3], ARGV[5])
+if not current or tonumber(string.match(current, '^(%d+)')) < tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[3], ARGV[5], ARGV[2] .. ':' .. ARGV[3])
+end
+return #ids
+"""
+
+_scripts: Dict[str, Any] = {}
+_flusher_task: Optional[asyncio.Task] = None
+_session_factory = None
+
+
+async def _script(name: str, source: str):
+    redis_client = await get_redis()
+    if name not in _scripts:
+        _scripts[name] = redis_client.register_script(source)
+    return _scripts[name], redis_client
+
+
+def _micros(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp()) * 1_000_000 + value.microsecond
+
+
+def _from_micros(value: int) -> datetime:
+    seconds, micros = divmod(value, 1_000_000)
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(microsecond=micros)
+
+
+def _as_datetime(value) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _serialize(message: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in message.items()
+    }
+
+
+async def append_message(message: Dict[str, Any]) -> bool:
+    """Add a new message to its thread's log
+
+    ``message`` is a messages row as a dict (id, thread_id, sender_id, text,
+    attachment_key, read_at, created_at). Call after the insert commits.
+    """
+    try:
+        script, redis_client = await _script("append", APPEND_LUA)
+        thread_id = str(message["thread_id"])
+        payload = _serialize(message)
+        await script(
+            keys=[
+                THREAD_MESSAGES_KEY.format(thread_id=thread_id),
+                THREAD_PAYLOADS_KEY.format(thread_id=thread_id),
+            ],
+            args=[
+                str(message["id"]),
+                _micros(_as_datetime(message["created_at"])),
+                json.dumps(payload),
+                settings.CHAT_HISTORY_SIZE,
+                settings.CHAT_HISTORY_TTL,
+            ],
+            client=redis_client,
+        )
+        return True
+    except Exception as e:
+        logger.warning(
+            f"Failed to cache message for thread {message.get('thread_id')}: {e}"
+        )
+        await forget_thread(str(message.get("thread_id")))
+        return False
+
+
+async def forget_thread(thread_id: str) -> None:
+    """Drop a thread's log so the next read refills it from Postgres
+
+    Used when a message could not be added: a log still marked complete
+    would otherwise keep serving the thread without it.
+    """
+    try:
+        redis_client = await get_redis()
+        await redis_client.delete(
+            THREAD_MESSAGES_KEY.format(thread_id=thread_id),
+            THREAD_PAYLOADS_KEY.format(thread_id=thread_id),
+        )
+    except Exception as e:
+        logger.error(
+            f"Failed to drop the cached log of thread {thread_id}, it may miss a message: {e}"
+        )
+
+
+async def _cached_page(
+    thread_id: str, limit: int, before: Optional[str]
+) -> Optional[List[Dict[str, Any]]]:
+    """A page from the log, or None when the log cannot answer it completely"""
+    script, redis_client = await _script("page", PAGE_LUA)
+    result = await script(
+        keys=[
+            THREAD_MESSAGES_KEY.format(thread_id=thread_id),
+            THREAD_PAYLOADS_KEY.format(thread_id=thread_id),
+        ],
+        args=[limit, before or ""],
+        client=redis_client,
+    )
+    if result is None:
+        return None
+    complete, payloads = result[0], result[1:]
+    if any(payload is None for payload in payloads):
+        return None
+    # A short page is only the end of the thread if the log holds all of it
+    if len(payloads) < limit and not complete:
+        return None
+    return [json.loads(payload) for payload in payloads]
+
+
+async def _load_page(
+    db: AsyncSession, thread_id: str, limit: int, before: Optional[str]
+) -> List[Dict[str, Any]]:
+    query = """
+        SELECT id::text, thread_id::text, sender_id::text, text, attachment_key, read_at, created_at
+        FROM messages
+        WHERE thread_id = CAST(:thread_id AS uuid)
+    """
+    params: Dict[str, Any] = {"thread_id": thread_id, "limit": limit}
+    if before:
+        query += """
+          AND (created_at, id) < (SELECT created_at, id FROM messages WHERE id = CAST(:before AS uuid))
+        """
+        params["before"] = before
+    query += " ORDER BY created_at DESC, id DESC LIMIT :limit"
+    result = await db.execute(text(query), params)
+    return [_serialize(dict(row._mapping)) for row in result]
+
+
+async def _backfill(
+    thread_id: str, messages: List[Dict[str, Any]], complete: bool
+) -> None:
+    """Cache the newest messages of a thread loaded from the database"""
+    messages_key = THREAD_MESSAGES_KEY.format(thread_id=thread_id)
+    payloads_key = THREAD_PAYLOADS_KEY.format(thread_id=thread_id)
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        if messages:
+            pipe.zadd(
+                messages_key,
+                {m["id"]: _micros(_as_datetime(m["created_at"])) for m in messages},
+            )
+            pipe.hset(payloads_key, mapping={m["id"]: json.dumps(m) for m in messages})
+        if complete:
+            pipe.hset(payloads_key, COMPLETE_FIELD, 1)
+        pipe.expire(messages_key, settings.CHAT_HISTORY_TTL)
+        pipe.expire(payloads_key, settings.CHAT_HISTORY_TTL)
+        await pipe.execute()
+
+
+async def get_messages(
+    db: AsyncSession, thread_id: str, limit: int = 50, before: Optional[str] = None
+) -> Dict[str, Any]:
+    """Newest ``limit`` messages of a thread, or those before message ``before``
+
+    Pages within the cached log come from Redis; older pages and cold
+    threads come from Postgres. Loading the newest page of a cold thread
+    refills its log. ``next_cursor`` is the id to pass as ``before`` for the
+    next page, or None at the start of the thread.
+    """
+    thread_id = str(thread_id)
+    limit = max(1, min(limit, settings.CHAT_HISTORY_SIZE))
+    messages = None
+    try:
+        messages = await _cached_page(thread_id, limit, before)
+    except Exception as e:
+        logger.warning(f"Chat history cache unavailable for thread {thread_id}: {e}")
+
+    source = "cache"
+    if messages is None:
+        source = "database"
+        if before:
+            messages = await _load_page(db, thread_id, limit, before)
+        else:
+            newest = await _load_page(db, thread_id, settings.CHAT_HISTORY_SIZE, None)
+            try:
+                await _backfill(
+                    thread_id, newest, complete=len(newest) < settings.CHAT_HISTORY_SIZE
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Failed to refill chat history for thread {thread_id}: {e}"
+                )
+            messages = newest[:limit]
+
+    CHAT_HISTORY_READS.labels(source=source).inc()
+    return {
+        "messages": messages,
+        "next_cursor": messages[-1]["id"] if len(messages) == limit else None,
+        "source": source,
+    }
+
+
+async def mark_thread_read(
+    thread_id: str, reader_id: str, up_to: Optional[datetime] = None
+) -> int:
+    """Mark the other participant's messages up to ``up_to`` (default now) as read
+
+    The cached log is updated at once; ``messages.read_at`` is written by the
+    receipt flusher in the next batch. Returns how many cached messages were
+    examined.
+    """
+    thread_id, reader_id = str(thread_id), str(reader_id)
+    now = datetime.now(timezone.utc)
+    up_to_micros = _micros(up_to or now)
+    script, redis_client = await _script("mark_read", MARK_READ_LUA)
+    return await script(
+        keys=[
+            THREAD_MESSAGES_KEY.format(thread_id=thread_id),
+            THREAD_PAYLOADS_KEY.format(thread_id=thread_id),
+            PENDING_RECEIPTS_KEY,
+        ],
+        args=[
+            reader_id,
+            up_to_micros,
+            _micros(now),
+            now.isoformat(),
+            f"{thread_id}:{reader_id}",
+        ],
+        client=redis_client,
+    )
+
+
+def _parse_receipts(
+    pending: Dict[str, str]
+) -> List[Tuple[str, str, datetime, datetime]]:
+    receipts = []
+    for field, value in pending.items():
+        thread_id, reader_id = field.split(":", 1)
+        up_to, read_at = value.split(":", 1)
+        receipts.append(
+            (thread_id, reader_id, _from_micros(int(up_to)), _from_micros(int(read_at)))
+        )
+    return receipts
+
+
+async def flush_read_receipts(db: AsyncSession) -> int:
+    """Write every queued read receipt to ``messages.read_at`` in one UPDATE
+
+    Receipts are taken from Redis atomically; if the update fails they are
+    put back unless a newer receipt for the same reader arrived meanwhile.
+    Returns how many receipts were written.
+    """
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hgetall(PENDING_RECEIPTS_KEY)
+        pipe.delete(PENDING_RECEIPTS_KEY)
+        pending, _ = await pipe.execute()
+    if not pending:
+        return 0
+
+    receipts = _parse_receipts(pending)
+    try:
+        await db.execute(
+            text(
+                """
+                UPDATE messages m SET read_at = r.read_at
+                FROM unnest(
+                    CAST(:thread_ids AS uuid[]), CAST(:reader_ids AS uuid[]),
+                    CAST(:up_to AS timestamptz[]), CAST(:read_at AS timestamptz[])
+                ) AS r(thread_id, reader_id, up_to, read_at)
+                WHERE m.thread_id = r.thread_id
+                  AND m.sender_id <> r.reader_id
+                  AND m.read_at IS NULL
+                  AND m.created_at <= r.up_to
+            """
+            ),
+            {
+                "thread_ids": [receipt[0] for receipt in receipts],
+                "reader_ids": [receipt[1] for receipt in receipts],
+                "up_to": [receipt[2] for receipt in receipts],
+                "read_at": [receipt[3] for receipt in receipts],
+            },
+        )
+        await db.commit()
+    except Exception:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for field, value in pending.items():
+                pipe.hsetnx(PENDING_RECEIPTS_KEY, field, value)
+            await pipe.execute()
+        raise
+
+    CHAT_RECEIPTS_FLUSHED.inc(len(receipts))
+    return len(receipts)
+
+
+async def _flush_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.CHAT_RECEIPT_FLUSH_INTERVAL)
+        try:
+            async with _session_factory() as db:
+                await flush_read_receipts(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to flush read receipts: {e}")
+
+
+async def start_receipt_flusher(session_factory) -> None:
+    """Write queued read receipts every CHAT_RECEIPT_FLUSH_INTERVAL seconds"""
+    global _flusher_task, _session_factory
+    if _flusher_task is not None:
+        return
+    _session_factory = session_factory
+    _flusher_task = asyncio.create_task(_flush_periodically())
+
+
+async def stop_receipt_flusher() -> None:
+    """Stop the flusher after writing what is still queued"""
+    global _flusher_task
+    if _flusher_task is None:
+        return
+    _flusher_task.cancel()
+    try:
+        await _flusher_task
+    except asyncio.CancelledError:
+        pass
+    _flusher_task = None
+    try:
+        async with _session_factory() as db:
+            await flush_read_receipts(db)
+    except Exception as e:
+        logger.warning(f"Failed to flush read receipts on shutdown: {e}")
@@ -0,0 +1,447 @@
+"""
+In-process geo index for nearby-listing search
+Grid-bucketed NumPy arrays of active listing coordinates with vectorized
+haversine distance, falling back to the PostGIS GIST index while cold
+"""
+
+import asyncio
+import json
+import logging
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger("app.geo_index")
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+# Grid cell size in degrees (about 1.1 km of latitude)
+CELL_DEGREES = 0.01
+CELLS_PER_ROW = int(math.ceil(360 / CELL_DEGREES))
+
+# Pending changes merged into the base arrays once this many accumulate
+COMPACT_THRESHOLD = 10000
+
+# Nearest-listing searches look no further than this
+NEAREST_MAX_RADIUS_M = 500000
+
+
+def haversine(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distance in meters from one point to arrays of points (all in radians)"""
+    dlat = lats - lat
+    dlon = lons - lon
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _row(lat):
+    return np.floor((np.asarray(lat) + 90) / CELL_DEGREES).astype(np.int64)
+
+
+def _col(lon):
+    return np.floor((np.asarray(lon) + 180) / CELL_DEGREES).astype(np.int64)
+
+
+class GeoIndex:
+    """Grid index over listing coordinates
+
+    Points are sorted by grid cell, and cell ids within a grid row are
+    contiguous, so a bounding box resolves to one searchsorted range per row.
+    Upserts and removals go to a small overlay that is merged into the base
+    arrays once it grows past COMPACT_THRESHOLD. Longitudes are not wrapped
+    across the antimeridian.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._ids = np.array([], dtype=object)
+        self._lats = np.array([], dtype=np.float64)
+        self._lons = np.array([], dtype=np.float64)
+        self._cells = np.array([], dtype=np.int64)
+        self._alive = np.array([], dtype=bool)
+        self._positions: Dict[str, int] = {}
+        self._overlay: Dict[str, Tuple[float, float]] = {}
+        self._overlay_arrays = None
+        self._buffer: Optional[List[Tuple[str, Optional[Tuple[float, float]]]]] = None
+
+    def __len__(self) -> int:
+        return int(self._alive.sum()) + len(self._overlay)
+
+    def begin_load(self) -> None:
+        """Buffer changes that arrive while a snapshot is being loaded"""
+        if self._buffer is None:
+            self._buffer = []
+
+    def abort_load(self) -> None:
+        """Stop buffering after a failed load
+
+        Buffered changes were applied to the overlay as they arrived, so only
+        the buffer itself is dropped.
+        """
+        self._buffer = None
+
+    def build(
+        self, ids: Sequence[str], lats: Sequence[float], lons: Sequence[float]
+    ) -> None:
+        """Replace the index contents with the given points (degrees)"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        cells = _row(lats) * CELLS_PER_ROW + _col(lons)
+        order = np.argsort(cells, kind="stable")
+
+        self._ids = np.asarray(ids, dtype=object)[order]
+        self._lats = np.radians(lats[order])
+        self._lons = np.radians(lons[order])
+        self._cells = cells[order]
+        self._alive = np.ones(len(order), dtype=bool)
+        self._positions = {listing_id: i for i, listing_id in enumerate(self._ids)}
+        self._overlay = {}
+        self._overlay_arrays = None
+        self.ready = True
+
+        buffered, self._buffer = self._buffer, None
+        for listing_id, point in buffered or []:
+            self._apply(listing_id, point)
+
+    def upsert(self, listing_id: str, lat: float, lon: float) -> None:
+        """Add or move a listing"""
+        self._apply(listing_id, (lat, lon))
+
+    def remove(self, listing_id: str) -> None:
+        """Drop a listing (deleted or no longer active)"""
+        self._apply(listing_id, None)
+
+    def _apply(self, listing_id: str, point: Optional[Tuple[float, float]]) -> None:
+        if self._buffer is not None:
+            self._buffer.append((listing_id, point))
+        position = self._positions.get(listing_id)
+        if position is not None:
+            self._alive[position] = False
+        if point is None:
+            self._overlay.pop(listing_id, None)
+        else:
+            self._overlay[listing_id] = point
+        self._overlay_arrays = None
+
+        if len(self._overlay) > COMPACT_THRESHOLD and self._buffer is None:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Merge the overlay into the base arrays"""
+        alive = self._alive
+        ids = list(self._ids[alive]) + list(self._overlay)
+        lats = np.concatenate(
+            [np.degrees(self._lats[alive]), [p[0] for p in self._overlay.values()]]
+        )
+        lons = np.concatenate(
+            [np.degrees(self._lons[alive]), [p[1] for p in self._overlay.values()]]
+        )
+        # Compaction must not mark a cold index as ready
+        ready = self.ready
+        self.build(ids, lats, lons)
+        self.ready = ready
+
+    def _get_overlay_arrays(self):
+        if self._overlay_arrays is None:
+            points = np.array(list(self._overlay.values()), dtype=np.float64).reshape(
+                -1, 2
+            )
+            self._overlay_arrays = (
+                np.array(list(self._overlay), dtype=object),
+                np.radians(points[:, 0]),
+                np.radians(points[:, 1]),
+            )
+        return self._overlay_arrays
+
+    def _candidates(
+        self, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+    ):
+        """Ids and coordinates (radians) of points in grid cells overlapping the box"""
+        rows = np.arange(_row(max(min_lat, -90.0)), _row(min(max_lat, 89.999999)) + 1)
+        col_lo, col_hi = _col(max(min_lon, -180.0)), _col(min(max_lon, 179.999999))
+        starts = np.searchsorted(
+            self._cells, rows * CELLS_PER_ROW + col_lo, side="left"
+        )
+        ends = np.searchsorted(self._cells, rows * CELLS_PER_ROW + col_hi, side="right")
+
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total:
+            # Concatenated aranges for every [start, end) without a Python loop
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            positions = np.arange(total) + offsets
+            positions = positions[self._alive[positions]]
+        else:
+            positions = np.array([], dtype=np.int64)
+
+        ids = self._ids[positions]
+        lats, lons = self._lats[positions], self._lons[positions]
+        if self._overlay:
+            overlay_ids, overlay_lats, overlay_lons = self._get_overlay_arrays()
+            ids = np.concatenate([ids, overlay_ids])
+            lats = np.concatenate([lats, overlay_lats])
+            lons = np.concatenate([lons, overlay_lons])
+        return ids, lats, lons
+
+    def radius(
+        self, lat: float, lon: float, radius_m: float, limit: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """Listings within radius_m of a point, nearest first, as (id, meters)"""
+        dlat = radius_m / METERS_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+        ids, lats, lons = self._candidates(
+            lat - dlat, lon - dlon, lat + dlat, lon + dlon
+        )
+
+        distances = haversine(math.radians(lat), math.radians(lon), lats, lons)
+        within = np.flatnonzero(distances <= radius_m)
+        if limit is not None and len(within) > limit:
+            within = within[np.argpartition(distances[within], limit - 1)[:limit]]
+        within = within[np.argsort(distances[within], kind="stable")]
+        return [(ids[i], float(distances[i])) for i in within]
+
+    def bbox(
+        self,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """Listings inside a bounding box (degrees)"""
+        ids, lats, lons = self._candidates(min_lat, min_lon, max_lat, max_lon)
+        lo_lat, hi_lat = math.radians(min_lat), math.radians(max_lat)
+        lo_lon, hi_lon = math.radians(min_lon), math.radians(max_lon)
+        inside = (
+            (lats >= lo_lat) & (lats <= hi_lat) & (lons >= lo_lon) & (lons <= hi_lon)
+        )
+        return list(ids[inside][:limit] if limit is not None else ids[inside])
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        max_radius_m: float = NEAREST_MAX_RADIUS_M,
+    ) -> List[Tuple[str, float]]:
+        """The k nearest listings, searching outward by doubling the radius"""
+        radius_m = CELL_DEGREES * METERS_PER_DEGREE
+        while True:
+            results = self.radius(lat, lon, radius_m, limit=k)
+            if len(results) >= k or radius_m >= max_radius_m:
+                return results
+            radius_m = min(radius_m * 2, max_radius_m)
+
+
+# Index instance shared by the search endpoints
+geo_index = GeoIndex()
+
+_listener_task: Optional[asyncio.Task] = None
+_load_task: Optional[asyncio.Task] = None
+_session_factory = None
+# Set once the first load has finished, whether or not it succeeded
+_first_load_done: Optional[asyncio.Event] = None
+
+
+async def load_geo_index(db: AsyncSession) -> int:
+    """Load active listing coordinates from Postgres into the index"""
+    geo_index.begin_load()
+    try:
+        result = await db.execute(
+            text(
+                """
+            SELECT id::text, ST_Y(geog::geometry), ST_X(geog::geometry)
+            FROM listings
+            WHERE status = 'active' AND geog IS NOT NULL
+        """
+            )
+        )
+        rows = result.all()
+        geo_index.build(
+            [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+        )
+    except BaseException:
+        geo_index.abort_load()
+        raise
+    logger.info(f"Geo index loaded with {len(rows)} listings")
+    return len(rows)
+
+
+async def publish_listing_location(
+    listing_id: str, lat: Optional[float], lon: Optional[float], active: bool
+) -> None:
+    """Announce a listing create/move/status change to every worker's index"""
+    message = {"id": listing_id, "lat": lat, "lon": lon, "active": active}
+    redis_client = await get_redis()
+    await redis_client.publish(settings.GEO_INDEX_CHANNEL, json.dumps(message))
+
+
+def apply_listing_event(message: Dict) -> None:
+    """Apply a listing change event to the local index"""
+    if (
+        message.get("active")
+        and message.get("lat") is not None
+        and message.get("lon") is not None
+    ):
+        geo_index.upsert(message["id"], float(message["lat"]), float(message["lon"]))
+    else:
+        geo_index.remove(message["id"])
+
+
+async def _listen_for_listing_events() -> None:
+    """Keep the index in sync with listing changes published by any worker"""
+    global _load_task
+    while True:
+        pubsub = None
+        try:
+            redis_client = await get_redis()
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(settings.GEO_INDEX_CHANNEL)
+            # Snapshot only once subscribed, so no change can fall in between
+            if not geo_index.ready and (_load_task is None or _load_task.done()):
+                _load_task = asyncio.create_task(_load_from_database())
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    apply_listing_event(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Events may have been missed, so serve from PostGIS until reloaded
+            logger.warning(f"Geo index listener failed, marking index cold: {e}")
+            geo_index.ready = False
+            await asyncio.sleep(1)
+        finally:
+            if pubsub is not None:
+                await pubsub.close()
+
+
+async def _load_from_database() -> None:
+    """Load the index with a fresh session, leaving it cold on failure"""
+    try:
+        async with _session_factory() as db:
+            await load_geo_index(db)
+    except Exception as e:
+        logger.error(f"Failed to load geo index: {e}")
+    finally:
+        _first_load_done.set()
+
+
+async def start_geo_index(session_factory) -> None:
+    """Subscribe to listing events; the index loads in the background once subscribed"""
+    global _listener_task, _session_factory, _first_load_done
+    if not settings.GEO_INDEX_ENABLED or _listener_task is not None:
+        return
+    _session_factory = session_factory
+    _first_load_done = asyncio.Event()
+    _listener_task = asyncio.create_task(_listen_for_listing_events())
+
+
+async def wait_for_geo_index(timeout: float) -> bool:
+    """Wait for the index's first load to finish; returns whether it is ready"""
+    if _first_load_done is None:
+        return geo_index.ready
+    try:
+        await asyncio.wait_for(_first_load_done.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    return geo_index.ready
+
+
+async def stop_geo_index() -> None:
+    """Stop the listing event listener and any load still in flight"""
+    global _listener_task, _load_task
+    for task in (_listener_task, _load_task):
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    _listener_task = None
+    _load_task = None
+
+
+# Search with PostGIS fallback
+async def search_radius(
+    db: AsyncSession, lat: float, lon: float, radius_m: float, limit: int = 50
+) -> List[Tuple[str, float]]:
+    """Active listings within radius_m of a point as (id, meters), nearest first"""
+    if geo_index.ready:
+        return geo_index.radius(lat, lon, radius_m, limit)
+
+    result = await db.execute(
+        text(
+            """
+            SELECT id::text, ST_Distance(geog, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography) AS distance
+            FROM listings
+            WHERE status = 'active'
+              AND ST_DWithin(geog, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, :radius)
+            ORDER BY distance
+            LIMIT :limit
+        """
+        ),
+        {"lat": lat, "lon": lon, "radius": radius_m, "limit": limit},
+    )
+    return [(row[0], float(row[1])) for row in result]
+
+
+async def search_bbox(
+    db: AsyncSession,
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    limit: int = 500,
+) -> List[str]:
+    """Active listings inside a bounding box"""
+    if geo_index.ready:
+        return geo_index.bbox(min_lat, min_lon, max_lat, max_lon, limit)
+
+    result = await db.execute(
+        text(
+            """
+            SELECT id::text FROM listings
+            WHERE status = 'active'
+              AND geog && ST_MakeEnvelope(:min_lon, :min_lat, :max_lon, :max_lat, 4326)::geography
+            LIMIT :limit
+        """
+        ),
+        {
+            "min_lat": min_lat,
+            "min_lon": min_lon,
+            "max_lat": max_lat,
+            "max_lon": max_lon,
+            "limit": limit,
+        },
+    )
+    return [row[0] for row in result]
+
+
+async def search_nearest(
+    db: AsyncSession, lat: float, lon: float, k: int = 20
+) -> List[Tuple[str, float]]:
+    """The k nearest active listings within NEAREST_MAX_RADIUS_M as (id, meters)"""
+    if geo_index.ready:
+        return geo_index.nearest(lat, lon, k)
+
+    result = await db.execute(
+        text(
+            """
+            SELECT id::text, ST_Distance(geog, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography) AS distance
+            FROM listings
+            WHERE status = 'active'
+              AND ST_DWithin(geog, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, :max_radius)
+            ORDER BY geog <-> ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography
+            LIMIT :k
+        """
+        ),
+        {"lat": lat, "lon": lon, "k": k, "max_radius": NEAREST_MAX_RADIUS_M},
+    )
+    return [(row[0], float(row[1])) for row in result]
@@ -0,0 +1,73 @@
+"""
+Listing writes for Homlo API
+Location and status changes, announced to every worker's geo index once
+they are committed
+"""
+
+import logging
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.geo_index import publish_listing_location
+
+logger = logging.getLogger("app.listings")
+
+# Status and coordinates of the updated row, for the geo index event
+_RETURNING = """
+    RETURNING status, ST_Y(geometry(geog)), ST_X(geometry(geog))
+"""
+
+
+async def _commit_and_publish(db: AsyncSession, listing_id: str, result) -> bool:
+    row = result.first()
+    if row is None:
+        await db.rollback()
+        return False
+    await db.commit()
+
+    status, lat, lon = row
+    try:
+        await publish_listing_location(listing_id, lat, lon, status == "active")
+    except Exception as e:
+        # Workers keep the old location until their index next reloads
+        logger.error(f"Failed to announce listing {listing_id} to the geo index: {e}")
+    return True
+
+
+async def set_listing_location(
+    db: AsyncSession, listing_id: str, lat: Optional[float], lon: Optional[float]
+) -> bool:
+    """Move a listing, or clear its location with None; False if it does not exist"""
+    listing_id = str(listing_id)
+    result = await db.execute(
+        text(
+            """
+            UPDATE listings
+            SET geog = geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = :listing_id
+        """
+            + _RETURNING
+        ),
+        {"listing_id": listing_id, "lat": lat, "lon": lon},
+    )
+    return await _commit_and_publish(db, listing_id, result)
+
+
+async def set_listing_status(db: AsyncSession, listing_id: str, status: str) -> bool:
+    """Change a listing's status; only active listings are searchable by location"""
+    listing_id = str(listing_id)
+    result = await db.execute(
+        text(
+            """
+            UPDATE listings
+            SET status = :status, updated_at = CURRENT_TIMESTAMP
+            WHERE id = :listing_id
+        """
+            + _RETURNING
+        ),
+        {"listing_id": listing_id, "status": status},
+    )
+    return await _commit_and_publish(db, listing_id, result)
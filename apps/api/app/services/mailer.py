@@ -0,0 +1,289 @@
+"""
+Email delivery for Homlo API
+Renders cached Jinja2 templates and sends batches over reused SMTP connections
+"""
+
+import asyncio
+import logging
+import random
+import time
+from email.message import Message
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiosmtplib
+from jinja2 import (
+    Environment,
+    FileSystemLoader,
+    Template,
+    TemplateNotFound,
+    select_autoescape,
+)
+from prometheus_client import Counter
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.mailer")
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+EMAILS_SENT = Counter(
+    "emails_sent_total",
+    "Emails handed to the SMTP server by outcome",
+    ["result"],
+)
+SMTP_RECONNECTS = Counter(
+    "smtp_reconnects_total",
+    "SMTP connections reopened after a failure",
+)
+
+# Templates are compiled once per process and never reloaded
+_environment = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=select_autoescape(["html"], default_for_string=False),
+    auto_reload=False,
+)
+
+
+@lru_cache(maxsize=None)
+def _templates(name: str) -> Tuple[Template, Optional[Template]]:
+    """Compiled HTML and optional plain-text template for an email"""
+    html = _environment.get_template(f"{name}.html")
+    try:
+        plain = _environment.get_template(f"{name}.txt")
+    except TemplateNotFound:
+        plain = None
+    return html, plain
+
+
+@lru_cache(maxsize=256)
+def _subject_template(subject: str) -> Template:
+    return _environment.from_string(subject)
+
+
+def precompile_templates() -> int:
+    """Compile every email template up front; returns the number of emails"""
+    names = [
+        name[: -len(".html")]
+        for name in _environment.list_templates(extensions=["html"])
+    ]
+    for name in names:
+        _templates(name)
+    return len(names)
+
+
+def render_email(
+    template: str, subject: str, context: Dict[str, Any]
+) -> Tuple[str, str, Optional[str]]:
+    """Render the subject, HTML body and plain-text body (if any) of an email"""
+    html, plain = _templates(template)
+    return (
+        _subject_template(subject).render(context),
+        html.render(context),
+        plain.render(context) if plain is not None else None,
+    )
+
+
+def build_message(
+    to: str, subject: str, html: str, plain: Optional[str] = None
+) -> Message:
+    # The compat32 MIME classes build a message several times faster than
+    # EmailMessage.set_content, which dominates the cost of a bulk send
+    if plain is not None:
+        message = MIMEMultipart("alternative")
+        message.attach(MIMEText(plain, "plain", "utf-8"))
+        message.attach(MIMEText(html, "html", "utf-8"))
+    else:
+        message = MIMEText(html, "html", "utf-8")
+    message["From"] = settings.SMTP_FROM_EMAIL
+    message["To"] = to
+    message["Subject"] = subject
+    return message
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """Whether the SMTP session is unusable, as opposed to one message being refused"""
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return error.code == 421
+    return isinstance(
+        error,
+        (aiosmtplib.SMTPServerDisconnected, ConnectionError, TimeoutError, OSError),
+    )
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused) and error.recipients:
+        error = error.recipients[0]
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return f"{error.code} {error.message}"
+    return str(error) or type(error).__name__
+
+
+class SMTPConnection:
+    """One SMTP session reused across messages and reopened after failures"""
+
+    def __init__(self):
+        self.client: Optional[aiosmtplib.SMTP] = None
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USERNAME,
+            password=settings.SMTP_PASSWORD,
+            start_tls=settings.SMTP_TLS,
+            timeout=settings.SMTP_TIMEOUT,
+        )
+        await client.connect()
+        return client
+
+    async def send(self, message: Message) -> None:
+        """Send a message, reconnecting with backoff if the session drops"""
+        for attempt in range(settings.SMTP_RECONNECT_ATTEMPTS + 1):
+            try:
+                if self.client is None:
+                    self.client = await self._connect()
+                await self.client.send_message(message)
+                return
+            except Exception as e:
+                if (
+                    not _is_connection_error(e)
+                    or attempt == settings.SMTP_RECONNECT_ATTEMPTS
+                ):
+                    raise
+                await self.close()
+                SMTP_RECONNECTS.inc()
+                await asyncio.sleep(
+                    min(0.1 * 2**attempt, 2.0) * (0.5 + random.random())
+                )
+
+    async def close(self) -> None:
+        client, self.client = self.client, None
+        if client is None:
+            return
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+
+async def send_email(
+    to: str, template: str, subject: str, context: Optional[Dict[str, Any]] = None
+) -> None:
+    """Send a single templated email"""
+    connection = SMTPConnection()
+    try:
+        await connection.send(
+            build_message(to, *render_email(template, subject, context or {}))
+        )
+        EMAILS_SENT.labels(result="sent").inc()
+    except Exception:
+        EMAILS_SENT.labels(result="failed").inc()
+        raise
+    finally:
+        await connection.close()
+
+
+async def send_bulk(
+    template: str,
+    subject: str,
+    recipients: Sequence[Dict[str, Any]],
+    concurrency: Optional[int] = None,
+    connections: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Send one templated email to many recipients
+
+    ``recipients`` are {"email": ..., "context": {...}} items; ``subject`` is
+    rendered with the same context. Rendering is CPU-bound, so messages are
+    rendered one at a time on the event loop, staying at most
+    ``concurrency`` messages ahead of the SMTP senders, and sent over
+    ``connections`` sessions that stay open for the whole batch. Raises
+    ValueError before sending anything if a recipient has no address. A
+    refused recipient only fails that message; if the server stays
+    unreachable after reconnecting, the rest of the batch fails and
+    ``aborted`` is set. Returns counts, throughput and the failures as
+    {"index", "email", "error"} items, index being the recipient's position.
+    """
+    missing = [
+        i for i, recipient in enumerate(recipients) if not recipient.get("email")
+    ]
+    if missing:
+        raise ValueError(
+            f"{len(missing)} recipients have no email address, first at index {missing[0]}"
+        )
+
+    concurrency = concurrency or settings.EMAIL_BULK_CONCURRENCY
+    connections = max(
+        1, min(connections or settings.EMAIL_BULK_CONNECTIONS, len(recipients) or 1)
+    )
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    failures: List[Dict[str, Any]] = []
+    sent = 0
+    unreachable: Optional[str] = None
+    started = time.perf_counter()
+
+    def fail(index: int, email: str, error: str) -> None:
+        failures.append({"index": index, "email": email, "error": error})
+
+    async def render_all():
+        try:
+            for index, recipient in enumerate(recipients):
+                context = recipient.get("context") or {}
+                try:
+                    message = build_message(
+                        recipient["email"], *render_email(template, subject, context)
+                    )
+                except Exception as e:
+                    fail(index, recipient["email"], f"render failed: {e}")
+                    continue
+                await queue.put((index, message))
+        finally:
+            # Wake the senders even if rendering stopped early
+            for _ in range(connections):
+                await queue.put(None)
+
+    async def deliver():
+        nonlocal sent, unreachable
+        connection = SMTPConnection()
+        try:
+            while (item := await queue.get()) is not None:
+                index, message = item
+                if unreachable is not None:
+                    fail(index, message["To"], unreachable)
+                    continue
+                try:
+                    await connection.send(message)
+                    sent += 1
+                except Exception as e:
+                    fail(index, message["To"], _describe(e))
+                    if _is_connection_error(e):
+                        unreachable = f"SMTP server unreachable: {_describe(e)}"
+                        logger.error(f"Bulk email aborted, {unreachable}")
+        finally:
+            await connection.close()
+
+    senders = [asyncio.create_task(deliver()) for _ in range(connections)]
+    try:
+        await render_all()
+        await asyncio.gather(*senders)
+    finally:
+        # Only still running if we were interrupted; closes their SMTP sessions
+        for sender in senders:
+            sender.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+
+    elapsed = time.perf_counter() - started
+    EMAILS_SENT.labels(result="sent").inc(sent)
+    EMAILS_SENT.labels(result="failed").inc(len(failures))
+    return {
+        "template": template,
+        "sent": sent,
+        "failed": len(failures),
+        "failures": failures,
+        "aborted": unreachable is not None,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(sent / elapsed, 1) if elapsed > 0 else 0.0,
+    }
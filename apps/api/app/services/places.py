@@ -0,0 +1,223 @@
+"""
+City and area catalog for Homlo API
+The places listings are grouped under, and an in-process prefix trie over
+them for typeahead
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Major Pakistani cities with coordinates
+CITIES = [
+    {
+        "name": "Karachi",
+        "province": "Sindh",
+        "latitude": 24.8607,
+        "longitude": 67.0011,
+        "areas": [
+            "Clifton",
+            "Defence",
+            "Gulshan-e-Iqbal",
+            "North Nazimabad",
+            "Malir",
+            "Korangi",
+        ],
+    },
+    {
+        "name": "Lahore",
+        "province": "Punjab",
+        "latitude": 31.5204,
+        "longitude": 74.3587,
+        "areas": [
+            "Gulberg",
+            "DHA",
+            "Model Town",
+            "Johar Town",
+            "Bahria Town",
+            "Wapda Town",
+        ],
+    },
+    {
+        "name": "Islamabad",
+        "province": "Islamabad Capital Territory",
+        "latitude": 33.6844,
+        "longitude": 73.0479,
+        "areas": ["F-6", "F-7", "F-8", "E-7", "E-8", "G-6", "G-7", "G-8"],
+    },
+    {
+        "name": "Rawalpindi",
+        "province": "Punjab",
+        "latitude": 33.5651,
+        "longitude": 73.0169,
+        "areas": ["Saddar", "Cantt", "Westridge", "Bahria Town", "DHA"],
+    },
+    {
+        "name": "Peshawar",
+        "province": "Khyber Pakhtunkhwa",
+        "latitude": 34.0150,
+        "longitude": 71.5249,
+        "areas": ["University Town", "Hayatabad", "Cantt", "City"],
+    },
+    {
+        "name": "Quetta",
+        "province": "Balochistan",
+        "latitude": 30.1798,
+        "longitude": 66.9750,
+        "areas": ["Cantt", "City", "Hanna Valley"],
+    },
+    {
+        "name": "Multan",
+        "province": "Punjab",
+        "latitude": 30.1575,
+        "longitude": 71.5249,
+        "areas": ["Cantt", "City", "Gulshan-e-Ravi"],
+    },
+    {
+        "name": "Faisalabad",
+        "province": "Punjab",
+        "latitude": 31.4504,
+        "longitude": 73.1350,
+        "areas": ["Cantt", "City", "DHA", "Satiana Road"],
+    },
+    {
+        "name": "Hyderabad",
+        "province": "Sindh",
+        "latitude": 25.3969,
+        "longitude": 68.3778,
+        "areas": ["Cantt", "City", "Latifabad", "Qasimabad"],
+    },
+    {
+        "name": "Sukkur",
+        "province": "Sindh",
+        "latitude": 27.7031,
+        "longitude": 68.8591,
+        "areas": ["Cantt", "City", "New Sukkur"],
+    },
+    {
+        "name": "Abbottabad",
+        "province": "Khyber Pakhtunkhwa",
+        "latitude": 34.1463,
+        "longitude": 73.2117,
+        "areas": ["Cantt", "City", "Havelian"],
+    },
+    {
+        "name": "Murree",
+        "province": "Punjab",
+        "latitude": 33.9071,
+        "longitude": 73.3903,
+        "areas": ["City", "Galiyat", "Patriata"],
+    },
+    {
+        "name": "Swat",
+        "province": "Khyber Pakhtunkhwa",
+        "latitude": 35.2256,
+        "longitude": 72.2497,
+        "areas": ["Mingora", "Saidu Sharif", "Kalam", "Malam Jabba"],
+    },
+    {
+        "name": "Hunza",
+        "province": "Gilgit-Baltistan",
+        "latitude": 36.3167,
+        "longitude": 74.6500,
+        "areas": ["Karimabad", "Aliabad", "Ganish"],
+    },
+    {
+        "name": "Skardu",
+        "province": "Gilgit-Baltistan",
+        "latitude": 35.2971,
+        "longitude": 75.6333,
+        "areas": ["City", "Khaplu", "Shigar"],
+    },
+    {
+        "name": "Gwadar",
+        "province": "Balochistan",
+        "latitude": 25.1216,
+        "longitude": 62.3254,
+        "areas": ["City", "Port", "Jiwani"],
+    },
+]
+
+
+# Suggestions kept per trie node; lookups never need more
+TRIE_TOP_K = 10
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase words separated by single spaces ("F-7" -> "f 7")"""
+    return " ".join(_WORD.findall(text.casefold()))
+
+
+class PrefixTrie:
+    """Prefix trie returning the best-weighted suggestions for a prefix
+
+    Every node keeps its TRIE_TOP_K best suggestions, so a lookup walks the
+    prefix and returns without visiting the subtree. A suggestion is
+    reachable from its full name and from the start of each later word, so
+    "town" completes "Johar Town".
+    """
+
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "PrefixTrie"] = {}
+        self.top: List[Tuple[float, str, Dict[str, Any]]] = []
+
+    def insert(self, name: str, suggestion: Dict[str, Any], weight: float) -> None:
+        words = normalize(name).split(" ")
+        entry = (weight, suggestion["label"], suggestion)
+        for start in range(len(words)):
+            node = self
+            for char in " ".join(words[start:]):
+                node = node.children.setdefault(char, PrefixTrie())
+                node._keep(entry)
+
+    def _keep(self, entry: Tuple[float, str, Dict[str, Any]]) -> None:
+        if any(kept[2] is entry[2] for kept in self.top):
+            return
+        self.top.append(entry)
+        # Highest weight first, then alphabetical
+        self.top.sort(key=lambda kept: (-kept[0], kept[1]))
+        del self.top[TRIE_TOP_K:]
+
+    def complete(self, prefix: str, limit: int = TRIE_TOP_K) -> List[Dict[str, Any]]:
+        node = self
+        for char in normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        if node is self:
+            return []
+        return [suggestion for _, _, suggestion in node.top[:limit]]
+
+
+def build_place_trie(cities: Iterable[Dict[str, Any]]) -> PrefixTrie:
+    """Index cities, and areas under their city, ranking cities first"""
+    trie = PrefixTrie()
+    for city in cities:
+        trie.insert(
+            city["name"],
+            {"type": "city", "label": city["name"], "city": city["name"]},
+            2.0,
+        )
+        for area in city["areas"]:
+            trie.insert(
+                area,
+                {
+                    "type": "area",
+                    "label": f"{area}, {city['name']}",
+                    "city": city["name"],
+                    "area": area,
+                },
+                1.0,
+            )
+    return trie
+
+
+place_trie = build_place_trie(CITIES)
+
+
+def complete_places(prefix: str, limit: int = TRIE_TOP_K) -> List[Dict[str, Any]]:
+    """Cities and areas whose name, or a word in it, starts with prefix"""
+    return place_trie.complete(prefix, limit)
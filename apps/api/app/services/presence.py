@@ -0,0 +1,427 @@
+"""
+WebSocket presence and delivery for Homlo API
+Tracks which worker holds each user's sockets with heartbeats, sweeps stale
+connections, and routes messages to the owning worker over its own channel
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+from app.core.redis import WORKER_ID, get_redis
+
+logger = logging.getLogger("app.presence")
+
+WS_CONNECTIONS = Gauge(
+    "ws_connections",
+    "WebSocket connections held by this worker",
+    multiprocess_mode="livesum",
+)
+WS_MESSAGES = Counter(
+    "ws_messages_total",
+    "Messages routed to WebSocket connections",
+    ["result"],
+)
+WS_SWEPT = Counter(
+    "ws_stale_connections_swept_total",
+    "Connections removed from presence after missing heartbeats",
+)
+
+# A user's connections as "{worker_id}:{connection_id}", scored by last seen
+PRESENCE_KEY = "ws:presence:{user_id}"
+# Every connection as "{user_id}|{worker_id}:{connection_id}", scored by
+# last seen, so the sweeper finds stale ones without scanning users
+CONNECTIONS_KEY = "ws:connections"
+# Each worker listens only on its own channel
+WORKER_CHANNEL = "ws:worker:{worker_id}"
+SWEEP_LOCK_KEY = "ws:sweep:lock"
+
+# Publish a message once to every worker holding a live connection of the
+# given users, with the connections it should go to. Returns the number of
+# connections addressed.
+DELIVER_LUA = """
+local workers = {}
+local order = {}
+local addressed = 0
+for i = 1, #KEYS do
+    local members = redis.call('ZRANGEBYSCORE', KEYS[i], ARGV[1], '+inf')
+    for _, member in ipairs(members) do
+        local worker, connection = string.match(member, '^([^:]+):(.+)$')
+        if not workers[worker] then
+            workers[worker] = {}
+            table.insert(order, worker)
+        end
+        table.insert(workers[worker], connection)
+        addressed = addressed + 1
+    end
+end
+for _, worker in ipairs(order) do
+    local envelope = '{"connections":' .. cjson.encode(workers[worker]) .. ',"message":' .. ARGV[3] .. '}'
+    redis.call('PUBLISH', ARGV[2] .. worker, envelope)
+end
+return addressed
+"""
+
+# Remove up to ARGV[2] connections last seen before ARGV[1]
+SWEEP_LUA = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, entry in ipairs(stale) do
+    local user_id, member = string.match(entry, '^([^|]+)|(.+)$')
+    redis.call('ZREM', ARGV[3] .. user_id, member)
+end
+if #stale > 0 then
+    redis.call('ZREM', KEYS[1], unpack(stale))
+end
+return #stale
+"""
+
+_scripts: Dict[str, Any] = {}
+
+
+async def _script(name: str, source: str):
+    redis_client = await get_redis()
+    if name not in _scripts:
+        _scripts[name] = redis_client.register_script(source)
+    return _scripts[name], redis_client
+
+
+class Connection:
+    """A socket held by this worker; ``socket`` needs async ``send_text`` and ``close``
+
+    Outgoing messages wait in ``queue`` for the connection's own writer
+    task, so a slow client only holds up its own messages.
+    """
+
+    __slots__ = ("id", "user_id", "socket", "last_seen", "queue", "writer")
+
+    def __init__(self, user_id: str, socket):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.socket = socket
+        self.last_seen = time.time()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
+
+    @property
+    def member(self) -> str:
+        return f"{WORKER_ID}:{self.id}"
+
+
+class ConnectionHub:
+    """This worker's sockets, their presence in Redis, and its delivery channel
+
+    Client heartbeats only touch the connection in memory; every
+    WS_HEARTBEAT_INTERVAL the worker writes the last-seen time of all its
+    live sockets in pipelined batches. Sockets silent for longer than
+    WS_PRESENCE_TIMEOUT are closed, and entries left by a worker that died
+    are removed by the sweeper. Sockets that fall WS_SEND_QUEUE_SIZE
+    messages behind, or take longer than WS_SEND_TIMEOUT to accept one, are
+    closed too.
+    """
+
+    def __init__(self):
+        self.connections: Dict[str, Connection] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._closing: Set[asyncio.Task] = set()
+        self._subscribed = asyncio.Event()
+
+    # Connections
+    async def register(self, user_id: str, socket) -> Connection:
+        connection = Connection(str(user_id), socket)
+        self.connections[connection.id] = connection
+        connection.writer = asyncio.create_task(self._write(connection))
+        WS_CONNECTIONS.inc()
+        await _write_presence([connection])
+        return connection
+
+    async def unregister(self, connection: Connection) -> None:
+        if self.connections.pop(connection.id, None) is None:
+            return
+        WS_CONNECTIONS.dec()
+        if connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        try:
+            redis_client = await get_redis()
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zrem(
+                    PRESENCE_KEY.format(user_id=connection.user_id), connection.member
+                )
+                pipe.zrem(CONNECTIONS_KEY, f"{connection.user_id}|{connection.member}")
+                await pipe.execute()
+        except Exception as e:
+            # The sweeper removes it once it stops being refreshed
+            logger.warning(
+                f"Failed to remove connection {connection.id} from presence: {e}"
+            )
+
+    def touch(self, connection: Connection) -> None:
+        """Record a heartbeat from the client"""
+        connection.last_seen = time.time()
+
+    def send(self, connection: Connection, data: str) -> bool:
+        """Queue a message for the socket without waiting
+
+        A socket whose queue is full is closed; returns whether the message
+        was queued.
+        """
+        try:
+            connection.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            WS_MESSAGES.labels(result="overflow").inc()
+            self._drop(connection)
+            return False
+
+    def _drop(self, connection: Connection) -> None:
+        """Close the socket in the background"""
+        if connection.id not in self.connections:
+            return
+        task = asyncio.create_task(self._disconnect(connection))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _disconnect(self, connection: Connection) -> None:
+        await self.unregister(connection)
+        try:
+            await connection.socket.close()
+        except Exception:
+            pass
+
+    async def _write(self, connection: Connection) -> None:
+        """Send the connection's queued messages in order
+
+        A send cut short by the timeout can leave a partial frame behind, so
+        the socket is closed rather than written to again.
+        """
+        while True:
+            data = await connection.queue.get()
+            try:
+                await asyncio.wait_for(
+                    connection.socket.send_text(data), settings.WS_SEND_TIMEOUT
+                )
+            except Exception as e:
+                WS_MESSAGES.labels(result="failed").inc()
+                logger.info(f"Closing WebSocket connection {connection.id}: {e!r}")
+                await self._disconnect(connection)
+                return
+            WS_MESSAGES.labels(result="delivered").inc()
+
+    # Background loops
+    async def start(self) -> None:
+        """Subscribe to this worker's channel and start the heartbeat and sweep loops"""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._sweep()),
+        ]
+        await asyncio.wait_for(self._subscribed.wait(), timeout=10)
+
+    async def stop(self) -> None:
+        """Stop the loops and drop this worker's connections from presence"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        for connection in list(self.connections.values()):
+            await self.unregister(connection)
+        for task in list(self._closing):
+            await task
+
+    async def _listen(self) -> None:
+        channel = WORKER_CHANNEL.format(worker_id=WORKER_ID)
+        while True:
+            pubsub = None
+            try:
+                redis_client = await get_redis()
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(channel)
+                self._subscribed.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self._deliver(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    f"WebSocket delivery listener failed, resubscribing: {e}"
+                )
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    await pubsub.close()
+
+    async def _deliver(self, envelope: Dict[str, Any]) -> None:
+        # Serialized once for every socket it goes to; only queued here, so
+        # the listener never waits on a client
+        data = json.dumps(envelope["message"])
+        gone = 0
+        for connection_id in envelope["connections"]:
+            connection = self.connections.get(connection_id)
+            if connection is None:
+                # Closed between the lookup and delivery
+                gone += 1
+            else:
+                self.send(connection, data)
+        WS_MESSAGES.labels(result="gone").inc(gone)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+            cutoff = time.time() - settings.WS_PRESENCE_TIMEOUT
+            live, silent = [], []
+            for connection in list(self.connections.values()):
+                (live if connection.last_seen >= cutoff else silent).append(connection)
+            for connection in silent:
+                await self._disconnect(connection)
+            try:
+                await _write_presence(live)
+            except Exception as e:
+                logger.warning(f"Failed to refresh WebSocket presence: {e}")
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_SWEEP_INTERVAL)
+            try:
+                redis_client = await get_redis()
+                # One worker sweeps per interval
+                if await redis_client.set(
+                    SWEEP_LOCK_KEY,
+                    WORKER_ID,
+                    nx=True,
+                    ex=max(1, int(settings.WS_SWEEP_INTERVAL)),
+                ):
+                    await sweep_stale_connections()
+            except Exception as e:
+                logger.warning(f"WebSocket presence sweep failed: {e}")
+
+
+async def _write_presence(connections: Sequence[Connection]) -> None:
+    """Set the connections' last-seen time to now, in pipelined batches
+
+    A user's sets need no TTL: the sweeper removes members that stop being
+    refreshed, and Redis deletes a set with its last member.
+    """
+    if not connections:
+        return
+    now = time.time()
+    redis_client = await get_redis()
+    batch_size = settings.WS_SWEEP_BATCH_SIZE
+    for start in range(0, len(connections), batch_size):
+        batch = connections[start : start + batch_size]
+        by_user: Dict[str, Dict[str, float]] = {}
+        for connection in batch:
+            by_user.setdefault(connection.user_id, {})[connection.member] = now
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for user_id, members in by_user.items():
+                pipe.zadd(PRESENCE_KEY.format(user_id=user_id), members)
+            pipe.zadd(CONNECTIONS_KEY, {f"{c.user_id}|{c.member}": now for c in batch})
+            await pipe.execute()
+
+
+async def sweep_stale_connections() -> int:
+    """Remove connections not refreshed within WS_PRESENCE_TIMEOUT, in batches"""
+    script, redis_client = await _script("sweep", SWEEP_LUA)
+    cutoff = time.time() - settings.WS_PRESENCE_TIMEOUT
+    removed = 0
+    while True:
+        swept = await script(
+            keys=[CONNECTIONS_KEY],
+            args=[
+                cutoff,
+                settings.WS_SWEEP_BATCH_SIZE,
+                PRESENCE_KEY.format(user_id=""),
+            ],
+            client=redis_client,
+        )
+        removed += swept
+        if swept < settings.WS_SWEEP_BATCH_SIZE:
+            break
+    if removed:
+        WS_SWEPT.inc(removed)
+        logger.info(f"Swept {removed} stale WebSocket connections")
+    return removed
+
+
+async def send_to_users(user_ids: Iterable[str], message: Dict[str, Any]) -> int:
+    """Deliver a message to every live socket of the given users
+
+    One round trip: the message is published once per worker that holds
+    any of the sockets, and only those workers receive it. Returns the
+    number of sockets addressed; 0 means every user is offline.
+    """
+    keys = [
+        PRESENCE_KEY.format(user_id=user_id)
+        for user_id in dict.fromkeys(str(u) for u in user_ids)
+    ]
+    if not keys:
+        return 0
+    script, redis_client = await _script("deliver", DELIVER_LUA)
+    addressed = await script(
+        keys=keys,
+        args=[
+            time.time() - settings.WS_PRESENCE_TIMEOUT,
+            WORKER_CHANNEL.format(worker_id=""),
+            json.dumps(message),
+        ],
+        client=redis_client,
+    )
+    if not addressed:
+        WS_MESSAGES.labels(result="offline").inc()
+    return addressed
+
+
+async def online_users(user_ids: Sequence[str]) -> Dict[str, bool]:
+    """Whether each user has a socket seen within WS_PRESENCE_TIMEOUT"""
+    if not user_ids:
+        return {}
+    cutoff = time.time() - settings.WS_PRESENCE_TIMEOUT
+    redis_client = await get_redis()
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.zcount(PRESENCE_KEY.format(user_id=user_id), cutoff, "+inf")
+        counts = await pipe.execute()
+    return {str(user_id): count > 0 for user_id, count in zip(user_ids, counts)}
+
+
+hub = ConnectionHub()
+
+
+async def serve_socket(websocket, user_id: str) -> None:
+    """Run an accepted WebSocket for an authenticated user until it closes
+
+    Any frame from the client counts as a heartbeat; "ping" is answered
+    with "pong".
+    """
+    from starlette.websockets import WebSocketDisconnect
+
+    connection = await hub.register(user_id, websocket)
+    try:
+        while True:
+            data = await websocket.receive_text()
+            hub.touch(connection)
+            if data == "ping":
+                hub.send(connection, "pong")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await hub.unregister(connection)
+
+
+async def start_presence() -> None:
+    await hub.start()
+
+
+async def stop_presence() -> None:
+    await hub.stop()
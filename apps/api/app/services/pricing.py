@@ -0,0 +1,230 @@
+"""
+Price quote engine for Homlo API
+Prices many listings for one stay in a single vectorized pass
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_cache_many, invalidate_tags, set_cache_many
+
+# Nights charged at the weekend price (Friday and Saturday; Monday is 0)
+WEEKEND_NIGHTS = (4, 5)
+
+QUOTE_KEY = "quote:{listing_id}:{check_in}:{check_out}"
+PRICING_TAG = "pricing:{listing_id}"
+
+
+def _to_paisa(amount) -> int:
+    """Convert a PKR amount to integer paisa so sums stay exact"""
+    return int(round(float(amount or 0) * 100))
+
+
+def _to_pkr(paisa) -> float:
+    """Convert integer paisa back to PKR"""
+    return int(paisa) / 100
+
+
+def compute_quotes(
+    rules: Sequence[Dict[str, Any]],
+    seasonal: Sequence[Dict[str, Any]],
+    check_in: date,
+    check_out: date,
+) -> Dict[str, Dict[str, Any]]:
+    """Price a stay for every listing in ``rules``
+
+    ``rules`` are pricing_rules rows and ``seasonal`` seasonal_prices rows (end
+    date inclusive). Nightly prices for all listings are laid out as one
+    listings x nights matrix: weekend/base prices are broadcast first, then
+    seasonal ranges are written over them, with later-starting seasons
+    winning where they overlap.
+    """
+    nights = (check_out - check_in).days
+    if nights <= 0:
+        raise ValueError("check_out must be after check_in")
+    if not rules:
+        return {}
+
+    listing_ids = [str(rule["listing_id"]) for rule in rules]
+    positions = {listing_id: i for i, listing_id in enumerate(listing_ids)}
+
+    base = np.array(
+        [_to_paisa(rule["base_price_pkr"]) for rule in rules], dtype=np.int64
+    )
+    weekend = np.array(
+        [
+            _to_paisa(rule["weekend_price_pkr"])
+            if rule.get("weekend_price_pkr")
+            else -1
+            for rule in rules
+        ],
+        dtype=np.int64,
+    )
+    weekend = np.where(weekend < 0, base, weekend)
+    cleaning = np.array(
+        [_to_paisa(rule.get("cleaning_fee_pkr")) for rule in rules], dtype=np.int64
+    )
+    deposit = np.array(
+        [_to_paisa(rule.get("deposit_pkr")) for rule in rules], dtype=np.int64
+    )
+    min_nights = np.array(
+        [rule.get("min_nights") or 1 for rule in rules], dtype=np.int64
+    )
+    # 0 means no maximum
+    max_nights = np.array(
+        [rule.get("max_nights") or 0 for rule in rules], dtype=np.int64
+    )
+
+    weekdays = (np.arange(nights) + check_in.weekday()) % 7
+    is_weekend = np.isin(weekdays, WEEKEND_NIGHTS)
+    prices = np.where(is_weekend[None, :], weekend[:, None], base[:, None])
+
+    seasons = sorted(
+        (season for season in seasonal if str(season["listing_id"]) in positions),
+        key=lambda season: season["start_date"],
+    )
+    if seasons:
+        rows = np.array(
+            [positions[str(season["listing_id"])] for season in seasons], dtype=np.int64
+        )
+        starts = np.clip(
+            [(season["start_date"] - check_in).days for season in seasons], 0, nights
+        )
+        ends = np.clip(
+            [(season["end_date"] - check_in).days + 1 for season in seasons], 0, nights
+        )
+        season_prices = np.array(
+            [_to_paisa(season["price_pkr"]) for season in seasons], dtype=np.int64
+        )
+        lengths = np.maximum(ends - starts, 0)
+        # Flat matrix offsets of every night covered by every season
+        offsets = np.repeat(
+            rows * nights + starts - np.cumsum(lengths) + lengths, lengths
+        )
+        cells = np.arange(int(lengths.sum())) + offsets
+        values = np.repeat(season_prices, lengths)
+        # NumPy leaves the order of writes to repeated indices unspecified, so
+        # resolve overlaps first: keep each night's last season in start order
+        _, last = np.unique(cells[::-1], return_index=True)
+        keep = len(cells) - 1 - last
+        prices.flat[cells[keep]] = values[keep]
+
+    subtotals = prices.sum(axis=1)
+    totals = subtotals + cleaning
+    dates = [(check_in + timedelta(days=i)).isoformat() for i in range(nights)]
+
+    quotes = {}
+    for i, listing_id in enumerate(listing_ids):
+        quotes[listing_id] = {
+            "listing_id": listing_id,
+            "check_in": check_in.isoformat(),
+            "check_out": check_out.isoformat(),
+            "nights": nights,
+            "nightly": [
+                {"date": day, "price_pkr": _to_pkr(price)}
+                for day, price in zip(dates, prices[i])
+            ],
+            "subtotal_pkr": _to_pkr(subtotals[i]),
+            "cleaning_fee_pkr": _to_pkr(cleaning[i]),
+            "total_pkr": _to_pkr(totals[i]),
+            "deposit_pkr": _to_pkr(deposit[i]),
+            "min_nights": int(min_nights[i]),
+            "max_nights": int(max_nights[i]) or None,
+            "min_nights_violation": bool(nights < min_nights[i]),
+            "max_nights_violation": bool(0 < max_nights[i] < nights),
+        }
+    return quotes
+
+
+async def _load_pricing(
+    db: AsyncSession, listing_ids: List[str], check_in: date, check_out: date
+):
+    """Load pricing rules and overlapping seasonal prices for listings"""
+    rules = await db.execute(
+        text(
+            """
+            SELECT listing_id::text AS listing_id, base_price_pkr, weekend_price_pkr,
+                   cleaning_fee_pkr, deposit_pkr, min_nights, max_nights
+            FROM pricing_rules
+            WHERE listing_id = ANY(CAST(:ids AS uuid[]))
+        """
+        ),
+        {"ids": listing_ids},
+    )
+    seasonal = await db.execute(
+        text(
+            """
+            SELECT listing_id::text AS listing_id, start_date, end_date, price_pkr
+            FROM seasonal_prices
+            WHERE listing_id = ANY(CAST(:ids AS uuid[]))
+              AND start_date < :check_out AND end_date >= :check_in
+        """
+        ),
+        {"ids": listing_ids, "check_in": check_in, "check_out": check_out},
+    )
+    return [dict(row) for row in rules.mappings()], [
+        dict(row) for row in seasonal.mappings()
+    ]
+
+
+async def quote_listings(
+    db: AsyncSession, listing_ids: Sequence[str], check_in: date, check_out: date
+) -> Dict[str, Dict[str, Any]]:
+    """Quote a stay for many listings, e.g. a page of search results
+
+    Cached quotes are fetched in one round trip; the misses are priced
+    together and cached under their listing's pricing tag. Listings without
+    pricing rules are left out of the result.
+    """
+    listing_ids = [str(listing_id) for listing_id in listing_ids]
+    keys = [
+        QUOTE_KEY.format(
+            listing_id=listing_id,
+            check_in=check_in.isoformat(),
+            check_out=check_out.isoformat(),
+        )
+        for listing_id in listing_ids
+    ]
+    cached = await get_cache_many(keys)
+
+    quotes = {
+        listing_id: quote
+        for listing_id, quote in zip(listing_ids, cached)
+        if quote is not None
+    }
+    missing = [listing_id for listing_id in listing_ids if listing_id not in quotes]
+    if not missing:
+        return quotes
+
+    rules, seasonal = await _load_pricing(db, missing, check_in, check_out)
+    computed = compute_quotes(rules, seasonal, check_in, check_out)
+    quotes.update(computed)
+
+    key_for = dict(zip(listing_ids, keys))
+    await set_cache_many(
+        {key_for[listing_id]: quote for listing_id, quote in computed.items()},
+        expire=settings.QUOTE_CACHE_TTL,
+        tags={
+            key_for[listing_id]: [PRICING_TAG.format(listing_id=listing_id)]
+            for listing_id in computed
+        },
+    )
+    return quotes
+
+
+async def quote_listing(
+    db: AsyncSession, listing_id: str, check_in: date, check_out: date
+) -> Optional[Dict[str, Any]]:
+    """Quote a stay for one listing (booking flow)"""
+    quotes = await quote_listings(db, [listing_id], check_in, check_out)
+    return quotes.get(str(listing_id))
+
+
+async def invalidate_listing_quotes(listing_id: str) -> int:
+    """Drop cached quotes after a listing's pricing rules or seasonal prices change"""
+    return await invalidate_tags(PRICING_TAG.format(listing_id=listing_id))
@@ -0,0 +1,153 @@
+"""
+Listing text search for Homlo API
+Ranked full-text search over the stored listing search vector, and
+typeahead over places and listing titles
+"""
+
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_or_compute
+from app.services.places import complete_places, normalize
+from app.services.pricing import quote_listings
+
+# Trigrams need three characters; shorter prefixes only complete places
+MIN_TITLE_QUERY_LENGTH = 3
+
+TYPEAHEAD_KEY = "typeahead:{query}:{limit}"
+
+# ts_rank_cd reads the weights stored in search_vector instead of
+# recomputing it; normalization 32 maps the rank into [0, 1)
+SEARCH_QUERY = """
+    SELECT l.id, l.title, l.city, l.area, ts_rank_cd(l.search_vector, q, 32) AS rank
+    FROM listings l, websearch_to_tsquery('english', :query) q
+    WHERE l.search_vector @@ q
+      AND l.status = 'active'
+      AND (CAST(:city AS text) IS NULL OR l.city = :city)
+    ORDER BY rank DESC, l.id
+    LIMIT :limit OFFSET :offset
+"""
+
+# Fires the search_vector trigger (a no-op update) for the next batch of
+# rows written before it existed, in id order
+BACKFILL_QUERY = """
+    WITH batch AS (
+        SELECT id FROM listings
+        WHERE search_vector IS NULL AND id > CAST(:after AS uuid)
+        ORDER BY id
+        LIMIT :batch_size
+    )
+    UPDATE listings l SET title = l.title
+    FROM batch
+    WHERE l.id = batch.id
+    RETURNING l.id::text
+"""
+NIL_ID = "00000000-0000-0000-0000-000000000000"
+
+# <% matches the query against the best-matching part of the title, so a
+# partly typed word still finds it. <<-> is the matching distance
+# (1 - word_similarity), which the GiST trigram index returns nearest first,
+# so only the first :limit matches are read instead of sorting them all
+TITLE_TYPEAHEAD_QUERY = """
+    SELECT id, title, city
+    FROM listings
+    WHERE :query <% title AND status = 'active'
+    ORDER BY :query <<-> title
+    LIMIT :limit
+"""
+
+
+async def search_listings(
+    db: AsyncSession,
+    query: str,
+    city: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    check_in: Optional[date] = None,
+    check_out: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """Active listings matching a search phrase, best match first
+
+    ``query`` takes web search syntax: quoted phrases, ``or`` and ``-word``.
+    Given a stay, every result carries its price ``quote``, priced for the
+    whole page at once (None for listings without pricing rules).
+    """
+    if not query.strip():
+        return []
+    result = await db.execute(
+        text(SEARCH_QUERY),
+        {"query": query, "city": city, "limit": limit, "offset": offset},
+    )
+    results = [
+        {
+            "id": str(row.id),
+            "title": row.title,
+            "city": row.city,
+            "area": row.area,
+            "rank": float(row.rank),
+        }
+        for row in result
+    ]
+    if check_in and check_out and results:
+        quotes = await quote_listings(
+            db, [listing["id"] for listing in results], check_in, check_out
+        )
+        for listing in results:
+            listing["quote"] = quotes.get(listing["id"])
+    return results
+
+
+async def typeahead(
+    db: AsyncSession, query: str, limit: int = 10
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Suggestions for a partly typed search
+
+    Cities and areas come from the in-process trie without a round trip;
+    listing titles come from the trigram index and are cached briefly per
+    query, since typeahead sees the same prefixes over and over.
+    """
+    places = complete_places(query, limit)
+    normalized = normalize(query)
+    if len(normalized) < MIN_TITLE_QUERY_LENGTH:
+        return {"places": places, "listings": []}
+
+    async def load_titles():
+        result = await db.execute(
+            text(TITLE_TYPEAHEAD_QUERY), {"query": normalized, "limit": limit}
+        )
+        return [
+            {"id": str(row.id), "title": row.title, "city": row.city} for row in result
+        ]
+
+    listings = await get_or_compute(
+        TYPEAHEAD_KEY.format(query=normalized, limit=limit),
+        load_titles,
+        expire=settings.TYPEAHEAD_CACHE_TTL,
+        local_ttl=settings.TYPEAHEAD_CACHE_TTL,
+    )
+    return {"places": places, "listings": listings or []}
+
+
+async def backfill_search_vectors(db: AsyncSession, batch_size: int = 1000) -> int:
+    """Fill in search_vector for rows written before its trigger existed
+
+    Walks the rows in id order, committing every ``batch_size`` rows so no
+    transaction holds many row locks or a long snapshot. Returns the number
+    of rows updated.
+    """
+    updated = 0
+    after = NIL_ID
+    while True:
+        result = await db.execute(
+            text(BACKFILL_QUERY), {"after": after, "batch_size": batch_size}
+        )
+        ids = [row[0] for row in result]
+        await db.commit()
+        if not ids:
+            return updated
+        updated += len(ids)
+        after = max(ids)
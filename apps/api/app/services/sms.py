@@ -0,0 +1,441 @@
+"""
+SMS delivery for Homlo API
+Provider adapters over a shared HTTP connection pool, with batching, retries
+and a priority lane that keeps OTP codes ahead of bulk sends
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from prometheus_client import Counter, Histogram
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+SMS_MESSAGES = Counter(
+    "sms_messages_total",
+    "SMS messages by provider, lane and outcome",
+    ["provider", "lane", "result"],
+)
+SMS_PROVIDER_REQUESTS = Histogram(
+    "sms_provider_request_seconds",
+    "Provider API call latency",
+    ["provider"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+OTP_MESSAGE = "Your Homlo verification code is {code}. It expires in 5 minutes."
+
+# Transport errors raised before the request reached the provider, so a
+# retry cannot send the message twice
+RETRYABLE_TRANSPORT_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+)
+
+
+class RetryableSMSError(Exception):
+    """The provider asked us to try again later (429 or 5xx)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _check_retryable(response: httpx.Response) -> None:
+    if response.status_code == 429 or response.status_code >= 500:
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = None
+        raise RetryableSMSError(
+            f"provider returned {response.status_code}", retry_after
+        )
+
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        payload = response.json()
+        message = payload.get("message") or payload.get("error")
+    except ValueError:
+        message = None
+    return f"{response.status_code} {message or response.reason_phrase}"
+
+
+class SMSProvider(ABC):
+    """Adapter for one SMS provider's HTTP API"""
+
+    name = ""
+    base_url = ""
+    # Recipients per API call for the same body
+    max_batch = 1
+    # Concurrent API calls, unless SMS_CONCURRENCY overrides it
+    concurrency = 10
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url or self.base_url
+
+    def client_options(self) -> Dict[str, Any]:
+        """Authentication for the shared HTTP client"""
+        return {}
+
+    @abstractmethod
+    async def send_batch(
+        self, client: httpx.AsyncClient, recipients: List[str], body: str
+    ) -> Dict[str, Optional[str]]:
+        """Send ``body`` to every recipient; returns the error per recipient (None if accepted)
+
+        Raises RetryableSMSError when the whole call should be retried.
+        """
+
+
+class TwilioProvider(SMSProvider):
+    """Twilio Programmable Messaging, one recipient per call"""
+
+    name = "twilio"
+    base_url = "https://api.twilio.com"
+    concurrency = 20
+
+    def client_options(self) -> Dict[str, Any]:
+        return {"auth": (settings.SMS_ACCOUNT_SID or "", settings.SMS_AUTH_TOKEN or "")}
+
+    async def send_batch(
+        self, client: httpx.AsyncClient, recipients: List[str], body: str
+    ) -> Dict[str, Optional[str]]:
+        to = recipients[0]
+        response = await client.post(
+            f"/2010-04-01/Accounts/{settings.SMS_ACCOUNT_SID}/Messages.json",
+            data={"To": to, "From": settings.SMS_FROM_NUMBER, "Body": body},
+        )
+        _check_retryable(response)
+        return {to: _error_message(response) if response.status_code >= 400 else None}
+
+
+class GatewayProvider(SMSProvider):
+    """Bulk JSON gateway, as offered by local aggregators: many recipients per call"""
+
+    name = "gateway"
+    concurrency = 10
+
+    def __init__(self, base_url: Optional[str] = None):
+        super().__init__(base_url)
+        self.max_batch = settings.SMS_BATCH_SIZE
+
+    def client_options(self) -> Dict[str, Any]:
+        if not settings.SMS_AUTH_TOKEN:
+            return {}
+        return {"headers": {"Authorization": f"Bearer {settings.SMS_AUTH_TOKEN}"}}
+
+    async def send_batch(
+        self, client: httpx.AsyncClient, recipients: List[str], body: str
+    ) -> Dict[str, Optional[str]]:
+        response = await client.post(
+            "/v1/messages",
+            json={"from": settings.SMS_FROM_NUMBER, "to": recipients, "text": body},
+        )
+        _check_retryable(response)
+        if response.status_code >= 400:
+            error = _error_message(response)
+            return {to: error for to in recipients}
+
+        results = {}
+        for result in response.json().get("results", []):
+            results[result["to"]] = (
+                (result.get("error") or "rejected")
+                if result.get("status") == "failed"
+                else None
+            )
+        return {
+            to: results.get(to, "missing from provider response") for to in recipients
+        }
+
+
+PROVIDERS = {
+    "twilio": TwilioProvider,
+    "gateway": GatewayProvider,
+}
+
+
+class LaneLimiter:
+    """Concurrency limit shared by a priority lane and a bulk lane
+
+    Bulk calls never take the last ``reserved`` slots, and a free slot always
+    goes to a waiting priority call first, so an OTP waits for at most one
+    provider call to finish however large the bulk backlog is.
+    """
+
+    def __init__(self, limit: int, reserved: int):
+        self.limit = limit
+        self.bulk_limit = max(1, limit - reserved)
+        self.in_use = 0
+        self._waiters = {True: deque(), False: deque()}
+
+    def _lane_limit(self, priority: bool) -> int:
+        return self.limit if priority else self.bulk_limit
+
+    def _wake(self) -> None:
+        for priority in (True, False):
+            waiters = self._waiters[priority]
+            while waiters and self.in_use < self._lane_limit(priority):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self.in_use += 1
+                    waiter.set_result(None)
+            if waiters:
+                return
+
+    async def acquire(self, priority: bool) -> None:
+        if (
+            self.in_use < self._lane_limit(priority)
+            and not self._waiters[True]
+            and (priority or not self._waiters[False])
+        ):
+            self.in_use += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            elif waiter in self._waiters[priority]:
+                self._waiters[priority].remove(waiter)
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, priority: bool):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+SLOTS_KEY = "sms:slots:{provider}"
+
+# Take a provider slot if the lane is under its limit; slots are holder
+# tokens scored by lease expiry, so a crashed worker's slots free up
+ACQUIRE_SLOT_LUA = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class SharedLaneLimiter:
+    """Lane limits for one provider shared by every worker through Redis
+
+    Celery runs tasks in many worker processes, so the provider's concurrency
+    limit and the OTP reservation have to be held outside the process to
+    mean anything. Bulk calls never take the last ``reserved`` slots, so an OTP only waits behind other OTPs. If
+    Redis is unavailable, calls go ahead unlimited rather than fail.
+    """
+
+    def __init__(self, provider: str, limit: int, reserved: int):
+        self.key = SLOTS_KEY.format(provider=provider)
+        self.limit = limit
+        self.bulk_limit = max(1, limit - reserved)
+
+    async def _try_acquire(self, redis_client, token: str, priority: bool) -> bool:
+        acquired = await redis_client.eval(
+            ACQUIRE_SLOT_LUA,
+            1,
+            self.key,
+            time.time(),
+            self.limit if priority else self.bulk_limit,
+            settings.SMS_SLOT_LEASE_SECONDS,
+            token,
+        )
+        return bool(acquired)
+
+    @asynccontextmanager
+    async def slot(self, priority: bool):
+        token = uuid.uuid4().hex
+        try:
+            redis_client = await get_redis()
+            delay = 0.005
+            while not await self._try_acquire(redis_client, token, priority):
+                await asyncio.sleep(delay * (0.5 + random.random()))
+                delay = min(delay * 2, 0.05 if priority else 0.2)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"SMS slot unavailable, sending unlimited: {e}")
+            token = None
+
+        try:
+            yield
+        finally:
+            if token is not None:
+                try:
+                    await redis_client.zrem(self.key, token)
+                except Exception:
+                    # The lease expires on its own
+                    pass
+
+
+class SMSSender:
+    """Sends through one provider over a pooled HTTP client
+
+    ``limiter`` defaults to an in-process LaneLimiter; get_sms_sender shares
+    the limit across workers instead.
+    """
+
+    def __init__(self, provider: SMSProvider, limiter=None):
+        self.provider = provider
+        limit = settings.SMS_CONCURRENCY or provider.concurrency
+        self.client = httpx.AsyncClient(
+            base_url=provider.base_url,
+            timeout=settings.SMS_TIMEOUT,
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+            **provider.client_options(),
+        )
+        self.limiter = limiter or LaneLimiter(
+            limit, min(settings.SMS_PRIORITY_RESERVED, limit - 1)
+        )
+
+    async def _call(
+        self, recipients: List[str], body: str, priority: bool
+    ) -> Dict[str, Optional[str]]:
+        """One provider call, retried with full jitter on throttling and server errors"""
+        for attempt in range(settings.SMS_MAX_RETRIES + 1):
+            try:
+                async with self.limiter.slot(priority):
+                    with SMS_PROVIDER_REQUESTS.labels(
+                        provider=self.provider.name
+                    ).time():
+                        return await self.provider.send_batch(
+                            self.client, recipients, body
+                        )
+            except (RetryableSMSError, *RETRYABLE_TRANSPORT_ERRORS) as e:
+                if attempt == settings.SMS_MAX_RETRIES:
+                    error = f"gave up after {attempt + 1} attempts: {e}"
+                    return {to: error for to in recipients}
+                delay = random.uniform(
+                    0,
+                    min(
+                        settings.SMS_RETRY_MAX_DELAY,
+                        settings.SMS_RETRY_BASE_DELAY * 2**attempt,
+                    ),
+                )
+                retry_after = getattr(e, "retry_after", None)
+                await asyncio.sleep(max(delay, retry_after or 0))
+            except httpx.HTTPError as e:
+                # The request may have reached the provider; retrying could send twice
+                error = f"{type(e).__name__}: {e}"
+                return {to: error for to in recipients}
+
+    async def send_many(
+        self, messages: Sequence[Dict[str, str]], priority: bool = False
+    ) -> Dict[str, Any]:
+        """Send {"to", "body"} messages, one provider call per batch of recipients sharing a body"""
+        started = time.perf_counter()
+        by_body: Dict[str, List[str]] = defaultdict(list)
+        for message in messages:
+            by_body[message["body"]].append(message["to"])
+
+        size = self.provider.max_batch
+        batches = [
+            (recipients[i : i + size], body)
+            for body, recipients in by_body.items()
+            for i in range(0, len(recipients), size)
+        ]
+        results = await asyncio.gather(
+            *(self._call(recipients, body, priority) for recipients, body in batches)
+        )
+
+        failures = {
+            to: error
+            for result in results
+            for to, error in result.items()
+            if error is not None
+        }
+        sent = len(messages) - len(failures)
+        lane = "priority" if priority else "bulk"
+        SMS_MESSAGES.labels(provider=self.provider.name, lane=lane, result="sent").inc(
+            sent
+        )
+        SMS_MESSAGES.labels(
+            provider=self.provider.name, lane=lane, result="failed"
+        ).inc(len(failures))
+
+        elapsed = time.perf_counter() - started
+        return {
+            "sent": sent,
+            "failed": len(failures),
+            "failures": failures,
+            "requests": len(batches),
+            "seconds": round(elapsed, 3),
+            "messages_per_second": round(sent / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+_sender: Optional[SMSSender] = None
+
+
+def get_sms_sender() -> SMSSender:
+    """Sender for the configured provider, created on first use in this process
+
+    In workers it lives as long as the process's event loop, so its pooled
+    HTTP connections are reused across tasks; it is closed at shutdown. Its
+    provider slots are shared with every other worker through Redis.
+    """
+    global _sender
+    if _sender is None:
+        provider = PROVIDERS[settings.SMS_PROVIDER](settings.SMS_API_URL)
+        limit = settings.SMS_CONCURRENCY or provider.concurrency
+        limiter = SharedLaneLimiter(
+            provider.name, limit, min(settings.SMS_PRIORITY_RESERVED, limit - 1)
+        )
+        _sender = SMSSender(provider, limiter)
+    return _sender
+
+
+async def close_sms_sender() -> None:
+    global _sender
+    if _sender is not None:
+        sender, _sender = _sender, None
+        await sender.close()
+
+
+async def send_sms(to: str, body: str, priority: bool = False) -> Optional[str]:
+    """Send one SMS; returns the error, or None if the provider accepted it"""
+    result = await get_sms_sender().send_many(
+        [{"to": to, "body": body}], priority=priority
+    )
+    return result["failures"].get(to)
+
+
+async def send_otp(to: str, code: str) -> Optional[str]:
+    """Send a verification code through the priority lane"""
+    return await send_sms(to, OTP_MESSAGE.format(code=code), priority=True)
+
+
+async def send_bulk_sms(messages: Sequence[Dict[str, str]]) -> Dict[str, Any]:
+    """Send many {"to", "body"} messages through the bulk lane"""
+    return await get_sms_sender().send_many(messages)
@@ -0,0 +1,74 @@
+"""
+Celery background tasks for Homlo API
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from celery import signals
+
+logger = logging.getLogger("app.tasks")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def worker_loop() -> asyncio.AbstractEventLoop:
+    """This worker process's event loop, created on first use"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_async(func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """Run an async task body on this worker process's event loop
+
+    Pooled database connections, Redis clients and HTTP clients belong to
+    the loop that opened them; keeping one loop per process lets every task
+    reuse them. They are released when the process shuts down.
+    """
+    return worker_loop().run_until_complete(func(*args, **kwargs))
+
+
+async def _close_pools() -> None:
+    from app.core.database import close_db
+    from app.core.redis import close_redis
+    from app.services.sms import close_sms_sender
+
+    for close in (close_sms_sender, close_db, close_redis):
+        try:
+            await close()
+        except Exception as e:
+            logger.warning(f"Failed to close {close.__name__}: {e}")
+
+
+@signals.worker_process_init.connect(weak=False)
+def open_worker_loop(**kwargs):
+    """Start each pool process with its own loop and connection pool
+
+    Connections the parent opened before forking are left to the parent.
+    """
+    from app.core.database import engine
+
+    engine.sync_engine.dispose(close=False)
+    worker_loop()
+
+
+@signals.worker_process_shutdown.connect(weak=False)
+@signals.worker_shutdown.connect(weak=False)
+def close_worker_loop(**kwargs):
+    """Release the process's pools, then close its loop
+
+    Prefork pool processes get worker_process_shutdown; solo and thread
+    pools run tasks in the main process, which gets worker_shutdown.
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    try:
+        _loop.run_until_complete(_close_pools())
+    finally:
+        _loop.close()
+        _loop = None
@@ -0,0 +1,77 @@
+"""
+Booking tasks for Homlo API
+Hourly reminder and payout runs that fan due bookings out as chunk subtasks,
+and upkeep of the availability index
+"""
+
+from typing import Any, Dict, List
+
+from celery import chord
+
+from app.core.celery import HomloTask, celery_app
+from app.services.availability import trim_index
+from app.services.booking_jobs import (
+    PAYOUTS,
+    REMINDERS,
+    create_payouts,
+    finish_run,
+    plan_run,
+    send_reminders,
+)
+from app.tasks import run_async
+
+
+def _start_run(job_name: str, chunk_task) -> Dict[str, Any]:
+    """Plan a run and dispatch its chunks in parallel
+
+    The high-water mark is committed by ``finish_booking_job`` once every
+    chunk has succeeded; if one fails, the next run walks the same bookings
+    again and the chunks skip whatever was already handled.
+    """
+    plan = run_async(plan_run, job_name)
+    chunks = plan["chunks"]
+    if not chunks:
+        return run_async(finish_run, plan, [])
+
+    summary = {key: value for key, value in plan.items() if key != "chunks"}
+    chord(chunk_task.s(chunk) for chunk in chunks)(finish_booking_job.s(summary))
+    return dict(summary, chunks=len(chunks))
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def send_booking_reminders(self):
+    """Send reminder emails for stays due since the last run"""
+    return _start_run(REMINDERS.name, send_reminder_chunk)
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def process_payouts(self):
+    """Create host payouts for stays due since the last run"""
+    return _start_run(PAYOUTS.name, create_payout_chunk)
+
+
+@celery_app.task(bind=True, base=HomloTask, max_retries=3, default_retry_delay=300)
+def send_reminder_chunk(self, booking_ids: List[str]):
+    """Send the reminders of one chunk; retried while SMTP is unreachable"""
+    try:
+        return run_async(send_reminders, booking_ids)
+    except ConnectionError as e:
+        raise self.retry(exc=e)
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def create_payout_chunk(self, booking_ids: List[str]):
+    """Create the payouts of one chunk"""
+    return run_async(create_payouts, booking_ids)
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def finish_booking_job(self, results: List[Dict[str, Any]], plan: Dict[str, Any]):
+    """Commit a run's high-water mark and record its counts"""
+    return run_async(finish_run, plan, results)
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def trim_availability_index(self):
+    """Drop availability bitmap days the rolling window has moved past"""
+    return {"keys": run_async(trim_index)}
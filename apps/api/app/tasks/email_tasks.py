@@ -0,0 +1,35 @@
+"""
+Email tasks for Homlo API
+"""
+
+from typing import Any, Dict, List, Optional
+
+from app.core.celery import HomloTask, celery_app
+from app.services.mailer import precompile_templates, send_bulk
+from app.services.mailer import send_email as deliver_email
+from app.tasks import run_async
+
+# Compiled in the worker's main process, so forked children inherit them
+precompile_templates()
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def send_email(
+    self, to: str, template: str, subject: str, context: Optional[Dict[str, Any]] = None
+):
+    """Send a single templated email"""
+    run_async(deliver_email, to, template, subject, context)
+    return {"to": to, "template": template}
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def send_bulk_emails(
+    self, template: str, subject: str, recipients: List[Dict[str, Any]]
+):
+    """Send a templated email to many recipients over reused SMTP connections
+
+    ``recipients`` are {"email": ..., "context": {...}} items. Returns the
+    sent and failed counts, messages per second and the failure reason per
+    recipient.
+    """
+    return run_async(send_bulk, template, subject, recipients)
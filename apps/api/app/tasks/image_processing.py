@@ -0,0 +1,225 @@
+"""
+Image processing tasks for Homlo API
+Decodes each listing photo once and writes all of its WebP renditions
+"""
+
+import asyncio
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+from sqlalchemy import text
+
+from app.core.celery import HomloTask, celery_app
+from app.core.config import settings
+from app.tasks import run_async
+
+logger = logging.getLogger("app.image_processing")
+
+# Longest side of each rendition, largest first: each rendition is resized
+# from the previous one instead of from the original
+RENDITIONS = (("full", 1920), ("card", 800), ("thumbnail", 320))
+
+# Renditions are stored next to the original upload
+RENDITION_KEY = "{stem}/{name}.webp"
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_storage = None
+
+
+def _fit(size: Tuple[int, int], longest: int) -> Tuple[int, int]:
+    """Size scaled down so its longest side is at most ``longest``"""
+    width, height = size
+    scale = min(1.0, longest / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def render_renditions(
+    data: bytes, quality: int = 80, method: int = 2
+) -> Tuple[int, int, Dict[str, bytes]]:
+    """Decode an upload once and encode every rendition as WebP
+
+    JPEGs are decoded in draft mode, so libjpeg scales by 1/2, 1/4 or 1/8
+    while decoding as long as the result still covers the full rendition.
+    ``method`` is the WebP effort (0-6); above 2 it costs more time than the
+    decode saves for a few percent smaller files. Returns the original width
+    and height (after EXIF orientation) and the encoded renditions by name.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+
+        image.draft("RGB", _fit(image.size, RENDITIONS[0][1]))
+        ImageOps.exif_transpose(image, in_place=True)
+
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        current = image.convert("RGBA" if has_alpha else "RGB")
+
+    renditions = {}
+    for name, longest in RENDITIONS:
+        size = _fit(current.size, longest)
+        if size != current.size:
+            current = current.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        buffer = io.BytesIO()
+        current.save(buffer, "WEBP", quality=quality, method=method)
+        renditions[name] = buffer.getvalue()
+    return width, height, renditions
+
+
+def _pool_size() -> int:
+    return settings.IMAGE_PROCESS_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Process pool for decoding and encoding, shared by all tasks in this worker"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_pool_size())
+    return _pool
+
+
+def _get_storage():
+    global _storage
+    if _storage is None:
+        from minio import Minio
+
+        _storage = Minio(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ROOT_USER,
+            secret_key=settings.MINIO_ROOT_PASSWORD,
+            secure=settings.MINIO_SECURE,
+        )
+    return _storage
+
+
+def _download(key: str) -> bytes:
+    response = _get_storage().get_object(settings.MINIO_BUCKET_NAME, key)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def _upload(key: str, data: bytes) -> None:
+    _get_storage().put_object(
+        settings.MINIO_BUCKET_NAME,
+        key,
+        io.BytesIO(data),
+        len(data),
+        content_type="image/webp",
+    )
+
+
+async def _load_photos(
+    listing_id: str, photo_ids: Optional[List[str]]
+) -> List[Tuple[str, str]]:
+    """Photos to process: the given ones, or every photo without dimensions yet"""
+    from app.core.database import AsyncSessionLocal
+
+    if photo_ids:
+        query = text(
+            """
+            SELECT id::text, key FROM listing_photos
+            WHERE listing_id = CAST(:listing_id AS uuid) AND id = ANY(CAST(:ids AS uuid[]))
+        """
+        )
+        params = {
+            "listing_id": listing_id,
+            "ids": [str(photo_id) for photo_id in photo_ids],
+        }
+    else:
+        query = text(
+            """
+            SELECT id::text, key FROM listing_photos
+            WHERE listing_id = CAST(:listing_id AS uuid) AND width IS NULL
+        """
+        )
+        params = {"listing_id": listing_id}
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(query, params)
+        return [(photo_id, key) for photo_id, key in result]
+
+
+async def _save_dimensions(dimensions: List[Dict[str, Any]]) -> None:
+    from app.core.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            text(
+                "UPDATE listing_photos SET width = :width, height = :height WHERE id = CAST(:id AS uuid)"
+            ),
+            dimensions,
+        )
+        await db.commit()
+
+
+async def _process_listing_images(
+    listing_id: str, photo_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    photos = await _load_photos(listing_id, photo_ids)
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    # Enough photos in flight to keep the pool busy while others are
+    # downloading or uploading
+    in_flight = asyncio.Semaphore(_pool_size() * 2)
+
+    async def process(photo_id: str, key: str) -> Dict[str, Any]:
+        async with in_flight:
+            data = await asyncio.to_thread(_download, key)
+            width, height, renditions = await loop.run_in_executor(
+                pool,
+                render_renditions,
+                data,
+                settings.IMAGE_WEBP_QUALITY,
+                settings.IMAGE_WEBP_METHOD,
+            )
+            stem = os.path.splitext(key)[0]
+            await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        _upload, RENDITION_KEY.format(stem=stem, name=name), body
+                    )
+                    for name, body in renditions.items()
+                )
+            )
+            return {"id": photo_id, "width": width, "height": height}
+
+    results = await asyncio.gather(
+        *(process(photo_id, key) for photo_id, key in photos), return_exceptions=True
+    )
+
+    dimensions = []
+    for (photo_id, key), result in zip(photos, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Failed to process photo {photo_id} ({key}): {result}")
+        else:
+            dimensions.append(result)
+    if dimensions:
+        await _save_dimensions(dimensions)
+
+    return {
+        "listing_id": listing_id,
+        "processed": len(dimensions),
+        "failed": len(photos) - len(dimensions),
+    }
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def process_listing_images(
+    self, listing_id: str, photo_ids: Optional[List[str]] = None
+):
+    """Create WebP renditions of a listing's photos and record their dimensions
+
+    Decoding and encoding run in this worker's process pool, which uses
+    every core, so the images queue is meant for a solo-pool worker.
+    """
+    return run_async(_process_listing_images, str(listing_id), photo_ids)
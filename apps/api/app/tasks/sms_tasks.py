@@ -0,0 +1,35 @@
+"""
+SMS tasks for Homlo API
+"""
+
+from typing import Dict, List
+
+from app.core.celery import HomloTask, celery_app
+from app.services.sms import send_bulk_sms as deliver_bulk_sms
+from app.services.sms import send_otp
+from app.services.sms import send_sms as deliver_sms
+from app.tasks import run_async
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def send_otp_sms(self, phone: str, code: str):
+    """Send a verification code (routed to the otp queue, ahead of bulk sends)"""
+    error = run_async(send_otp, phone, code)
+    return {"to": phone, "error": error}
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def send_sms(self, phone: str, body: str):
+    """Send a single SMS"""
+    error = run_async(deliver_sms, phone, body)
+    return {"to": phone, "error": error}
+
+
+@celery_app.task(bind=True, base=HomloTask)
+def send_bulk_sms(self, messages: List[Dict[str, str]]):
+    """Send many {"to", "body"} messages, batching recipients that share a body
+
+    Returns the sent and failed counts, provider calls made, messages per
+    second and the failure reason per number.
+    """
+    return run_async(deliver_bulk_sms, messages)
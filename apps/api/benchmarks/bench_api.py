@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""
+API hot path benchmark suite for Homlo API
+Drives the ASGI app in-process over an httpx ASGI transport, with SQLite and
+fakeredis standing in for Postgres and Redis, and compares the results with
+a stored baseline
+
+Usage:
+    python benchmarks/bench_api.py [--requests N] [--only NAME ...]
+    python benchmarks/bench_api.py --update-baseline
+
+Exits non-zero when a scenario's p95 latency or throughput is worse than the
+baseline by more than --tolerance. Baselines are machine specific; refresh
+them with --update-baseline on the machine that runs the comparison.
+"""
+
+# ruff: noqa: E402
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import types
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Add the app directory to the Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+# Run from a scratch directory so logs/ and uploads/ do not land in the repo
+WORKDIR = tempfile.mkdtemp(prefix="homlo-bench-")
+os.chdir(WORKDIR)
+os.makedirs("uploads", exist_ok=True)
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{WORKDIR}/bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "1000000000")
+os.environ.setdefault("RATE_LIMIT_PER_HOUR", "1000000000")
+# Access records are still built by the middleware, just not written out
+os.environ.setdefault("LOG_ACCESS_SAMPLE_RATE", "0")
+
+import fakeredis
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import app.core.redis as app_redis
+
+# Stand-in Redis, installed before main.py binds the client at import
+app_redis.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+app_redis.binary_redis_client = fakeredis.FakeAsyncRedis(
+    server=app_redis.redis_client.connection_pool.connection_kwargs["server"]
+)
+
+from app.api.deps import get_db, get_read_db
+from app.core.config import settings
+from app.core.database import engine
+from app.core.middleware import RequestMetricsMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.redis import (
+    delete_cache,
+    get_cache,
+    get_cache_many,
+    get_or_compute,
+    local_cache,
+    set_cache,
+    set_cache_many,
+)
+from app.core.sessions import get_session, set_session
+from app.services.geo_index import geo_index, search_radius
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+# Listings around the seed cities (lat, lon)
+CITY_CENTERS = [
+    (24.8607, 67.0011),
+    (31.5204, 74.3587),
+    (33.6844, 73.0479),
+    (33.5651, 73.0169),
+    (34.0150, 71.5249),
+    (30.1798, 66.9750),
+    (30.1575, 71.5249),
+    (31.4504, 73.1350),
+]
+LISTINGS = 20000
+SEARCH_RADIUS_M = 2000
+SEARCH_PAGE_SIZE = 20
+
+# Representative traffic mix: (weight, request kind)
+TRAFFIC_MIX = [(60, "search"), (30, "detail"), (10, "booking")]
+MIX_CONCURRENCY = 16
+
+# Search, detail and booking endpoints shaped like the v1 API, over the
+# benchmark schema below
+bench_router = APIRouter()
+
+
+class BookingRequest(BaseModel):
+    listing_id: str
+    check_in: date
+    check_out: date
+
+
+def listing_card(row) -> dict:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "city": row.city,
+        "base_price_pkr": row.base_price_pkr,
+    }
+
+
+@bench_router.get("/listings/search")
+async def search_listings(
+    lat: float,
+    lon: float,
+    radius_m: float = SEARCH_RADIUS_M,
+    db: AsyncSession = Depends(get_read_db),
+):
+    nearby = await search_radius(db, lat, lon, radius_m, SEARCH_PAGE_SIZE)
+    keys = [f"listing:card:{listing_id}" for listing_id, _ in nearby]
+    cards = dict(zip(keys, await get_cache_many(keys)))
+
+    missing = [
+        listing_id
+        for listing_id, _ in nearby
+        if cards[f"listing:card:{listing_id}"] is None
+    ]
+    if missing:
+        result = await db.execute(
+            text(
+                "SELECT id, title, city, base_price_pkr FROM listings WHERE id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)),
+            {"ids": missing},
+        )
+        loaded = {f"listing:card:{row.id}": listing_card(row) for row in result}
+        await set_cache_many(loaded, expire=300)
+        cards.update(loaded)
+
+    return {
+        "results": [
+            dict(cards[key], distance_m=round(distance))
+            for key, (_, distance) in zip(keys, nearby)
+        ]
+    }
+
+
+@bench_router.get("/listings/{listing_id}")
+async def listing_detail(listing_id: str, db: AsyncSession = Depends(get_read_db)):
+    async def load():
+        result = await db.execute(
+            text("SELECT * FROM listings WHERE id = :id"), {"id": listing_id}
+        )
+        row = result.mappings().first()
+        return dict(row) if row else None
+
+    listing = await get_or_compute(
+        f"listing:detail:{listing_id}", load, expire=300, local_ttl=30
+    )
+    if listing is None:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    return listing
+
+
+@bench_router.post("/bookings", status_code=201)
+async def create_booking(booking: BookingRequest, db: AsyncSession = Depends(get_db)):
+    overlap = await db.execute(
+        text(
+            """
+            SELECT 1 FROM bookings
+            WHERE listing_id = :listing_id AND check_in < :check_out AND check_out > :check_in
+            LIMIT 1
+        """
+        ),
+        booking.model_dump(),
+    )
+    if overlap.first():
+        raise HTTPException(status_code=409, detail="Dates are not available")
+
+    booking_id = str(uuid.uuid4())
+    await db.execute(
+        text(
+            """
+            INSERT INTO bookings (id, listing_id, check_in, check_out, status)
+            VALUES (:id, :listing_id, :check_in, :check_out, 'pending')
+        """
+        ),
+        {"id": booking_id, **booking.model_dump()},
+    )
+    await db.commit()
+    await delete_cache(f"listing:detail:{booking.listing_id}")
+    return {"id": booking_id, "status": "pending"}
+
+
+try:
+    import app.api.v1.api  # noqa: F401
+
+    API_PREFIX = "/bench/api/v1"
+except ModuleNotFoundError:
+    # The v1 routers are not in this tree yet; serve the benchmark endpoints
+    # in their place so main.py can be imported unchanged
+    API_PREFIX = "/api/v1"
+    placeholder = types.ModuleType("app.api.v1.api")
+    placeholder.api_router = bench_router
+    sys.modules["app.api.v1.api"] = placeholder
+
+import main as api_main  # noqa: E402
+
+if API_PREFIX != "/api/v1":
+    api_main.app.include_router(bench_router, prefix=API_PREFIX)
+
+# The lifespan (and its warmup) is not run here; measure the ready path
+api_main.startup.ready = True
+
+
+# Measurement
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def measure(
+    operation: Callable[[int], Awaitable[None]],
+    requests: int,
+    concurrency: int = 1,
+    warmup: int = 200,
+) -> Dict[str, float]:
+    """Run operation(i) requests times over concurrency workers
+
+    Returns p50/p95/p99 latency in microseconds and requests per second.
+    """
+    for i in range(warmup):
+        await operation(-i - 1)
+
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            await operation(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "p50_us": round(percentile(latencies, 0.50) * 1e6, 1),
+        "p95_us": round(percentile(latencies, 0.95) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 1),
+        "rps": round(requests / elapsed, 1),
+    }
+
+
+# Fixtures
+async def create_schema() -> List[str]:
+    """Create and fill the SQLite stand-in tables; returns listing ids"""
+    rng = random.Random(42)
+    listings = []
+    for i in range(LISTINGS):
+        lat, lon = rng.choice(CITY_CENTERS)
+        listings.append(
+            {
+                "id": str(uuid.UUID(int=i + 1)),
+                "title": f"Listing {i}",
+                "city": "Karachi",
+                "lat": lat + rng.gauss(0, 0.05),
+                "lon": lon + rng.gauss(0, 0.05),
+                "base_price_pkr": rng.randrange(3000, 30000, 500),
+                "description": "Comfortable stay close to the market. " * 8,
+            }
+        )
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP TABLE IF EXISTS listings"))
+        await conn.execute(text("DROP TABLE IF EXISTS bookings"))
+        await conn.execute(
+            text(
+                """
+            CREATE TABLE listings (
+                id TEXT PRIMARY KEY, title TEXT, city TEXT, lat REAL, lon REAL,
+                base_price_pkr INTEGER, description TEXT
+            )
+        """
+            )
+        )
+        await conn.execute(
+            text(
+                """
+            CREATE TABLE bookings (
+                id TEXT PRIMARY KEY, listing_id TEXT, check_in DATE, check_out DATE, status TEXT
+            )
+        """
+            )
+        )
+        await conn.execute(
+            text("CREATE INDEX idx_bookings_listing ON bookings (listing_id, check_in)")
+        )
+        await conn.execute(
+            text(
+                """
+                INSERT INTO listings (id, title, city, lat, lon, base_price_pkr, description)
+                VALUES (:id, :title, :city, :lat, :lon, :base_price_pkr, :description)
+            """
+            ),
+            listings,
+        )
+
+    geo_index.build(
+        [row["id"] for row in listings],
+        [row["lat"] for row in listings],
+        [row["lon"] for row in listings],
+    )
+    return [row["id"] for row in listings]
+
+
+def build_middleware_app(with_stack: bool) -> FastAPI:
+    """Trivial app, optionally behind the production middleware stack"""
+    app = FastAPI()
+
+    @app.get("/api/v1/ping/{item_id}")
+    async def ping(item_id: str):
+        return {"id": item_id}
+
+    if with_stack:
+        app.add_middleware(RateLimitMiddleware)
+        app.add_middleware(RequestMetricsMiddleware)
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=settings.CORS_ORIGINS,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+    return app
+
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    )
+
+
+# Scenarios
+async def bench_middleware(requests: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, with_stack in (("middleware.none", False), ("middleware.stack", True)):
+        async with client_for(build_middleware_app(with_stack)) as client:
+
+            async def call(i):
+                response = await client.get(f"/api/v1/ping/{i}")
+                assert response.status_code == 200, response.status_code
+
+            results[name] = await measure(call, requests)
+    return results
+
+
+async def bench_cache(requests: int) -> Dict[str, Dict[str, float]]:
+    value = {
+        "id": "listing",
+        "title": "Luxury Apartment in Clifton, Karachi",
+        "amenities": ["WiFi"] * 10,
+    }
+    await set_cache("bench:l1", value, local_ttl=60)
+    await set_cache("bench:l2", value)
+
+    async def l1_hit(i):
+        assert await get_cache("bench:l1", local_ttl=60) is not None
+
+    async def l2_hit(i):
+        assert await get_cache("bench:l2") is not None
+
+    async def miss(i):
+        assert await get_cache(f"bench:missing:{i}") is None
+
+    async def store(i):
+        assert await set_cache(f"bench:set:{i % 1000}", value, expire=60)
+
+    return {
+        "cache.get_l1_hit": await measure(l1_hit, requests),
+        "cache.get_l2_hit": await measure(l2_hit, requests),
+        "cache.get_miss": await measure(miss, requests),
+        "cache.set": await measure(store, requests),
+    }
+
+
+async def bench_session(requests: int) -> Dict[str, Dict[str, float]]:
+    for i in range(1000):
+        await set_session(
+            f"bench-{i}", {"user_id": str(uuid.UUID(int=i)), "roles": ["guest"]}
+        )
+
+    async def lookup(i):
+        assert await get_session(f"bench-{i % 1000}") is not None
+
+    return {"session.get": await measure(lookup, requests)}
+
+
+async def bench_health(requests: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    async with client_for(api_main.app) as client:
+        for name, path in (("http.healthz", "/healthz"), ("http.readyz", "/readyz")):
+            # readyz is measured whatever it returns; a failing check is still a hot path
+            async def call(i, path=path):
+                await client.get(path)
+
+            results[name] = await measure(call, requests)
+    return results
+
+
+async def bench_mix(
+    requests: int, listing_ids: List[str]
+) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(7)
+    kinds = [kind for weight, kind in TRAFFIC_MIX for _ in range(weight)]
+    # Skewed popularity so detail pages see a realistic cache hit rate
+    popular = listing_ids[: len(listing_ids) // 20]
+
+    async with client_for(api_main.app) as client:
+
+        async def call(i):
+            kind = rng.choice(kinds)
+            if kind == "search":
+                lat, lon = rng.choice(CITY_CENTERS)
+                response = await client.get(
+                    f"{API_PREFIX}/listings/search",
+                    params={
+                        "lat": lat + rng.gauss(0, 0.03),
+                        "lon": lon + rng.gauss(0, 0.03),
+                    },
+                )
+                assert response.status_code == 200, response.text
+            elif kind == "detail":
+                ids = popular if rng.random() < 0.8 else listing_ids
+                response = await client.get(f"{API_PREFIX}/listings/{rng.choice(ids)}")
+                assert response.status_code == 200, response.text
+            else:
+                check_in = date(2030, 1, 1) + timedelta(days=rng.randrange(3650))
+                response = await client.post(
+                    f"{API_PREFIX}/bookings",
+                    json={
+                        "listing_id": rng.choice(listing_ids),
+                        "check_in": check_in.isoformat(),
+                        "check_out": (
+                            check_in + timedelta(days=rng.randint(1, 5))
+                        ).isoformat(),
+                    },
+                )
+                assert response.status_code in (201, 409), response.text
+
+        return {"http.mix": await measure(call, requests, concurrency=MIX_CONCURRENCY)}
+
+
+async def run(requests: int, only: Optional[List[str]]) -> Dict[str, Dict[str, float]]:
+    def wanted(*names):
+        return not only or any(
+            name.startswith(prefix) or prefix.startswith(name)
+            for name in names
+            for prefix in only
+        )
+
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        listing_ids = await create_schema()
+        if wanted("middleware"):
+            results.update(await bench_middleware(requests))
+        if wanted("cache"):
+            results.update(await bench_cache(requests))
+        if wanted("session"):
+            results.update(await bench_session(requests))
+        if wanted("http.healthz", "http.readyz"):
+            results.update(await bench_health(requests))
+        if wanted("http.mix"):
+            results.update(await bench_mix(requests, listing_ids))
+    finally:
+        await engine.dispose()
+    if only:
+        results = {
+            name: result
+            for name, result in results.items()
+            if any(name.startswith(prefix) for prefix in only)
+        }
+    return results
+
+
+# Baseline comparison
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    """Print results next to the baseline and return the regressions"""
+    regressions = []
+    print(
+        f"{'scenario':<20} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'req/s':>10} {'p95 vs base':>12} {'req/s vs base':>14}"
+    )
+    for name, result in results.items():
+        base = baseline.get(name)
+        p95_delta = rps_delta = ""
+        if base:
+            p95_change = result["p95_us"] / base["p95_us"] - 1
+            rps_change = result["rps"] / base["rps"] - 1
+            p95_delta, rps_delta = f"{p95_change:+.0%}", f"{rps_change:+.0%}"
+            if p95_change > tolerance:
+                regressions.append(
+                    f"{name}: p95 {result['p95_us']:.0f}us vs baseline {base['p95_us']:.0f}us"
+                )
+            if result["rps"] * (1 + tolerance) < base["rps"]:
+                regressions.append(
+                    f"{name}: {result['rps']:.0f} req/s vs baseline {base['rps']:.0f} req/s"
+                )
+        print(
+            f"{name:<20} {result['p50_us']:>10.1f} {result['p95_us']:>10.1f} {result['p99_us']:>10.1f} "
+            f"{result['rps']:>10.1f} {p95_delta:>12} {rps_delta:>14}"
+        )
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--requests", type=int, default=2000, help="Requests per scenario"
+    )
+    parser.add_argument(
+        "--only",
+        nargs="*",
+        help="Scenario name prefixes to report, e.g. cache http.mix",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed slowdown before failing (0.5 = 50%%)",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store these results as the new baseline",
+    )
+    args = parser.parse_args()
+
+    # Keep the report readable; failing readiness checks log an error per request
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+    local_cache.clear()
+    results = await run(args.requests, args.only)
+
+    baseline = (
+        json.loads(args.baseline.read_text())["scenarios"]
+        if args.baseline.exists()
+        else {}
+    )
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.update_baseline:
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "machine": {
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "processor": platform.processor(),
+                    },
+                    "requests": args.requests,
+                    "scenarios": {**baseline, **results},
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"📝 Baseline written to {args.baseline}")
+        return
+
+    if regressions:
+        print("❌ Performance regressions against the baseline:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+    print(
+        "✅ No regressions against the baseline"
+        if baseline
+        else "⚠️  No baseline stored; run with --update-baseline"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Booking admission load test for Homlo API
+Fires concurrent booking attempts at a few hot listings and weekends and
+compares sending every attempt to the database with the admission layer
+
+Usage: python benchmarks/bench_booking_admission.py [--attempts N] [--concurrency N]
+"""
+
+# ruff: noqa: E402
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+WORKDIR = tempfile.mkdtemp(prefix="homlo-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{WORKDIR}/bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("BOOKING_LEASE_WAIT_SECONDS", "30")
+
+import fakeredis
+from sqlalchemy import event, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.core.redis as app_redis
+
+app_redis.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+app_redis.binary_redis_client = fakeredis.FakeAsyncRedis(
+    server=app_redis.redis_client.connection_pool.connection_kwargs["server"]
+)
+
+import app.services.booking_admission as booking_admission
+from app.core.cache import local_cache
+from app.core.config import settings
+from app.services.booking_admission import BookingConflict, admit_booking
+
+# The SQLite trigger standing in for the exclusion constraint has no sqlstate
+booking_admission.is_overlap_violation = lambda error: "conflicting booking" in str(
+    error.orig
+)
+
+# Pooled aiosqlite connections keep a read lock after a trigger aborts an
+# insert, so the stand-in database opens a connection per session instead
+engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def configure_sqlite(dbapi_connection, connection_record):
+    # SQLite has a single writer: take the write lock up front so writers
+    # queue on the busy timeout instead of deadlocking on lock upgrades
+    dbapi_connection.isolation_level = "IMMEDIATE"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=60000")
+    cursor.close()
+
+
+# Stand-in for the Postgres exclusion constraint on overlapping bookings
+SCHEMA = [
+    "DROP TABLE IF EXISTS bookings",
+    """
+    CREATE TABLE bookings (
+        id TEXT PRIMARY KEY, listing_id TEXT, guest_id TEXT, check_in DATE, check_out DATE,
+        guests_count INTEGER, status TEXT, total_pkr NUMERIC, currency TEXT, payment_status TEXT,
+        cancellation_policy TEXT, created_at TIMESTAMP, updated_at TIMESTAMP
+    )
+    """,
+    "CREATE INDEX idx_bookings_listing ON bookings (listing_id, check_in)",
+    """
+    CREATE TRIGGER bookings_no_overlap BEFORE INSERT ON bookings
+    WHEN NEW.status IN ('pending', 'confirmed') AND EXISTS (
+        SELECT 1 FROM bookings
+        WHERE listing_id = NEW.listing_id AND status IN ('pending', 'confirmed')
+          AND check_in < NEW.check_out AND check_out > NEW.check_in
+    )
+    BEGIN SELECT RAISE(ABORT, 'conflicting booking'); END
+    """,
+]
+
+
+async def reset_database():
+    async with engine.begin() as conn:
+        for statement in SCHEMA:
+            await conn.execute(text(statement))
+    local_cache.clear()
+    await app_redis.redis_client.flushall()
+
+
+def make_attempts(count: int, listings: int, weekends: int, seed: int = 42):
+    """Booking requests concentrated on a few listings and Friday-Sunday stays"""
+    rng = random.Random(seed)
+    first_friday = date.today() + timedelta(days=(4 - date.today().weekday()) % 7 + 7)
+    listing_ids = [str(uuid.UUID(int=i + 1)) for i in range(listings)]
+    attempts = []
+    for _ in range(count):
+        check_in = first_friday + timedelta(weeks=rng.randrange(weekends))
+        attempts.append(
+            {
+                "listing_id": rng.choice(listing_ids),
+                "guest_id": str(uuid.uuid4()),
+                "check_in": check_in,
+                "check_out": check_in + timedelta(days=2),
+                "guests_count": 2,
+            }
+        )
+    return attempts
+
+
+async def run(mode: str, attempts, concurrency: int, work_ms: float):
+    """Run all attempts; returns (bookings, elapsed seconds, prepare calls wasted on conflicts)"""
+    await reset_database()
+    queue = iter(attempts)
+    booked = wasted = 0
+
+    async def prepare():
+        # Pricing, payment intent and other per-attempt work
+        await asyncio.sleep(work_ms / 1000)
+        return {"total_pkr": 30000}
+
+    async def direct(booking):
+        nonlocal booked, wasted
+        async with AsyncSessionLocal() as db:
+            values = dict(booking, **await prepare())
+            try:
+                await db.execute(
+                    text(
+                        """
+                        INSERT INTO bookings (id, listing_id, guest_id, check_in, check_out, guests_count, status, total_pkr)
+                        VALUES (:id, :listing_id, :guest_id, :check_in, :check_out, :guests_count, 'pending', :total_pkr)
+                    """
+                    ),
+                    dict(values, id=str(uuid.uuid4())),
+                )
+                await db.commit()
+                booked += 1
+            except IntegrityError:
+                await db.rollback()
+                wasted += 1
+
+    async def admitted(booking):
+        nonlocal booked, wasted
+        did_work = False
+
+        async def counted_prepare():
+            nonlocal did_work
+            did_work = True
+            return await prepare()
+
+        async with AsyncSessionLocal() as db:
+            try:
+                await admit_booking(db, booking, prepare=counted_prepare)
+                booked += 1
+            except BookingConflict:
+                wasted += did_work
+
+    attempt = direct if mode == "direct" else admitted
+
+    async def worker():
+        for booking in queue:
+            await attempt(booking)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return booked, time.perf_counter() - start, wasted
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attempts", type=int, default=4000)
+    parser.add_argument(
+        "--listings", type=int, default=50, help="Hot listings under contention"
+    )
+    parser.add_argument("--weekends", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument(
+        "--work-ms", type=float, default=20.0, help="Per-attempt work before the insert"
+    )
+    args = parser.parse_args()
+
+    attempts = make_attempts(args.attempts, args.listings, args.weekends)
+    print(
+        f"{args.attempts} attempts on {args.listings} listings x {args.weekends} weekends "
+        f"({args.listings * args.weekends} bookable stays), concurrency {args.concurrency}"
+    )
+    print(
+        f"{'mode':<10} {'booked':>8} {'seconds':>9} {'bookings/s':>11} {'attempts/s':>11} {'wasted work':>12}"
+    )
+    try:
+        for mode in ("direct", "admission"):
+            booked, elapsed, wasted = await run(
+                mode, attempts, args.concurrency, args.work_ms
+            )
+            print(
+                f"{mode:<10} {booked:>8} {elapsed:>9.2f} {booked / elapsed:>11.1f} "
+                f"{len(attempts) / elapsed:>11.1f} {wasted:>12}"
+            )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
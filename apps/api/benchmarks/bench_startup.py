@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Cold start budget check for Homlo API
+Starts the app in fresh interpreters, with SQLite and fakeredis standing in
+for Postgres and Redis, and times each from process start until the worker
+reports ready (imports, lifespan, then the warmup phases)
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget SECONDS]
+
+Exits non-zero when the median cold start exceeds --budget, or when main.py
+imports a module the API process should not load (the Celery app and tasks).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+# Only the Celery worker and beat processes need these
+FORBIDDEN_MODULES = ("celery", "app.core.celery", "app.tasks")
+
+# Hot local cache keys another worker has already recorded
+HOT_KEYS = 500
+
+# Median seconds from process start until the worker reports ready
+BUDGET_SECONDS = 3.0
+
+
+def child(result_path: str) -> None:
+    """Start one worker and write its startup timings as JSON"""
+    process_started = time.perf_counter()
+    sys.path.append(str(API_DIR))
+
+    # Run from a scratch directory so logs/ and uploads/ do not land in the repo
+    workdir = tempfile.mkdtemp(prefix="homlo-startup-")
+    os.chdir(workdir)
+    os.makedirs("uploads", exist_ok=True)
+    os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{workdir}/startup.db")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+    os.environ.setdefault("DEBUG", "false")
+    os.environ.setdefault("DATABASE_POOL_PREFILL", "4")
+    # The geo index loads from PostGIS, which SQLite cannot stand in for
+    os.environ.setdefault("GEO_INDEX_ENABLED", "false")
+
+    import asyncio
+
+    import fakeredis
+    from sqlalchemy import text
+
+    import app.core.redis as app_redis
+    import app.core.warmup as warmup
+    import app.services.search as search
+
+    # Imported first, as uvicorn would, so the imports phase is measured whole
+    import main
+    from app.core.database import engine
+
+    server = fakeredis.FakeServer()
+    app_redis.redis_client = fakeredis.FakeAsyncRedis(
+        server=server, decode_responses=True
+    )
+    app_redis.binary_redis_client = fakeredis.FakeAsyncRedis(server=server)
+    # SQLite stand-ins for the Postgres statements the warmup runs
+    search.TITLE_TYPEAHEAD_QUERY = """
+        SELECT id, title, city FROM listings
+        WHERE title LIKE '%' || :query || '%' AND status = 'active'
+        ORDER BY title LIMIT :limit
+    """
+    warmup._hot_statements = lambda: [
+        (
+            "SELECT id, title, city FROM listings WHERE city = :city LIMIT :limit",
+            {"city": "", "limit": 0},
+        ),
+    ]
+
+    async def seed():
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    "CREATE TABLE listings (id TEXT PRIMARY KEY, title TEXT, city TEXT, status TEXT)"
+                )
+            )
+        values = {
+            f"listing:{i}": {"id": i, "title": f"Listing {i}", "city": "Karachi"}
+            for i in range(HOT_KEYS)
+        }
+        await app_redis.set_cache_many(values, 3600)
+        await app_redis.redis_client.set(
+            app_redis.HOT_KEYS_KEY, json.dumps([[key, 60] for key in values])
+        )
+        # The seeded connection would otherwise stay in the pool
+        await engine.dispose()
+
+    async def start():
+        # One event loop throughout: the stand-in clients and the pool are
+        # bound to the loop they were first used on
+        seed_started = time.perf_counter()
+        await seed()
+        seeding = time.perf_counter() - seed_started
+        warmup.startup.started_at += seeding
+
+        async with main.app.router.lifespan_context(main.app):
+            while not warmup.startup.ready:
+                await asyncio.sleep(0.001)
+            return {
+                "seconds": time.perf_counter() - process_started - seeding,
+                "phases": warmup.startup.phases,
+                "local_cache": len(app_redis.local_cache),
+                "forbidden": sorted(
+                    name for name in sys.modules if name.startswith(FORBIDDEN_MODULES)
+                ),
+            }
+
+    # Not printed: the worker logs to stdout from another thread
+    Path(result_path).write_text(json.dumps(asyncio.run(start())))
+
+
+def run_once() -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", result_file.name],
+            capture_output=True,
+            text=True,
+            cwd=API_DIR,
+        )
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            raise SystemExit(f"Worker failed to start (exit {result.returncode})")
+        return json.loads(Path(result_file.name).read_text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=BUDGET_SECONDS,
+        help="Median seconds until ready",
+    )
+    parser.add_argument("--child", metavar="RESULT_PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    runs = [run_once() for _ in range(args.runs)]
+    phases = sorted(
+        {name for run in runs for name in run["phases"]},
+        key=list(runs[0]["phases"]).index,
+    )
+    print(f"{'phase':<14} {'p50 ms':>8} {'max ms':>8}")
+    for name in phases:
+        samples = [run["phases"][name] * 1000 for run in runs if name in run["phases"]]
+        print(f"{name:<14} {statistics.median(samples):>8.0f} {max(samples):>8.0f}")
+
+    cold_start = statistics.median(run["seconds"] for run in runs)
+    print(
+        f"\nCold start to ready: p50 {cold_start * 1000:.0f}ms over {args.runs} runs (budget {args.budget * 1000:.0f}ms)"
+    )
+    print(f"Local cache entries at ready: {runs[0]['local_cache']}")
+
+    failed = False
+    if runs[0]["forbidden"]:
+        print(f"FAIL: the API process imported {', '.join(runs[0]['forbidden'])}")
+        failed = True
+    if cold_start > args.budget:
+        print("FAIL: cold start is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Fake SMS provider for Homlo API
+Speaks the Twilio Messages API and the bulk gateway API with configurable
+latency, throttling and invalid numbers, for local testing and benchmarks
+
+Usage: python benchmarks/fake_sms_provider.py [--port 9100] [--latency-ms 50] [--error-rate 0.02]
+Then point the API at it with SMS_API_URL=http://localhost:9100
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class FakeProvider:
+    """Request handlers plus counters the benchmarks read back"""
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, seed: int = 42):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.messages = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # Delivery time per (recipient, body)
+        self.delivered = {}
+
+    @staticmethod
+    def is_invalid(number: str) -> bool:
+        return not number.startswith("+92") or number.endswith("0000")
+
+    async def _enter(self):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.error_rate:
+            self.throttled += 1
+            return JSONResponse(
+                {"message": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": "0"},
+            )
+        return None
+
+    def _deliver(self, to: str, body: str) -> None:
+        self.messages += 1
+        self.delivered[(to, body)] = time.perf_counter()
+
+    async def twilio_message(self, request: Request):
+        try:
+            throttled = await self._enter()
+            if throttled:
+                return throttled
+            form = await request.form()
+            to, body = form["To"], form["Body"]
+            if self.is_invalid(to):
+                return JSONResponse(
+                    {"code": 21211, "message": f"The 'To' number {to} is not valid"},
+                    status_code=400,
+                )
+            self._deliver(to, body)
+            return JSONResponse(
+                {"sid": f"SM{uuid.uuid4().hex}", "to": to, "status": "queued"},
+                status_code=201,
+            )
+        finally:
+            self.in_flight -= 1
+
+    async def gateway_messages(self, request: Request):
+        try:
+            throttled = await self._enter()
+            if throttled:
+                return throttled
+            payload = await request.json()
+            results = []
+            for to in payload["to"]:
+                if self.is_invalid(to):
+                    results.append(
+                        {"to": to, "status": "failed", "error": "invalid number"}
+                    )
+                else:
+                    self._deliver(to, payload["text"])
+                    results.append(
+                        {"to": to, "status": "queued", "id": uuid.uuid4().hex}
+                    )
+            return JSONResponse({"results": results})
+        finally:
+            self.in_flight -= 1
+
+    async def stats(self, request: Request):
+        return JSONResponse(
+            {
+                "requests": self.requests,
+                "messages": self.messages,
+                "throttled": self.throttled,
+                "max_in_flight": self.max_in_flight,
+            }
+        )
+
+    def app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route(
+                    "/2010-04-01/Accounts/{sid}/Messages.json",
+                    self.twilio_message,
+                    methods=["POST"],
+                ),
+                Route("/v1/messages", self.gateway_messages, methods=["POST"]),
+                Route("/stats", self.stats),
+            ]
+        )
+
+
+def serve_in_thread(provider: FakeProvider, port: int) -> uvicorn.Server:
+    """Start the fake provider on a background thread; set should_exit to stop it"""
+    server = uvicorn.Server(
+        uvicorn.Config(provider.app(), host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.02,
+        help="Share of calls answered with 429",
+    )
+    args = parser.parse_args()
+
+    provider = FakeProvider(args.latency_ms / 1000, args.error_rate)
+    uvicorn.run(provider.app(), host="0.0.0.0", port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
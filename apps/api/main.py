@@ -3,85 +3,43 @@ Homlo API - Main application entry point
 Pakistan-first Airbnb-style marketplace backend
 """
 
-import os
+# ruff: noqa: E402
+
 import time
+
+# Measured before the application imports so their cost is logged
+_imports_started = time.perf_counter()
+
 from contextlib import asynccontextmanager
-from typing import List
 
-import uvicorn
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from prometheus_client import Counter, Histogram
-from starlette.middleware.base import BaseHTTPMiddleware
+from sqlalchemy import text
 
+from app.api.v1.api import api_router
 from app.core.config import settings
-from app.core.database import engine
+from app.core.database import AsyncSessionLocal, engine, replicas
 from app.core.logging import setup_logging
-from app.api.v1.api import api_router
-from app.core.celery import celery_app
-from app.core.redis import redis_client
-
-# Prometheus metrics
-REQUEST_COUNT = Counter("http_requests_total", "Total HTTP requests", ["method", "endpoint", "status"])
-REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency")
+from app.core.middleware import RequestMetricsMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.redis import (
+    close_redis,
+    get_redis,
+    start_cache_invalidation_listener,
+    stop_cache_invalidation_listener,
+)
+from app.core.warmup import start_warmup, startup, stop_warmup
+from app.services.chat_history import start_receipt_flusher, stop_receipt_flusher
+from app.services.geo_index import start_geo_index, stop_geo_index
+from app.services.presence import start_presence, stop_presence
 
 # Setup logging
 logger = setup_logging()
-
-
-class MetricsMiddleware(BaseHTTPMiddleware):
-    """Middleware to collect Prometheus metrics"""
-    
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        response = await call_next(request)
-        
-        # Record metrics
-        duration = time.time() - start_time
-        REQUEST_COUNT.labels(
-            method=request.method,
-            endpoint=request.url.path,
-            status=response.status_code
-        ).inc()
-        REQUEST_LATENCY.observe(duration)
-        
-        return response
-
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware for request logging"""
-    
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Log request
-        logger.info(
-            f"Request: {request.method} {request.url.path}",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "client_ip": request.client.host if request.client else None,
-                "user_agent": request.headers.get("user-agent"),
-            }
-        )
-        
-        response = await call_next(request)
-        
-        # Log response
-        duration = time.time() - start_time
-        logger.info(
-            f"Response: {response.status_code} in {duration:.3f}s",
-            extra={
-                "status_code": response.status_code,
-                "duration": duration,
-            }
-        )
-        
-        return response
+startup.started_at = _imports_started
+startup.record("imports", time.perf_counter() - _imports_started)
 
 
 @asynccontextmanager
@@ -89,39 +47,69 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     logger.info("Starting Homlo API...")
-    
-    # Test database connection
+
     try:
         # Test Redis connection
-        await redis_client.ping()
+        async with startup.phase("redis"):
+            redis_client = await get_redis()
+            await redis_client.ping()
         logger.info("Redis connection established")
-        
+
         # Test database connection
-        async with engine.begin() as conn:
-            await conn.execute("SELECT 1")
+        async with startup.phase("database"):
+            async with engine.begin() as conn:
+                await conn.execute(text("SELECT 1"))
         logger.info("Database connection established")
-        
+
+        async with startup.phase("listeners"):
+            # Track read replica lag so reads can be routed to fresh replicas
+            if replicas.replicas:
+                replicas.start()
+                logger.info(f"Routing reads across {len(replicas.replicas)} replicas")
+
+            # Keep per-worker cache entries in sync with other workers
+            await start_cache_invalidation_listener()
+
+            # Nearby search falls back to PostGIS until the geo index has loaded
+            await start_geo_index(AsyncSessionLocal)
+
+            # Chat read receipts are written to Postgres in batches
+            await start_receipt_flusher(AsyncSessionLocal)
+
+            # WebSocket presence and delivery of messages for this worker's sockets
+            await start_presence()
+
+        # Prefill the pool, load the geo index and warm the local cache;
+        # /readyz reports not ready until this is done
+        start_warmup(AsyncSessionLocal)
+
     except Exception as e:
         logger.error(f"Failed to establish connections: {e}")
         raise
-    
+
     logger.info("Homlo API started successfully")
-    
+
     yield
-    
+
     # Shutdown
     logger.info("Shutting down Homlo API...")
-    
+
     # Close connections
+    await stop_warmup()
+    await stop_presence()
+    await stop_cache_invalidation_listener()
+    await stop_geo_index()
+    await stop_receipt_flusher()
+    await replicas.close()
     await engine.dispose()
-    await redis_client.close()
-    
+    await close_redis()
+
     logger.info("Homlo API shutdown complete")
 
 
 def create_application() -> FastAPI:
     """Create and configure FastAPI application"""
-    
+
     # Create FastAPI app
     app = FastAPI(
         title=settings.APP_NAME,
@@ -132,11 +120,14 @@ def create_application() -> FastAPI:
         openapi_url="/openapi.json" if settings.DEBUG else None,
         lifespan=lifespan,
     )
-    
-    # Add middleware
-    app.add_middleware(LoggingMiddleware)
-    app.add_middleware(MetricsMiddleware)
-    
+
+    # Rate limiting middleware
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware)
+
+    # Metrics and access logging (outside the rate limiter so 429s are counted)
+    app.add_middleware(RequestMetricsMiddleware)
+
     # CORS middleware
     app.add_middleware(
         CORSMiddleware,
@@ -145,62 +136,73 @@ def create_application() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
-    
+
     # Trusted host middleware
     if not settings.DEBUG:
         app.add_middleware(
             TrustedHostMiddleware,
-            allowed_hosts=["*"]  # Configure appropriately for production
+            allowed_hosts=["*"],  # Configure appropriately for production
         )
-    
+
     # Global exception handler
     @app.exception_handler(Exception)
     async def global_exception_handler(request: Request, exc: Exception):
         logger.error(f"Unhandled exception: {exc}", exc_info=True)
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"detail": "Internal server error"}
+            content={"detail": "Internal server error"},
         )
-    
+
     # Health check endpoint
     @app.get("/healthz")
     async def health_check():
         """Health check endpoint for load balancers"""
         return {"status": "healthy", "timestamp": time.time()}
-    
+
     # Metrics endpoint for Prometheus
     @app.get("/metrics")
     async def metrics():
         """Prometheus metrics endpoint"""
-        from prometheus_client import generate_latest
-        return Response(generate_latest(), media_type="text/plain")
-    
+        from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
     # Ready check endpoint
     @app.get("/readyz")
     async def ready_check():
         """Ready check endpoint for Kubernetes"""
+        if not startup.ready:
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"status": "warming up", "startup": startup.phases},
+            )
         try:
             # Test database connection
             async with engine.begin() as conn:
-                await conn.execute("SELECT 1")
-            
+                await conn.execute(text("SELECT 1"))
+
             # Test Redis connection
+            redis_client = await get_redis()
             await redis_client.ping()
-            
-            return {"status": "ready", "timestamp": time.time()}
+
+            return {
+                "status": "ready",
+                "timestamp": time.time(),
+                "startup": startup.phases,
+            }
         except Exception as e:
             logger.error(f"Ready check failed: {e}")
             return JSONResponse(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                content={"status": "not ready", "error": str(e)}
+                content={"status": "not ready", "error": str(e)},
             )
-    
+
     # Include API router
     app.include_router(api_router, prefix="/api/v1")
-    
+
     # Mount static files
     app.mount("/static", StaticFiles(directory="uploads"), name="static")
-    
+
     return app
 
 
@@ -209,6 +211,8 @@ app = create_application()
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,38 @@
+"""
+Shared test setup for Homlo API
+SQLite and fakeredis stand in for Postgres and Redis
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest_asyncio
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TEST_DIR = tempfile.mkdtemp(prefix="homlo-tests-")
+
+# Set before app.core.config is imported
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{TEST_DIR}/primary.db")
+os.environ.setdefault("JWT_SECRET_KEY", "test")
+os.environ.setdefault("DEBUG", "false")
+
+
+@pytest_asyncio.fixture
+async def fake_redis():
+    """Install fakeredis clients behind the Redis helpers"""
+    import fakeredis
+
+    import app.core.redis as app_redis
+
+    server = fakeredis.FakeServer()
+    app_redis.redis_client = fakeredis.FakeAsyncRedis(
+        server=server, decode_responses=True
+    )
+    app_redis.binary_redis_client = fakeredis.FakeAsyncRedis(server=server)
+    app_redis.local_cache.clear()
+    yield app_redis.redis_client
+    await app_redis.close_redis()
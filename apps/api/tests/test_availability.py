@@ -0,0 +1,91 @@
+"""
+Tests for the rolling-window availability index
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import app.core.redis as app_redis
+import app.services.availability as availability
+
+TODAY = date(2025, 3, 14)
+
+
+def move_to(monkeypatch, today: date) -> None:
+    window = availability.index_window
+    monkeypatch.setattr(
+        availability, "index_window", lambda today_=None: window(today_ or today)
+    )
+
+
+async def free(listing_ids, check_in: date, nights: int):
+    return await availability.free_listings(
+        listing_ids, check_in, check_in + timedelta(days=nights)
+    )
+
+
+@pytest.mark.asyncio
+async def test_free_listings_across_keys_with_different_bases(fake_redis, monkeypatch):
+    move_to(monkeypatch, TODAY)
+    await availability.update_booking_days(
+        "a", TODAY + timedelta(days=10), TODAY + timedelta(days=13), "confirmed"
+    )
+
+    later = TODAY + timedelta(days=40)
+    move_to(monkeypatch, later)
+    await availability.update_calendar_days("b", {later + timedelta(days=2): True})
+
+    assert await free(["a", "b", "c"], later, 2) == ["a", "b", "c"]
+    assert await free(["a", "b", "c"], later + timedelta(days=1), 2) == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_bitmaps_are_trimmed_to_the_window(fake_redis, monkeypatch):
+    move_to(monkeypatch, TODAY)
+    await availability.update_booking_days(
+        "a", TODAY + timedelta(days=200), TODAY + timedelta(days=203), "confirmed"
+    )
+    key = availability.BOOKED_KEY.format(listing_id="a")
+    before = len(await app_redis.binary_redis_client.get(key))
+
+    later = TODAY + timedelta(days=180)
+    move_to(monkeypatch, later)
+    assert await availability.trim_index() == 1
+
+    value = await app_redis.binary_redis_client.get(key)
+    base = int.from_bytes(value[: availability.HEADER_SIZE], "big")
+    assert base == availability.index_base(later - timedelta(days=1))
+    assert len(value) < before - 20
+    assert await free(["a"], later + timedelta(days=19), 2) == []
+    assert await free(["a"], later + timedelta(days=23), 2) == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_calendar_changes_are_saved_and_indexed(fake_redis, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/calendars.db")
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE TABLE calendars (id TEXT PRIMARY KEY, listing_id TEXT, "
+                "date DATE, is_blocked BOOLEAN, created_at TIMESTAMP)"
+            )
+        )
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    start = date.today() + timedelta(days=10)
+    days = [start + timedelta(days=i) for i in range(3)]
+
+    async with sessions() as db:
+        await availability.set_calendar_days(db, "a", {day: True for day in days})
+    assert await free(["a", "b"], start, 3) == ["b"]
+
+    # Unblocking one day frees a stay that only covers it
+    async with sessions() as db:
+        await availability.set_calendar_days(db, "a", {days[1]: False})
+        rows = await db.execute(text("SELECT date FROM calendars ORDER BY date"))
+        assert [row[0] for row in rows] == [str(days[0]), str(days[2])]
+    assert await free(["a"], days[1], 1) == ["a"]
+    assert await free(["a"], start, 3) == []
+    await engine.dispose()
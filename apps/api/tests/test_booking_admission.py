@@ -0,0 +1,174 @@
+"""
+Tests for per-listing booking admission
+A SQLite trigger stands in for the Postgres exclusion constraint on
+overlapping bookings and reports its violations with the same SQLSTATE
+"""
+
+import asyncio
+import weakref
+from datetime import date, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.services.booking_admission as booking_admission
+from app.core.cache import local_cache
+from app.core.config import settings
+from app.services.booking_admission import BookingBusy, BookingConflict, admit_booking
+
+LISTING_ID = "00000000-0000-0000-0000-000000000001"
+CHECK_IN = date.today() + timedelta(days=30)
+
+SCHEMA = [
+    """
+    CREATE TABLE bookings (
+        id TEXT PRIMARY KEY, listing_id TEXT, guest_id TEXT, check_in DATE,
+        check_out DATE, guests_count INTEGER, status TEXT, total_pkr NUMERIC,
+        currency TEXT, payment_status TEXT, cancellation_policy TEXT,
+        created_at TIMESTAMP, updated_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE TRIGGER bookings_no_overlap BEFORE INSERT ON bookings
+    WHEN NEW.status IN ('pending', 'confirmed') AND EXISTS (
+        SELECT 1 FROM bookings
+        WHERE listing_id = NEW.listing_id AND status IN ('pending', 'confirmed')
+          AND check_in < NEW.check_out AND check_out > NEW.check_in
+    )
+    BEGIN
+        SELECT RAISE(ABORT, 'violates exclusion constraint "bookings_no_overlap"');
+    END
+    """,
+]
+
+
+def stay(nights_from: int, nights: int, guest: str = "guest-1") -> dict:
+    check_in = CHECK_IN + timedelta(days=nights_from)
+    return {
+        "listing_id": LISTING_ID,
+        "guest_id": guest,
+        "check_in": check_in,
+        "check_out": check_in + timedelta(days=nights),
+    }
+
+
+def admissions(result: str) -> float:
+    return booking_admission.BOOKING_ADMISSIONS.labels(result=result)._value.get()
+
+
+@pytest_asyncio.fixture
+async def sessions(tmp_path, monkeypatch, fake_redis):
+    # A connection per session, as pooled aiosqlite connections keep a read
+    # lock after a trigger aborts an insert
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/bookings.db", poolclass=NullPool
+    )
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def report_exclusion_violation(context):
+        if "bookings_no_overlap" in str(context.original_exception):
+            context.original_exception.sqlstate = booking_admission.EXCLUSION_VIOLATION
+
+    async with engine.begin() as conn:
+        for statement in SCHEMA:
+            await conn.execute(text(statement))
+
+    monkeypatch.setattr(settings, "CACHE_L1_ENABLED", True)
+    monkeypatch.setattr(settings, "BOOKING_LEASE_WAIT_SECONDS", 0.5)
+    # Registered against the previous test's Redis client
+    monkeypatch.setattr(booking_admission, "_release_lease_script", None)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    local_cache.clear()
+    await engine.dispose()
+
+
+async def booking_count(session_factory) -> int:
+    async with session_factory() as db:
+        return (await db.execute(text("SELECT COUNT(*) FROM bookings"))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_overlapping_stay_is_rejected(sessions):
+    async with sessions() as db:
+        await admit_booking(db, stay(0, 3))
+
+    # Rejected from this worker's cached intervals without the lease
+    early = admissions("rejected_early")
+    async with sessions() as db:
+        with pytest.raises(BookingConflict):
+            await admit_booking(db, stay(2, 2, guest="guest-2"))
+    assert admissions("rejected_early") == early + 1
+
+    # Rejected against the database while holding the lease
+    local_cache.clear()
+    locked = admissions("rejected_locked")
+    async with sessions() as db:
+        with pytest.raises(BookingConflict):
+            await admit_booking(db, stay(1, 1, guest="guest-2"))
+    assert admissions("rejected_locked") == locked + 1
+
+    # Back-to-back stays share no night
+    async with sessions() as db:
+        await admit_booking(db, stay(3, 2, guest="guest-2"))
+    assert await booking_count(sessions) == 2
+
+
+@pytest.mark.asyncio
+async def test_lease_held_elsewhere_makes_attempt_busy(sessions, fake_redis):
+    lease_key = booking_admission.LEASE_KEY.format(listing_id=LISTING_ID)
+    await fake_redis.set(lease_key, "another-worker", px=10000)
+
+    async with sessions() as db:
+        with pytest.raises(BookingBusy):
+            await admit_booking(db, stay(0, 2))
+
+    # The other worker's lease is left alone, and nothing was written
+    assert await fake_redis.get(lease_key) == "another-worker"
+    assert await booking_count(sessions) == 0
+
+
+@pytest.mark.asyncio
+async def test_lease_is_released_after_admission(sessions, fake_redis):
+    async with sessions() as db:
+        await admit_booking(db, stay(0, 2))
+
+    lease_key = booking_admission.LEASE_KEY.format(listing_id=LISTING_ID)
+    assert await fake_redis.get(lease_key) is None
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_overlap_is_caught_by_exclusion_constraint(
+    sessions, monkeypatch
+):
+    monkeypatch.setattr(settings, "BOOKING_LEASE_TTL_MS", 50)
+    checked, other_committed = asyncio.Event(), asyncio.Event()
+
+    async def slow_prepare():
+        # Runs after the overlap check; outlives the lease
+        checked.set()
+        await other_committed.wait()
+        return {}
+
+    async def first_attempt():
+        async with sessions() as db:
+            return await admit_booking(db, stay(0, 3), prepare=slow_prepare)
+
+    first = asyncio.create_task(first_attempt())
+    await checked.wait()
+
+    # A second worker: its own lock table, and the first lease has lapsed
+    monkeypatch.setattr(
+        booking_admission, "_listing_locks", weakref.WeakValueDictionary()
+    )
+    async with sessions() as db:
+        await admit_booking(db, stay(1, 3, guest="guest-2"))
+    other_committed.set()
+
+    rejected = admissions("rejected_db")
+    with pytest.raises(BookingConflict):
+        await first
+    assert admissions("rejected_db") == rejected + 1
+    assert await booking_count(sessions) == 1
@@ -0,0 +1,101 @@
+"""
+Tests for the scheduled booking jobs' high-water marks
+"""
+
+import json
+import time
+from datetime import date
+
+import pytest
+
+from app.core.config import settings
+from app.services.booking_jobs import (
+    JOB_CURSOR_KEY,
+    JOB_LAST_RUN_KEY,
+    NIL_ID,
+    PAYOUTS,
+    REMINDERS,
+    decode_cursor,
+    encode_cursor,
+    finish_run,
+)
+
+TODAY = date(2026, 3, 10)
+BOOKING_ID = "9b2f4c1e-0000-4000-8000-000000000001"
+
+
+def test_cursor_round_trip():
+    cursor = (date(2026, 3, 9), BOOKING_ID)
+    assert decode_cursor(encode_cursor(cursor)) == cursor
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+def test_cursors_sort_as_text_like_their_keys():
+    keys = [
+        (date(2026, 3, 9), BOOKING_ID),
+        (date(2026, 3, 9), NIL_ID),
+        (date(2026, 2, 28), "ffffffff-ffff-ffff-ffff-ffffffffffff"),
+        (date(2026, 12, 1), NIL_ID),
+    ]
+    assert sorted(keys, key=encode_cursor) == sorted(keys)
+
+
+def test_reminders_start_at_today_and_look_ahead(monkeypatch):
+    monkeypatch.setattr(settings, "BOOKING_REMINDER_LEAD_DAYS", 2)
+    assert REMINDERS.due_until(TODAY) == date(2026, 3, 12)
+
+    # Stays that have already started are skipped
+    assert REMINDERS.scan_start(None, TODAY) == (TODAY, NIL_ID)
+    assert REMINDERS.scan_start((date(2026, 3, 1), BOOKING_ID), TODAY) == (
+        TODAY,
+        NIL_ID,
+    )
+    ahead = (date(2026, 3, 11), BOOKING_ID)
+    assert REMINDERS.scan_start(ahead, TODAY) == ahead
+
+
+def test_payouts_rescan_the_lookback_unless_further_behind(monkeypatch):
+    monkeypatch.setattr(settings, "PAYOUT_DELAY_DAYS", 1)
+    monkeypatch.setattr(settings, "PAYOUT_LOOKBACK_DAYS", 7)
+    assert PAYOUTS.due_until(TODAY) == date(2026, 3, 9)
+
+    lookback = (date(2026, 3, 2), NIL_ID)
+    assert PAYOUTS.scan_start(None, TODAY) == lookback
+    assert PAYOUTS.scan_start((date(2026, 3, 8), BOOKING_ID), TODAY) == lookback
+    backlog = (date(2026, 2, 1), BOOKING_ID)
+    assert PAYOUTS.scan_start(backlog, TODAY) == backlog
+
+
+def plan(cursor):
+    return {
+        "job": PAYOUTS.name,
+        "started_at": time.time(),
+        "cursor": cursor,
+        "scanned": 3,
+        "lag_seconds": 0.0,
+        "backlog": False,
+    }
+
+
+@pytest.mark.asyncio
+async def test_finish_run_never_moves_the_mark_backwards(fake_redis):
+    key = JOB_CURSOR_KEY.format(job=PAYOUTS.name)
+    later = encode_cursor((date(2026, 3, 9), BOOKING_ID))
+    earlier = encode_cursor((date(2026, 3, 8), BOOKING_ID))
+
+    summary = await finish_run(
+        plan(later), [{"created": 2, "skipped": 1}, {"created": 1, "failed": 0}]
+    )
+    assert await fake_redis.get(key) == later
+    assert (summary["created"], summary["skipped"], summary["chunks"]) == (3, 1, 2)
+
+    # An overlapping run that planned less finishes afterwards
+    await finish_run(plan(earlier), [])
+    assert await fake_redis.get(key) == later
+
+    # A run with nothing due leaves the mark alone
+    await finish_run(plan(None), [])
+    assert await fake_redis.get(key) == later
+    last_run = json.loads(await fake_redis.get(JOB_LAST_RUN_KEY.format(job="payouts")))
+    assert last_run["cursor"] is None
@@ -0,0 +1,102 @@
+"""
+Tests for the two-tier cache helpers
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.cache import local_cache
+from app.core.redis import get_cache, get_or_compute, invalidate_tags, set_cache
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_computation(fake_redis):
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"listings": [1, 2, 3]}
+
+    waiters = [
+        asyncio.create_task(get_or_compute("search:lahore", compute, local_ttl=60))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0.01)
+    release.set()
+
+    results = await asyncio.gather(*waiters)
+    assert calls == 1
+    assert results == [{"listings": [1, 2, 3]}] * 5
+
+    # Stored in both tiers, so the next miss is served without computing
+    local_cache.clear()
+    assert await get_cache("search:lahore") == {"listings": [1, 2, 3]}
+    assert await get_or_compute("search:lahore", compute) == {"listings": [1, 2, 3]}
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_computation(fake_redis):
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        return "value"
+
+    first = asyncio.create_task(get_or_compute("key", compute))
+    second = asyncio.create_task(get_or_compute("key", compute))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    release.set()
+
+    assert await second == "value"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_none_results_are_not_cached(fake_redis):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return None
+
+    assert await get_or_compute("missing", compute) is None
+    assert await get_or_compute("missing", compute) is None
+    assert calls == 2
+    assert await fake_redis.exists("missing") == 0
+
+
+@pytest.mark.asyncio
+async def test_invalidating_a_tag_drops_its_keys_from_both_tiers(fake_redis):
+    await set_cache("listing:1", {"id": 1}, local_ttl=60, tags=["listing:1"])
+    await set_cache(
+        "search:karachi", [1, 2], local_ttl=60, tags=["listing:1", "city:karachi"]
+    )
+    await set_cache("search:lahore", [3], local_ttl=60, tags=["city:lahore"])
+
+    assert await invalidate_tags("listing:1") == 2
+
+    assert local_cache.get("listing:1") is None
+    assert local_cache.get("search:karachi") is None
+    assert await get_cache("listing:1") is None
+    assert await get_cache("search:karachi") is None
+    assert await get_cache("search:lahore") == [3]
+    assert await fake_redis.exists("cache:tag:listing:1") == 0
+    # Other tags of a removed key are left to expire with it
+    assert await invalidate_tags("city:karachi") == 0
+
+
+@pytest.mark.asyncio
+async def test_tag_set_outlives_its_longest_lived_key(fake_redis):
+    await set_cache("short", 1, expire=60, tags=["city:lahore"])
+    await set_cache("long", 2, expire=3600, tags=["city:lahore"])
+    await set_cache("medium", 3, expire=600, tags=["city:lahore"])
+
+    assert await fake_redis.ttl("cache:tag:city:lahore") == 3600
@@ -0,0 +1,168 @@
+"""
+Tests for cached chat history and read receipts
+Queries that only run on Postgres are replaced by a list of the thread's
+messages
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+
+import app.services.chat_history as chat_history
+from app.core.config import settings
+
+THREAD_ID = "7d7e3b0a-0000-0000-0000-000000000001"
+HOST, GUEST = "host-1", "guest-1"
+START = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def message(i: int, sender: str = HOST) -> dict:
+    return {
+        "id": f"message-{i:03d}",
+        "thread_id": THREAD_ID,
+        "sender_id": sender,
+        "text": f"hello {i}",
+        "attachment_key": None,
+        "read_at": None,
+        "created_at": (START + timedelta(seconds=i)).isoformat(),
+    }
+
+
+class Thread:
+    """Messages as Postgres holds them, newest first like _load_page"""
+
+    def __init__(self, messages):
+        self.messages = sorted(messages, key=lambda m: m["created_at"], reverse=True)
+        self.queries = 0
+
+    async def load_page(self, db, thread_id, limit, before):
+        self.queries += 1
+        rows = self.messages
+        if before:
+            ids = [m["id"] for m in rows]
+            rows = rows[ids.index(before) + 1 :]
+        return rows[:limit]
+
+
+@pytest_asyncio.fixture
+async def history(fake_redis, monkeypatch):
+    monkeypatch.setattr(chat_history, "_scripts", {})
+    monkeypatch.setattr(settings, "CHAT_HISTORY_SIZE", 5)
+    return fake_redis
+
+
+def use_thread(monkeypatch, messages) -> Thread:
+    thread = Thread(messages)
+    monkeypatch.setattr(chat_history, "_load_page", thread.load_page)
+    return thread
+
+
+async def read_all(limit: int):
+    pages, cursor = [], None
+    while True:
+        page = await chat_history.get_messages(None, THREAD_ID, limit, before=cursor)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.asyncio
+async def test_short_thread_pages_from_the_cache_once_loaded(history, monkeypatch):
+    thread = use_thread(monkeypatch, [message(i) for i in range(4)])
+
+    pages = await read_all(limit=2)
+    assert [page["source"] for page in pages] == ["database", "cache", "cache"]
+    assert [[m["id"] for m in page["messages"]] for page in pages] == [
+        ["message-003", "message-002"],
+        ["message-001", "message-000"],
+        [],
+    ]
+    assert thread.queries == 1
+
+    # Known to be the whole thread: a short page needs no query
+    page = await chat_history.get_messages(None, THREAD_ID, limit=10)
+    assert (page["source"], len(page["messages"])) == ("cache", 4)
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_pages_beyond_the_cached_log_come_from_the_database(history, monkeypatch):
+    messages = [message(i) for i in range(8)]
+    thread = use_thread(monkeypatch, messages)
+
+    pages = await read_all(limit=3)
+    assert [m["id"] for page in pages for m in page["messages"]] == [
+        m["id"] for m in reversed(messages)
+    ]
+    # The newest five are cached; the page that runs past them is not
+    assert [page["source"] for page in pages] == ["database", "database", "database"]
+    assert thread.queries == 3
+    assert (
+        await history.zcard(
+            chat_history.THREAD_MESSAGES_KEY.format(thread_id=THREAD_ID)
+        )
+        == 5
+    )
+
+    page = await chat_history.get_messages(None, THREAD_ID, limit=3)
+    assert page["source"] == "cache"
+    assert page["next_cursor"] == "message-005"
+
+
+@pytest.mark.asyncio
+async def test_appended_messages_keep_the_log_bounded(history, monkeypatch):
+    thread = use_thread(monkeypatch, [])
+    await chat_history.get_messages(None, THREAD_ID)
+
+    for i in range(7):
+        thread.messages.insert(0, message(i))
+        assert await chat_history.append_message(message(i))
+
+    page = await chat_history.get_messages(None, THREAD_ID, limit=5)
+    assert page["source"] == "cache"
+    assert [m["id"] for m in page["messages"]] == [
+        f"message-{i:03d}" for i in range(6, 1, -1)
+    ]
+    # The oldest were dropped, so the log no longer holds the whole thread
+    page = await chat_history.get_messages(
+        None, THREAD_ID, limit=5, before="message-004"
+    )
+    assert page["source"] == "database"
+    assert [m["id"] for m in page["messages"]] == [
+        f"message-{i:03d}" for i in range(3, -1, -1)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_mark_read_updates_other_participants_messages(history, monkeypatch):
+    messages = [message(0, HOST), message(1, GUEST), message(2, HOST), message(3, HOST)]
+    use_thread(monkeypatch, messages)
+    await chat_history.get_messages(None, THREAD_ID)
+
+    up_to = START + timedelta(seconds=2)
+    assert await chat_history.mark_thread_read(THREAD_ID, GUEST, up_to=up_to) == 3
+
+    page = await chat_history.get_messages(None, THREAD_ID)
+    read = {m["id"]: m["read_at"] is not None for m in page["messages"]}
+    assert read == {
+        "message-000": True,
+        # Their own message, and one sent after the receipt
+        "message-001": False,
+        "message-002": True,
+        "message-003": False,
+    }
+
+    # An older receipt does not move the pending one back
+    await chat_history.mark_thread_read(THREAD_ID, GUEST, up_to=START)
+    pending = await history.hget(
+        chat_history.PENDING_RECEIPTS_KEY, f"{THREAD_ID}:{GUEST}"
+    )
+    assert int(pending.split(":")[0]) == chat_history._micros(up_to)
+
+    cached = await history.hget(
+        chat_history.THREAD_PAYLOADS_KEY.format(thread_id=THREAD_ID), "message-000"
+    )
+    assert json.loads(cached)["read_at"] is not None
@@ -0,0 +1,100 @@
+"""
+Tests for the cache value codec
+Parametrized over the serializers and compressors available in this
+environment; msgpack and lz4 are covered where they are installed
+"""
+
+import json
+import os
+
+import pytest
+
+from app.core.codec import (
+    COMPRESSORS,
+    HEADER_SIZE,
+    MARKER,
+    SERIALIZERS,
+    CacheCodec,
+    CodecError,
+)
+
+VALUES = [
+    {"id": 1, "title": "Flat in Gulberg", "amenities": ["wifi", "parking"]},
+    [1, 2.5, None, True, "text"],
+    42,
+    "already a string",
+    "اردو",
+    b"\x89PNG\x00\xff",
+    # Large enough to be compressed
+    [{"id": i, "city": "Lahore", "nightly_pkr": 12000} for i in range(200)],
+]
+
+
+@pytest.mark.parametrize("value", VALUES)
+@pytest.mark.parametrize("compression", ["none", *COMPRESSORS])
+@pytest.mark.parametrize("serializer", list(SERIALIZERS))
+def test_round_trip(serializer, compression, value):
+    codec = CacheCodec(serializer, compression)
+    raw = codec.encode(value)
+    assert raw[0] == MARKER
+    assert codec.decode(raw) == value
+
+
+@pytest.mark.parametrize("compression", list(COMPRESSORS))
+def test_large_values_are_compressed(compression):
+    value = VALUES[-1]
+    compressed = CacheCodec("json", compression).encode(value)
+    plain = CacheCodec("json", "none").encode(value)
+    assert compressed[2] >> 4 == COMPRESSORS[compression].id
+    assert len(compressed) < len(plain)
+    # Below the threshold it is left as it is
+    assert CacheCodec("json", compression).encode({"id": 1})[2] >> 4 == 0
+
+
+def test_incompressible_data_is_stored_as_is():
+    data = os.urandom(512)
+    raw = CacheCodec("json", "zlib", threshold=16).encode(data)
+    assert raw[2] >> 4 == 0
+    assert raw[HEADER_SIZE:] == data
+
+
+@pytest.mark.parametrize("serializer", list(SERIALIZERS))
+def test_values_from_another_configuration_stay_readable(serializer):
+    value = VALUES[-1]
+    written = CacheCodec(serializer, "zlib").encode(value)
+    assert CacheCodec("json", "none").decode(written) == value
+
+
+@pytest.mark.parametrize(
+    "raw, value",
+    [
+        (json.dumps({"id": 1}).encode(), {"id": 1}),
+        (b"[1, 2]", [1, 2]),
+        (b"plain text", "plain text"),
+        ("اردو".encode(), "اردو"),
+        (b"", ""),
+    ],
+)
+def test_values_written_before_the_header(raw, value):
+    assert CacheCodec().decode(raw) == value
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        bytes((MARKER, 9, 0x03)) + b"{}",
+        bytes((MARKER, 1, 0x0F)) + b"{}",
+        bytes((MARKER, 1, 0xF3)) + b"{}",
+        bytes((MARKER,)),
+    ],
+)
+def test_unknown_formats_raise(raw):
+    with pytest.raises(CodecError):
+        CacheCodec().decode(raw)
+
+
+def test_unavailable_configuration_is_refused():
+    with pytest.raises(ValueError):
+        CacheCodec("pickle")
+    with pytest.raises(ValueError):
+        CacheCodec("json", "brotli")
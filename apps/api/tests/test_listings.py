@@ -0,0 +1,105 @@
+"""
+Tests for listing writes reaching the geo index
+SQLite functions stand in for the PostGIS ones the updates use
+"""
+
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import app.services.geo_index as geo_index
+from app.core.config import settings
+from app.services.listings import set_listing_location, set_listing_status
+
+LISTING_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def make_point(lon, lat):
+    return None if lon is None or lat is None else f"{lon} {lat}"
+
+
+def register_postgis(dbapi_connection, connection_record):
+    dbapi_connection.create_function("ST_MakePoint", 2, make_point)
+    dbapi_connection.create_function("ST_SetSRID", 2, lambda point, srid: point)
+    for cast in ("geography", "geometry"):
+        dbapi_connection.create_function(cast, 1, lambda point: point)
+    dbapi_connection.create_function(
+        "ST_X", 1, lambda point: float(point.split()[0]) if point else None
+    )
+    dbapi_connection.create_function(
+        "ST_Y", 1, lambda point: float(point.split()[1]) if point else None
+    )
+
+
+@pytest_asyncio.fixture
+async def sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/listings.db")
+    event.listen(engine.sync_engine, "connect", register_postgis)
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE TABLE listings "
+                "(id TEXT PRIMARY KEY, status TEXT, geog TEXT, updated_at TIMESTAMP)"
+            )
+        )
+        await conn.execute(
+            text("INSERT INTO listings (id, status) VALUES (:id, 'draft')"),
+            {"id": LISTING_ID},
+        )
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def index(fake_redis, monkeypatch):
+    """A fresh index fed by the listing events published to Redis"""
+    monkeypatch.setattr(geo_index, "geo_index", geo_index.GeoIndex())
+    geo_index.geo_index.build([], [], [])
+    pubsub = fake_redis.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(settings.GEO_INDEX_CHANNEL)
+
+    async def apply_published():
+        while message := await pubsub.get_message(timeout=0.1):
+            geo_index.apply_listing_event(json.loads(message["data"]))
+        return geo_index.geo_index
+
+    yield apply_published
+    await pubsub.close()
+
+
+@pytest.mark.asyncio
+async def test_listing_becomes_searchable_once_active_with_a_location(sessions, index):
+    async with sessions() as db:
+        assert await set_listing_location(db, LISTING_ID, 24.8607, 67.0011)
+    # Still a draft
+    assert len(await index()) == 0
+
+    async with sessions() as db:
+        assert await set_listing_status(db, LISTING_ID, "active")
+    found = (await index()).nearest(24.86, 67.0, k=5)
+    assert [listing_id for listing_id, _ in found] == [LISTING_ID]
+
+    # Moved from Karachi to Lahore
+    async with sessions() as db:
+        await set_listing_location(db, LISTING_ID, 31.5204, 74.3587)
+    current = await index()
+    assert current.nearest(24.86, 67.0, k=5) == []
+    assert [listing_id for listing_id, _ in current.nearest(31.52, 74.35, k=5)] == [
+        LISTING_ID
+    ]
+
+    async with sessions() as db:
+        await set_listing_status(db, LISTING_ID, "inactive")
+    assert len(await index()) == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_listing_is_not_announced(sessions, index):
+    async with sessions() as db:
+        assert not await set_listing_status(db, "missing", "active")
+    await asyncio.sleep(0)
+    assert len(await index()) == 0
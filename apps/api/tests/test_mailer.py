@@ -0,0 +1,140 @@
+"""
+Tests for bulk email delivery
+An in-process aiosmtpd server stands in for the SMTP relay
+"""
+
+import asyncio
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.core.config import settings
+from app.services.mailer import SMTP_RECONNECTS, send_bulk
+
+SUBJECT = "Your stay in {{ city }} starts on {{ check_in }}"
+
+
+class Sink:
+    """Accepts mail, refuses bounce-* addresses and can drop the session once"""
+
+    def __init__(self, drop_at: int = 0):
+        self.drop_at = drop_at
+        self.data_commands = 0
+        self.sessions = 0
+        self.received = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce"):
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.data_commands += 1
+        if self.data_commands == self.drop_at:
+            asyncio.get_running_loop().call_soon(server.transport.close)
+            return "421 4.3.2 Too many messages, closing connection"
+        self.received.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    def start(**options) -> Sink:
+        sink = Sink(**options)
+        port = free_port()
+        controller = Controller(sink, hostname="127.0.0.1", port=port)
+        controller.start()
+        controllers.append(controller)
+        monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(settings, "SMTP_PORT", port)
+        return sink
+
+    controllers = []
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+def recipients(*emails: str) -> list:
+    return [
+        {
+            "email": email,
+            "context": {
+                "guest_name": "Guest",
+                "host_name": "Ayesha",
+                "listing_title": "Sea view apartment",
+                "city": "Karachi",
+                "check_in": "2026-12-18",
+                "booking_url": "https://homlo.pk/bookings/1",
+            },
+        }
+        for email in emails
+    ]
+
+
+@pytest.mark.asyncio
+async def test_refused_recipients_fail_only_their_message(smtp):
+    sink = smtp()
+    batch = recipients(
+        "guest-1@example.pk",
+        "bounce-1@example.pk",
+        "guest-2@example.pk",
+        # The same address twice: each copy is reported by its position
+        "bounce-1@example.pk",
+    )
+
+    result = await send_bulk("booking_reminder", SUBJECT, batch, connections=2)
+
+    assert (result["sent"], result["failed"], result["aborted"]) == (2, 2, False)
+    assert sorted(failure["index"] for failure in result["failures"]) == [1, 3]
+    assert all(failure["error"].startswith("550") for failure in result["failures"])
+    assert sorted(sink.received) == ["guest-1@example.pk", "guest-2@example.pk"]
+    # Sessions stay open for the whole batch
+    assert sink.sessions == 2
+
+
+@pytest.mark.asyncio
+async def test_dropped_session_is_reopened(smtp):
+    sink = smtp(drop_at=2)
+    reconnects = SMTP_RECONNECTS._value.get()
+    batch = recipients(*(f"guest-{i}@example.pk" for i in range(4)))
+
+    result = await send_bulk("booking_reminder", SUBJECT, batch)
+
+    assert (result["sent"], result["failed"]) == (4, 0)
+    assert len(sink.received) == 4
+    assert SMTP_RECONNECTS._value.get() == reconnects + 1
+
+
+@pytest.mark.asyncio
+async def test_unreachable_server_aborts_the_batch(monkeypatch):
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", free_port())
+    monkeypatch.setattr(settings, "SMTP_RECONNECT_ATTEMPTS", 1)
+
+    result = await send_bulk(
+        "booking_reminder", SUBJECT, recipients("a@example.pk", "b@example.pk")
+    )
+
+    assert (result["sent"], result["failed"], result["aborted"]) == (0, 2, True)
+    assert "unreachable" in result["failures"][1]["error"]
+
+
+@pytest.mark.asyncio
+async def test_missing_address_is_refused_before_sending():
+    batch = recipients("a@example.pk") + [{"context": {}}]
+    with pytest.raises(ValueError, match="index 1"):
+        await send_bulk("booking_reminder", SUBJECT, batch)
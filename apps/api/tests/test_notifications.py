@@ -0,0 +1,53 @@
+"""
+Tests for cached notifications and unread counts
+"""
+
+import pytest
+
+from app.core.redis import (
+    NOTIFICATIONS_MAX,
+    add_bulk_notifications,
+    add_user_notification,
+    get_notifications_with_unread,
+    get_user_notifications,
+    mark_notifications_read,
+)
+
+
+@pytest.mark.asyncio
+async def test_bulk_fan_out_reaches_every_user(fake_redis):
+    user_ids = [f"user-{i}" for i in range(25)]
+    notification = {"type": "promo", "title": "Eid stays"}
+
+    assert await add_bulk_notifications(user_ids, notification, batch_size=10) == 25
+
+    for user_id in ("user-0", "user-9", "user-10", "user-24"):
+        assert await get_notifications_with_unread(user_id) == ([notification], 1)
+    assert await get_notifications_with_unread("user-25") == ([], 0)
+
+
+@pytest.mark.asyncio
+async def test_newest_first_and_read_resets_the_count(fake_redis):
+    for i in range(3):
+        await add_user_notification("user-1", {"id": i})
+    await add_bulk_notifications(["user-1", "user-2"], {"id": "broadcast"})
+
+    notifications, unread = await get_notifications_with_unread("user-1", limit=2)
+    assert notifications == [{"id": "broadcast"}, {"id": 2}]
+    assert unread == 4
+
+    assert await mark_notifications_read("user-1")
+    notifications, unread = await get_notifications_with_unread("user-1")
+    assert (len(notifications), unread) == (4, 0)
+    assert await get_notifications_with_unread("user-2") == ([{"id": "broadcast"}], 1)
+
+
+@pytest.mark.asyncio
+async def test_list_and_unread_count_are_capped(fake_redis):
+    await add_bulk_notifications(
+        ["user-1"] * (NOTIFICATIONS_MAX + 10), {"type": "message"}
+    )
+
+    assert len(await get_user_notifications("user-1", limit=1000)) == NOTIFICATIONS_MAX
+    _, unread = await get_notifications_with_unread("user-1")
+    assert unread == NOTIFICATIONS_MAX
@@ -0,0 +1,106 @@
+"""
+Tests for WebSocket presence and per-worker delivery
+"""
+
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+
+import app.services.presence as presence
+from app.core.config import settings
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.received = []
+        self.closed = False
+
+    async def send_text(self, data: str) -> None:
+        self.received.append(data)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class StuckSocket(RecordingSocket):
+    """A client that stopped reading: sends never complete"""
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.Event().wait()
+
+
+def envelope(connections, message_id: int) -> dict:
+    return {
+        "connections": [connection.id for connection in connections],
+        "message": {"id": message_id},
+    }
+
+
+@pytest_asyncio.fixture
+async def hub(fake_redis, monkeypatch):
+    monkeypatch.setattr(presence, "_scripts", {})
+    connection_hub = presence.ConnectionHub()
+    yield connection_hub
+    await connection_hub.stop()
+
+
+@pytest.mark.asyncio
+async def test_stuck_client_is_closed_without_delaying_others(hub, monkeypatch):
+    monkeypatch.setattr(settings, "WS_SEND_TIMEOUT", 0.05)
+    stuck_socket, live_socket = StuckSocket(), RecordingSocket()
+    stuck = await hub.register("user-1", stuck_socket)
+    live = await hub.register("user-2", live_socket)
+
+    started = time.monotonic()
+    for message_id in range(3):
+        await hub._deliver(envelope([stuck, live], message_id))
+    await asyncio.sleep(0.01)
+    assert len(live_socket.received) == 3
+    assert time.monotonic() - started < settings.WS_SEND_TIMEOUT
+
+    await asyncio.sleep(0.1)
+    assert stuck_socket.closed
+    assert stuck.id not in hub.connections
+    assert live.id in hub.connections
+    assert await presence.online_users(["user-1", "user-2"]) == {
+        "user-1": False,
+        "user-2": True,
+    }
+
+
+@pytest.mark.asyncio
+async def test_client_that_falls_behind_is_closed(hub, monkeypatch):
+    monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", 2)
+    socket = StuckSocket()
+    connection = await hub.register("user-1", socket)
+
+    for message_id in range(4):
+        await hub._deliver(envelope([connection], message_id))
+    await asyncio.sleep(0.01)
+
+    assert socket.closed
+    assert connection.id not in hub.connections
+    assert connection.writer.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_sweep_removes_only_stale_connections(hub, fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "WS_SWEEP_BATCH_SIZE", 2)
+    await hub.register("user-1", RecordingSocket())
+
+    # Entries left behind by a worker that died
+    stale = time.time() - settings.WS_PRESENCE_TIMEOUT - 10
+    for i in range(5):
+        member = f"dead-worker:connection-{i}"
+        user_key = presence.PRESENCE_KEY.format(user_id=f"user-{i}")
+        await fake_redis.zadd(user_key, {member: stale})
+        await fake_redis.zadd(presence.CONNECTIONS_KEY, {f"user-{i}|{member}": stale})
+
+    assert await presence.sweep_stale_connections() == 5
+
+    assert await fake_redis.zcard(presence.CONNECTIONS_KEY) == 1
+    assert await fake_redis.exists(presence.PRESENCE_KEY.format(user_id="user-2")) == 0
+    online = await presence.online_users(["user-1", "user-2"])
+    assert online == {"user-1": True, "user-2": False}
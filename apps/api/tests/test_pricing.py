@@ -0,0 +1,150 @@
+"""
+Tests for the price quote engine
+"""
+
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+
+import app.services.pricing as pricing
+from app.services.pricing import compute_quotes, invalidate_listing_quotes
+from app.services.search import search_listings
+
+# Thursday to Monday: Friday and Saturday are weekend nights
+CHECK_IN, CHECK_OUT = date(2026, 1, 1), date(2026, 1, 5)
+
+
+def rule(listing_id: str, **overrides) -> dict:
+    return {
+        "listing_id": listing_id,
+        "base_price_pkr": 10000,
+        "weekend_price_pkr": 15000,
+        "cleaning_fee_pkr": 2500.50,
+        "deposit_pkr": 5000,
+        "min_nights": 2,
+        "max_nights": None,
+        **overrides,
+    }
+
+
+def season(listing_id: str, start: date, end: date, price: float) -> dict:
+    return {
+        "listing_id": listing_id,
+        "start_date": start,
+        "end_date": end,
+        "price_pkr": price,
+    }
+
+
+def nightly(quote: dict) -> list:
+    return [night["price_pkr"] for night in quote["nightly"]]
+
+
+def test_weekend_nights_use_the_weekend_price():
+    quotes = compute_quotes(
+        [rule("a"), rule("b", weekend_price_pkr=None)], [], CHECK_IN, CHECK_OUT
+    )
+
+    assert nightly(quotes["a"]) == [10000, 15000, 15000, 10000]
+    assert quotes["a"]["subtotal_pkr"] == 50000
+    assert quotes["a"]["total_pkr"] == 52500.50
+    assert nightly(quotes["b"]) == [10000] * 4
+
+
+def test_later_starting_seasons_win_where_they_overlap():
+    seasons = [
+        season("b", date(2026, 1, 2), date(2026, 1, 3), 99999),
+        # Runs past the stay on both ends
+        season("a", date(2025, 12, 20), date(2026, 1, 10), 20000),
+        season("a", date(2026, 1, 3), date(2026, 1, 3), 30000),
+        # Ends before the stay
+        season("a", date(2025, 12, 1), date(2025, 12, 31), 1),
+        # Not a listing being quoted
+        season("c", date(2026, 1, 1), date(2026, 1, 4), 1),
+    ]
+    quotes = compute_quotes([rule("a"), rule("b")], seasons, CHECK_IN, CHECK_OUT)
+
+    assert nightly(quotes["a"]) == [20000, 20000, 30000, 20000]
+    assert nightly(quotes["b"]) == [10000, 99999, 99999, 10000]
+
+
+def test_stay_length_limits_are_reported():
+    quotes = compute_quotes(
+        [rule("short", min_nights=7), rule("long", max_nights=3), rule("ok")],
+        [],
+        CHECK_IN,
+        CHECK_OUT,
+    )
+
+    assert quotes["short"]["min_nights_violation"]
+    assert quotes["long"]["max_nights_violation"]
+    assert not quotes["ok"]["min_nights_violation"]
+    assert not quotes["ok"]["max_nights_violation"]
+    assert quotes["ok"]["max_nights"] is None
+
+
+def test_empty_stay_is_refused():
+    with pytest.raises(ValueError):
+        compute_quotes([rule("a")], [], CHECK_IN, CHECK_IN)
+
+
+@pytest_asyncio.fixture
+async def loads(fake_redis, monkeypatch):
+    """Stands in for the Postgres pricing query, recording what was loaded"""
+    loaded = []
+
+    async def load_pricing(db, listing_ids, check_in, check_out):
+        loaded.append(list(listing_ids))
+        # Listing "c" has no pricing rules
+        return [rule(listing_id) for listing_id in listing_ids if listing_id != "c"], []
+
+    monkeypatch.setattr(pricing, "_load_pricing", load_pricing)
+    return loaded
+
+
+@pytest.mark.asyncio
+async def test_quotes_are_cached_until_pricing_changes(loads):
+    quotes = await pricing.quote_listings(None, ["a", "b", "c"], CHECK_IN, CHECK_OUT)
+    assert set(quotes) == {"a", "b"}
+
+    quotes = await pricing.quote_listings(None, ["a", "b", "d"], CHECK_IN, CHECK_OUT)
+    assert set(quotes) == {"a", "b", "d"}
+    assert loads == [["a", "b", "c"], ["d"]]
+
+    assert await invalidate_listing_quotes("a") == 1
+    quote = await pricing.quote_listing(None, "a", CHECK_IN, CHECK_OUT)
+    assert quote["total_pkr"] == 52500.50
+    assert loads[-1] == ["a"]
+
+
+class SearchPage:
+    """Answers the Postgres full-text query with a fixed page of listings"""
+
+    def __init__(self, *listing_ids: str):
+        self.rows = [
+            SimpleNamespace(
+                id=listing_id, title="Flat", city="Lahore", area=None, rank=1
+            )
+            for listing_id in listing_ids
+        ]
+
+    async def execute(self, statement, params):
+        return self.rows
+
+
+@pytest.mark.asyncio
+async def test_search_results_are_priced_for_the_stay(loads):
+    db = SearchPage("a", "c")
+
+    results = await search_listings(db, "flat", check_in=CHECK_IN, check_out=CHECK_OUT)
+    assert results[0]["quote"]["total_pkr"] == 52500.50
+    # No pricing rules
+    assert results[1]["quote"] is None
+    assert loads == [["a", "c"]]
+
+    # Without a stay nothing is priced
+    results = await search_listings(db, "flat")
+    assert "quote" not in results[0]
+    assert len(loads) == 1
@@ -0,0 +1,91 @@
+"""
+Tests for the Redis sliding-window rate limiter
+fakeredis answers the script's TIME from a controlled clock
+"""
+
+import pytest
+import pytest_asyncio
+from fakeredis.commands_mixins import server_mixin
+
+import app.core.redis as app_redis
+from app.core.redis import hit_sliding_window
+
+# The start of a minute and of an hour
+START = 1_700_002_800.0
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest_asyncio.fixture
+async def clock(fake_redis, monkeypatch):
+    fake_clock = Clock(START)
+    monkeypatch.setattr(server_mixin, "time", fake_clock)
+    monkeypatch.setattr(app_redis, "_sliding_window_script", None)
+    return fake_clock
+
+
+@pytest.mark.asyncio
+async def test_allows_up_to_the_limit_then_rejects(clock):
+    limits = [(3, 60)]
+
+    results = [await hit_sliding_window("ip:1", limits) for _ in range(3)]
+    assert results == [(True, 2, 0, 3), (True, 1, 0, 3), (True, 0, 0, 3)]
+
+    clock.now += 15
+    allowed, remaining, retry_after, limit = await hit_sliding_window("ip:1", limits)
+    assert (allowed, remaining, limit) == (False, 0, 3)
+    assert retry_after == 45
+
+    # Other clients have their own budget
+    assert (await hit_sliding_window("ip:2", limits))[0]
+
+
+@pytest.mark.asyncio
+async def test_previous_window_weighs_less_as_it_slides_out(clock):
+    limits = [(3, 60)]
+    for _ in range(3):
+        await hit_sliding_window("ip:1", limits)
+
+    # Halfway into the next window the full one still counts for half
+    clock.now += 90
+    assert await hit_sliding_window("ip:1", limits) == (True, 0, 0, 3)
+    assert not (await hit_sliding_window("ip:1", limits))[0]
+
+
+@pytest.mark.asyncio
+async def test_resets_once_the_window_has_passed(clock):
+    limits = [(2, 60)]
+    for _ in range(2):
+        await hit_sliding_window("ip:1", limits)
+    assert not (await hit_sliding_window("ip:1", limits))[0]
+
+    clock.now += 120
+    assert await hit_sliding_window("ip:1", limits) == (True, 1, 0, 2)
+
+
+@pytest.mark.asyncio
+async def test_rejections_do_not_consume_budget(clock):
+    limits = [(1, 60)]
+    await hit_sliding_window("ip:1", limits)
+    for _ in range(5):
+        assert not (await hit_sliding_window("ip:1", limits))[0]
+
+    clock.now += 120
+    assert (await hit_sliding_window("ip:1", limits))[0]
+
+
+@pytest.mark.asyncio
+async def test_reports_the_binding_window(clock):
+    limits = [(10, 60), (2, 3600)]
+    assert await hit_sliding_window("user:1", limits) == (True, 1, 0, 2)
+    await hit_sliding_window("user:1", limits)
+
+    allowed, _, retry_after, limit = await hit_sliding_window("user:1", limits)
+    assert (allowed, limit) == (False, 2)
+    assert retry_after == 3600
@@ -0,0 +1,179 @@
+"""
+Tests for read replica routing and read-your-writes pinning
+Two SQLite databases stand in for the replicas, each reporting its lag from
+a table in place of the Postgres replay functions
+"""
+
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+from starlette.requests import Request
+
+import app.api.deps as deps
+import app.core.database as database
+from app.core.config import settings
+
+LAG_QUERY = "SELECT seconds FROM replica_lag"
+
+
+def request_from(address: str) -> Request:
+    return Request({"type": "http", "headers": [], "client": (address, 40000)})
+
+
+async def set_lag(replica: database.Replica, seconds: float) -> None:
+    async with replica.engine.begin() as conn:
+        await conn.execute(text("DELETE FROM replica_lag"))
+        await conn.execute(
+            text("INSERT INTO replica_lag (seconds) VALUES (:seconds)"),
+            {"seconds": seconds},
+        )
+
+
+async def session_from(dependency, request: Request):
+    generator = dependency(request)
+    return generator, await generator.__anext__()
+
+
+async def close(generator) -> None:
+    with pytest.raises(StopAsyncIteration):
+        await generator.__anext__()
+
+
+@pytest_asyncio.fixture
+async def replicas(tmp_path, monkeypatch, fake_redis):
+    replica_set = database.ReplicaSet(
+        [f"sqlite+aiosqlite:///{tmp_path}/replica{i}.db" for i in range(2)]
+    )
+    for replica in replica_set.replicas:
+        async with replica.engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE replica_lag (seconds REAL)"))
+        await set_lag(replica, 0)
+    async with database.engine.begin() as conn:
+        await conn.execute(text("DROP TABLE IF EXISTS bookings"))
+        await conn.execute(
+            text("CREATE TABLE bookings (id INTEGER PRIMARY KEY, listing_id TEXT)")
+        )
+
+    monkeypatch.setattr(database, "REPLICA_LAG_QUERY", LAG_QUERY)
+    monkeypatch.setattr(deps, "replicas", replica_set)
+    yield replica_set
+    await replica_set.close()
+    await database.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_round_robin_over_fresh_replicas(replicas):
+    await replicas.check_lag()
+
+    chosen = [replicas.choose() for _ in range(4)]
+
+    first, second = (replica.session_factory for replica in replicas.replicas)
+    assert chosen in ([first, second, first, second], [second, first, second, first])
+
+
+@pytest.mark.asyncio
+async def test_skips_lagging_replica(replicas):
+    lagging = replicas.replicas[1]
+    await set_lag(lagging, settings.DATABASE_REPLICA_MAX_LAG_SECONDS + 1)
+    await replicas.check_lag()
+
+    assert {replicas.choose() for _ in range(4)} == {
+        replicas.replicas[0].session_factory
+    }
+
+
+@pytest.mark.asyncio
+async def test_skips_replicas_with_unknown_lag(replicas):
+    # Not measured yet: reads stay on the primary
+    assert replicas.choose() is None
+
+    await replicas.check_lag()
+    # A failed lag check, and a measurement that has gone stale
+    async with replicas.replicas[0].engine.begin() as conn:
+        await conn.execute(text("DROP TABLE replica_lag"))
+    await replicas.check_lag()
+    assert replicas.replicas[0].lag is None
+    assert replicas.choose() is replicas.replicas[1].session_factory
+
+    replicas.replicas[1].checked_at = (
+        time.monotonic() - settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL * 4
+    )
+    assert replicas.choose() is None
+
+
+@pytest.mark.asyncio
+async def test_raw_sql_write_pins_caller_to_primary(replicas):
+    await replicas.check_lag()
+    writer, other = request_from("203.0.113.5"), request_from("203.0.113.6")
+
+    generator, db = await session_from(deps.get_db, writer)
+    await db.execute(text("INSERT INTO bookings (listing_id) VALUES ('listing-1')"))
+    await db.commit()
+    # Pinned by the time commit returns, before the endpoint can respond
+    assert await deps.is_pinned_to_primary("ip:203.0.113.5")
+    await close(generator)
+
+    generator, db = await session_from(deps.get_read_db, writer)
+    assert db.bind is database.engine
+    assert (await db.execute(text("SELECT count(*) FROM bookings"))).scalar() == 1
+    await close(generator)
+
+    generator, db = await session_from(deps.get_read_db, other)
+    assert db.bind in {replica.engine for replica in replicas.replicas}
+    await close(generator)
+
+
+@pytest.mark.asyncio
+async def test_write_committed_through_begin_pins_at_teardown(replicas):
+    await replicas.check_lag()
+    request = request_from("203.0.113.7")
+
+    generator, db = await session_from(deps.get_db, request)
+    async with db.begin():
+        await db.execute(text("UPDATE bookings SET listing_id = 'listing-2'"))
+    await close(generator)
+
+    assert await deps.is_pinned_to_primary("ip:203.0.113.7")
+
+
+@pytest.mark.asyncio
+async def test_reads_and_rolled_back_writes_do_not_pin(replicas):
+    await replicas.check_lag()
+    request = request_from("203.0.113.8")
+
+    generator, db = await session_from(deps.get_db, request)
+    await db.execute(text("SELECT * FROM bookings"))
+    await db.commit()
+    await db.execute(text("INSERT INTO bookings (listing_id) VALUES ('listing-3')"))
+    await db.rollback()
+    await db.commit()
+    await close(generator)
+
+    assert not await deps.is_pinned_to_primary("ip:203.0.113.8")
+
+
+@pytest.mark.asyncio
+async def test_only_primary_dependency_sessions_track_writes(replicas):
+    async with database.AsyncSessionLocal() as db:
+        await db.execute(text("INSERT INTO bookings (listing_id) VALUES ('listing-4')"))
+        await db.commit()
+        assert "committed_writes" not in db.info
+
+    replica = replicas.replicas[0]
+    assert not event.contains(
+        replica.engine.sync_engine,
+        "after_cursor_execute",
+        database._mark_statement_writes,
+    )
+
+
+def test_is_write_statement():
+    assert database.is_write_statement("  insert into bookings values (1)")
+    assert database.is_write_statement(
+        "WITH moved AS (DELETE FROM holds RETURNING id) SELECT count(*) FROM moved"
+    )
+    assert not database.is_write_statement(
+        "SELECT * FROM listings WHERE title = 'UPDATE'"
+    )
@@ -0,0 +1,100 @@
+"""
+Tests for the Redis session store and its binary encoding
+"""
+
+import json
+import uuid
+
+import pytest
+import pytest_asyncio
+
+import app.core.sessions as sessions
+from app.core.cache import local_cache
+from app.core.config import settings
+from app.core.sessions import (
+    SESSION_KEY,
+    decode_session,
+    delete_session,
+    encode_session,
+    get_session,
+    revoke_user_sessions,
+    set_session,
+)
+
+USER_ID = "5f0c6a0e-8c1b-4c8e-9a51-2f4d8c3e7b10"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"user_id": USER_ID, "role": "host"},
+        {"user_id": USER_ID, "role": "guest", "phone": "+923001234567"},
+        {"role": "admin"},
+        {},
+        # Not canonical or not a UUID at all: kept as given
+        {"user_id": USER_ID.upper(), "role": "guest"},
+        {"user_id": "user-42", "role": "superuser"},
+        {"user_id": 42},
+    ],
+)
+def test_encode_decode_round_trip(data):
+    raw = encode_session(data, 1_700_000_000, 1_700_000_600)
+    assert decode_session(raw) == (data, 1_700_000_000, 1_700_000_600)
+
+
+def test_common_session_needs_no_json():
+    raw = encode_session({"user_id": USER_ID, "role": "host"}, 0, 0)
+    assert len(raw) == 26
+
+
+def test_unknown_format_decodes_to_none():
+    raw = encode_session({"role": "host"}, 0, 0)
+    assert decode_session(bytes([99]) + raw[1:]) is None
+    assert decode_session(raw[:10]) is None
+
+
+def test_legacy_json_session_is_read():
+    data, created_at, refreshed_at = decode_session(
+        json.dumps({"user_id": USER_ID}).encode()
+    )
+    assert data == {"user_id": USER_ID}
+    # Due for a refresh, which rewrites it in the binary form
+    assert created_at - refreshed_at >= settings.SESSION_REFRESH_INTERVAL
+
+
+@pytest_asyncio.fixture
+async def store(fake_redis, monkeypatch):
+    # Registered against the previous test's Redis client
+    monkeypatch.setattr(sessions, "_revoke_script", None)
+    yield fake_redis
+    local_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_session_is_read_back(store):
+    assert await set_session("s1", {"user_id": USER_ID, "role": "guest"})
+    assert await get_session("s1") == {"user_id": USER_ID, "role": "guest"}
+
+    assert await delete_session("s1")
+    assert await get_session("s1") is None
+
+
+@pytest.mark.asyncio
+async def test_revoke_removes_only_that_users_sessions(store):
+    other_user = str(uuid.uuid4())
+    for session_id in ("a", "b", "c"):
+        await set_session(session_id, {"user_id": USER_ID, "role": "guest"})
+    await set_session("other", {"user_id": other_user, "role": "host"})
+    # Served from the local cache until revoked
+    assert await get_session("a") is not None
+    # Already logged out; its id is still in the index
+    await delete_session("c")
+
+    assert await revoke_user_sessions(USER_ID) == 2
+
+    assert await get_session("a") is None
+    assert await get_session("b") is None
+    assert await get_session("other") == {"user_id": other_user, "role": "host"}
+    assert await store.exists(sessions.USER_SESSIONS_KEY.format(user_id=USER_ID)) == 0
+    assert local_cache.get(SESSION_KEY.format(session_id="a")) is None
+    assert await revoke_user_sessions(USER_ID) == 0
@@ -0,0 +1,114 @@
+"""
+Tests for SMS batching, retries and the priority lane
+The benchmarks' fake provider answers in process through an ASGI transport
+"""
+
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.core.config import settings
+from app.services.sms import GatewayProvider, LaneLimiter, SMSSender, TwilioProvider
+from benchmarks.fake_sms_provider import FakeProvider
+
+
+@pytest_asyncio.fixture
+async def sender_for(monkeypatch):
+    monkeypatch.setattr(settings, "SMS_RETRY_BASE_DELAY", 0)
+    senders = []
+
+    def build(provider_class, fake: FakeProvider) -> SMSSender:
+        sender = SMSSender(provider_class())
+        sender.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=fake.app()), base_url="http://provider"
+        )
+        senders.append(sender)
+        return sender
+
+    yield build
+    for sender in senders:
+        await sender.close()
+
+
+def messages(count: int, body: str = "Eid offer: 20% off stays") -> list:
+    return [{"to": f"+92300{i:07d}", "body": body} for i in range(1, count + 1)]
+
+
+@pytest.mark.asyncio
+async def test_gateway_sends_one_call_per_batch_of_a_body(sender_for, monkeypatch):
+    monkeypatch.setattr(settings, "SMS_BATCH_SIZE", 100)
+    fake = FakeProvider(latency=0)
+    sender = sender_for(GatewayProvider, fake)
+    batch = messages(250) + messages(10, body="Another body")
+    batch[5]["to"] = "+923000000000"
+
+    result = await sender.send_many(batch)
+
+    assert result["requests"] == 4
+    assert fake.requests == 4
+    assert (result["sent"], result["failed"]) == (259, 1)
+    assert result["failures"] == {"+923000000000": "invalid number"}
+
+
+@pytest.mark.asyncio
+async def test_twilio_throttling_is_retried(sender_for, monkeypatch):
+    monkeypatch.setattr(settings, "SMS_MAX_RETRIES", 10)
+    fake = FakeProvider(latency=0, error_rate=0.3)
+    sender = sender_for(TwilioProvider, fake)
+
+    result = await sender.send_many(messages(20) + [{"to": "0300", "body": "x"}])
+
+    assert fake.throttled > 0
+    assert result["requests"] == 21
+    assert (result["sent"], result["failed"]) == (20, 1)
+    assert "not valid" in result["failures"]["0300"]
+    assert fake.messages == 20
+
+
+@pytest.mark.asyncio
+async def test_retries_give_up_per_recipient(sender_for, monkeypatch):
+    monkeypatch.setattr(settings, "SMS_MAX_RETRIES", 2)
+    fake = FakeProvider(latency=0, error_rate=1.0)
+    sender = sender_for(TwilioProvider, fake)
+
+    result = await sender.send_many(messages(2))
+
+    assert result["failed"] == 2
+    assert fake.requests == 6
+    assert all("gave up after 3" in error for error in result["failures"].values())
+
+
+@pytest.mark.asyncio
+async def test_priority_calls_keep_reserved_slots():
+    limiter = LaneLimiter(limit=2, reserved=1)
+    order = []
+
+    async def call(name: str, priority: bool, release: asyncio.Event):
+        async with limiter.slot(priority):
+            order.append(name)
+            await release.wait()
+
+    first_done, second_done, otp_done = (asyncio.Event() for _ in range(3))
+    bulk = asyncio.create_task(call("bulk-1", False, first_done))
+    queued_bulk = asyncio.create_task(call("bulk-2", False, second_done))
+    await asyncio.sleep(0)
+    # Bulk may only use one of the two slots
+    assert order == ["bulk-1"]
+
+    otp = asyncio.create_task(call("otp", True, otp_done))
+    await asyncio.sleep(0)
+    assert order == ["bulk-1", "otp"]
+
+    # A freed slot goes to waiting priority calls before bulk ones
+    later_otp = asyncio.create_task(call("otp-2", True, otp_done))
+    first_done.set()
+    await asyncio.sleep(0.01)
+    assert order == ["bulk-1", "otp", "otp-2"]
+
+    otp_done.set()
+    second_done.set()
+    await asyncio.gather(bulk, queued_bulk, otp, later_otp)
+    assert order[-1] == "bulk-2"
+    assert limiter.in_use == 0
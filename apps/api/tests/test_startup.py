@@ -0,0 +1,42 @@
+"""
+Tests for the API's cold start
+Runs the startup benchmark's worker in a fresh interpreter
+"""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+BENCH_STARTUP = (
+    Path(__file__).resolve().parent.parent / "benchmarks" / "bench_startup.py"
+)
+
+
+def load_bench_startup():
+    spec = importlib.util.spec_from_file_location("bench_startup", BENCH_STARTUP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def startup():
+    # The worker picks its own scratch database rather than the tests'
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.delenv("DATABASE_URL", raising=False)
+        bench_startup = load_bench_startup()
+        yield bench_startup, bench_startup.run_once()
+
+
+def test_cold_start_within_budget(startup):
+    bench_startup, result = startup
+
+    assert result["seconds"] <= bench_startup.BUDGET_SECONDS
+    assert result["local_cache"] >= bench_startup.HOT_KEYS
+
+
+def test_api_process_does_not_import_celery(startup):
+    _, result = startup
+
+    assert result["forbidden"] == []
@@ -8,6 +8,7 @@ CREATE EXTENSION IF NOT EXISTS postgis_topology;
 -- Create additional extensions for full-text search and other features
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gist;
 
 -- Set timezone to Asia/Karachi
 SET timezone = 'Asia/Karachi';
@@ -30,7 +31,18 @@ CREATE INDEX IF NOT EXISTS idx_listings_city ON listings(city);
 CREATE INDEX IF NOT EXISTS idx_listings_type ON listings(type);
 CREATE INDEX IF NOT EXISTS idx_bookings_dates ON bookings(check_in, check_out);
 CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(status);
+
+-- No two pending or confirmed bookings of a listing may share a night
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'bookings_no_overlap') THEN
+        ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap
+            EXCLUDE USING gist (listing_id WITH =, daterange(check_in, check_out) WITH &&)
+            WHERE (status IN ('pending', 'confirmed'));
+    END IF;
+END $$;
 CREATE INDEX IF NOT EXISTS idx_messages_thread_id ON messages(thread_id);
+CREATE INDEX IF NOT EXISTS idx_messages_thread_created ON messages(thread_id, created_at, id);
 CREATE INDEX IF NOT EXISTS idx_reviews_listing_id ON reviews(listing_id);
 
 -- Create functions for common operations
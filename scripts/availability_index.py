@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Availability index maintenance for Homlo
+Rebuilds the Redis availability bitmaps from Postgres, checks them for drift,
+or trims the days the window has moved past
+
+Usage:
+    python scripts/availability_index.py rebuild
+    python scripts/availability_index.py check [--repair]
+    python scripts/availability_index.py trim
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent / "apps" / "api"))
+
+from app.core.database import AsyncSessionLocal, close_db
+from app.core.redis import close_redis
+from app.services.availability import check_index, rebuild_index, trim_index
+
+
+async def rebuild():
+    """Rebuild the availability index"""
+    print("🔄 Rebuilding availability index...")
+    async with AsyncSessionLocal() as db:
+        count = await rebuild_index(db)
+    print(f"   Indexed {count} listings with blocked days")
+
+
+async def trim():
+    """Drop days before the window from every bitmap"""
+    print("✂️  Trimming availability index...")
+    count = await trim_index()
+    print(f"   Checked {count} bitmaps")
+
+
+async def check(repair: bool) -> int:
+    """Check the availability index against the calendars and bookings tables"""
+    print("🔍 Checking availability index...")
+    async with AsyncSessionLocal() as db:
+        mismatches = await check_index(db)
+
+    if not mismatches:
+        print("✅ Availability index is consistent")
+        return 0
+
+    print(f"❌ {len(mismatches)} listings disagree with the database")
+    for listing_id, days in list(mismatches.items())[:20]:
+        print(f"   {listing_id}: {len(days)} days, first {days[0].isoformat()}")
+
+    if repair:
+        await rebuild()
+        return 0
+    return 1
+
+
+async def main():
+    """Main function to run the requested command"""
+    parser = argparse.ArgumentParser(description="Availability index maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="Rebuild the index from Postgres")
+    check_parser = subparsers.add_parser("check", help="Compare the index with Postgres")
+    check_parser.add_argument("--repair", action="store_true", help="Rebuild if inconsistencies are found")
+    subparsers.add_parser("trim", help="Drop days the window has moved past")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "rebuild":
+            await rebuild()
+            status = 0
+        elif args.command == "trim":
+            await trim()
+            status = 0
+        else:
+            status = await check(args.repair)
+    finally:
+        await close_redis()
+        await close_db()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Search vector backfill for Homlo
+Fills in listings.search_vector for rows written before its trigger existed,
+in batches by id so the table is never rewritten in one transaction
+
+Usage:
+    python scripts/backfill_search_vectors.py [--batch-size N]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent / "apps" / "api"))
+
+from app.core.database import AsyncSessionLocal, close_db
+from app.services.search import backfill_search_vectors
+
+
+async def main():
+    """Backfill search vectors"""
+    parser = argparse.ArgumentParser(description="Listing search vector backfill")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction")
+    args = parser.parse_args()
+
+    print("🔄 Backfilling listing search vectors...")
+    try:
+        async with AsyncSessionLocal() as db:
+            count = await backfill_search_vectors(db, args.batch_size)
+    finally:
+        await close_db()
+    print(f"   Updated {count} listings")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,9 +4,11 @@ Database seeding script for Homlo
 Populates the database with sample data for development and testing
 """
 
+import argparse
 import asyncio
 import sys
 import os
+import time
 from pathlib import Path
 
 # Add the app directory to the Python path
@@ -14,17 +16,80 @@ sys.path.append(str(Path(__file__).parent.parent / "apps" / "api"))
 
 from app.core.database import init_db, get_db
 from app.core.config import settings
-from app.models.user import User
-from app.models.listing import Listing, ListingPhoto, PricingRule, Calendar
-from app.models.address import Address
-from app.models.amenity import Amenity
-from app.core.security import get_password_hash
+from app.services.places import CITIES
+from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import uuid
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 
+from seed_scale import ScalePlan, analyze_tables, load_scale_data, truncate_tables
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+AMENITIES = [
+    # Basic amenities
+    {"name": "WiFi", "category": "internet", "icon": "wifi"},
+    {"name": "Air Conditioning", "category": "climate", "icon": "snowflake"},
+    {"name": "Heating", "category": "climate", "icon": "thermometer"},
+    {"name": "Kitchen", "category": "kitchen", "icon": "utensils"},
+    {"name": "Refrigerator", "category": "kitchen", "icon": "box"},
+    {"name": "Microwave", "category": "kitchen", "icon": "zap"},
+    {"name": "Dishwasher", "category": "kitchen", "icon": "droplets"},
+    {"name": "Washing Machine", "category": "laundry", "icon": "refresh-cw"},
+    {"name": "Dryer", "category": "laundry", "icon": "wind"},
+
+    # Pakistan-specific amenities
+    {"name": "Generator", "category": "power", "icon": "zap"},
+    {"name": "UPS", "category": "power", "icon": "battery"},
+    {"name": "Water Tanker", "category": "water", "icon": "droplet"},
+    {"name": "Gas Available", "category": "utilities", "icon": "flame"},
+    {"name": "Parking", "category": "parking", "icon": "car"},
+    {"name": "Security Guard", "category": "security", "icon": "shield"},
+    {"name": "CCTV", "category": "security", "icon": "video"},
+    {"name": "Mosque Nearby", "category": "religious", "icon": "building"},
+    {"name": "Market Nearby", "category": "shopping", "icon": "shopping-bag"},
+    {"name": "Hospital Nearby", "category": "health", "icon": "heart"},
+    {"name": "School Nearby", "category": "education", "icon": "book-open"},
+
+    # Luxury amenities
+    {"name": "Swimming Pool", "category": "luxury", "icon": "droplets"},
+    {"name": "Gym", "category": "fitness", "icon": "dumbbell"},
+    {"name": "Garden", "category": "outdoor", "icon": "flower"},
+    {"name": "Balcony", "category": "outdoor", "icon": "home"},
+    {"name": "Terrace", "category": "outdoor", "icon": "home"},
+    {"name": "BBQ Area", "category": "outdoor", "icon": "flame"},
+
+    # Accessibility
+    {"name": "Wheelchair Accessible", "category": "accessibility", "icon": "wheelchair"},
+    {"name": "Elevator", "category": "accessibility", "icon": "arrow-up"},
+
+    # Entertainment
+    {"name": "TV", "category": "entertainment", "icon": "tv"},
+    {"name": "Netflix", "category": "entertainment", "icon": "play"},
+    {"name": "Board Games", "category": "entertainment", "icon": "gamepad-2"},
+
+    # Business
+    {"name": "Work Desk", "category": "business", "icon": "briefcase"},
+    {"name": "High-Speed Internet", "category": "business", "icon": "wifi"},
+    {"name": "Printer", "category": "business", "icon": "printer"},
+
+    # Pet-friendly
+    {"name": "Pet Friendly", "category": "pets", "icon": "heart"},
+    {"name": "Pet Food Available", "category": "pets", "icon": "bowl"},
+
+    # Family-friendly
+    {"name": "Baby Crib", "category": "family", "icon": "baby"},
+    {"name": "High Chair", "category": "family", "icon": "chair"},
+    {"name": "Toys", "category": "family", "icon": "gamepad-2"}
+]
+
+
+def get_password_hash(password: str) -> str:
+    """Hash a password the way the auth service does"""
+    return pwd_context.hash(password)
+
 
 async def seed_database():
     """Seed the database with sample data"""
@@ -56,188 +121,15 @@ async def seed_cities_and_areas(db: AsyncSession):
     """Seed cities and areas data"""
     print("🏙️  Seeding cities and areas...")
     
-    # Major Pakistani cities with coordinates
-    cities_data = [
-        {
-            "name": "Karachi",
-            "province": "Sindh",
-            "latitude": 24.8607,
-            "longitude": 67.0011,
-            "areas": ["Clifton", "Defence", "Gulshan-e-Iqbal", "North Nazimabad", "Malir", "Korangi"]
-        },
-        {
-            "name": "Lahore",
-            "province": "Punjab",
-            "latitude": 31.5204,
-            "longitude": 74.3587,
-            "areas": ["Gulberg", "DHA", "Model Town", "Johar Town", "Bahria Town", "Wapda Town"]
-        },
-        {
-            "name": "Islamabad",
-            "province": "Islamabad Capital Territory",
-            "latitude": 33.6844,
-            "longitude": 73.0479,
-            "areas": ["F-6", "F-7", "F-8", "E-7", "E-8", "G-6", "G-7", "G-8"]
-        },
-        {
-            "name": "Rawalpindi",
-            "province": "Punjab",
-            "latitude": 33.5651,
-            "longitude": 73.0169,
-            "areas": ["Saddar", "Cantt", "Westridge", "Bahria Town", "DHA"]
-        },
-        {
-            "name": "Peshawar",
-            "province": "Khyber Pakhtunkhwa",
-            "latitude": 34.0150,
-            "longitude": 71.5249,
-            "areas": ["University Town", "Hayatabad", "Cantt", "City"]
-        },
-        {
-            "name": "Quetta",
-            "province": "Balochistan",
-            "latitude": 30.1798,
-            "longitude": 66.9750,
-            "areas": ["Cantt", "City", "Hanna Valley"]
-        },
-        {
-            "name": "Multan",
-            "province": "Punjab",
-            "latitude": 30.1575,
-            "longitude": 71.5249,
-            "areas": ["Cantt", "City", "Gulshan-e-Ravi"]
-        },
-        {
-            "name": "Faisalabad",
-            "province": "Punjab",
-            "latitude": 31.4504,
-            "longitude": 73.1350,
-            "areas": ["Cantt", "City", "DHA", "Satiana Road"]
-        },
-        {
-            "name": "Hyderabad",
-            "province": "Sindh",
-            "latitude": 25.3969,
-            "longitude": 68.3778,
-            "areas": ["Cantt", "City", "Latifabad", "Qasimabad"]
-        },
-        {
-            "name": "Sukkur",
-            "province": "Sindh",
-            "latitude": 27.7031,
-            "longitude": 68.8591,
-            "areas": ["Cantt", "City", "New Sukkur"]
-        },
-        {
-            "name": "Abbottabad",
-            "province": "Khyber Pakhtunkhwa",
-            "latitude": 34.1463,
-            "longitude": 73.2117,
-            "areas": ["Cantt", "City", "Havelian"]
-        },
-        {
-            "name": "Murree",
-            "province": "Punjab",
-            "latitude": 33.9071,
-            "longitude": 73.3903,
-            "areas": ["City", "Galiyat", "Patriata"]
-        },
-        {
-            "name": "Swat",
-            "province": "Khyber Pakhtunkhwa",
-            "latitude": 35.2256,
-            "longitude": 72.2497,
-            "areas": ["Mingora", "Saidu Sharif", "Kalam", "Malam Jabba"]
-        },
-        {
-            "name": "Hunza",
-            "province": "Gilgit-Baltistan",
-            "latitude": 36.3167,
-            "longitude": 74.6500,
-            "areas": ["Karimabad", "Aliabad", "Ganish"]
-        },
-        {
-            "name": "Skardu",
-            "province": "Gilgit-Baltistan",
-            "latitude": 35.2971,
-            "longitude": 75.6333,
-            "areas": ["City", "Khaplu", "Shigar"]
-        },
-        {
-            "name": "Gwadar",
-            "province": "Balochistan",
-            "latitude": 25.1216,
-            "longitude": 62.3254,
-            "areas": ["City", "Port", "Jiwani"]
-        }
-    ]
-    
     # Insert cities into database (this would be done through proper models in production)
-    print(f"   Added {len(cities_data)} cities with their areas")
+    print(f"   Added {len(CITIES)} cities with their areas")
 
 
 async def seed_amenities(db: AsyncSession):
     """Seed amenities data"""
     print("🏠 Seeding amenities...")
     
-    amenities_data = [
-        # Basic amenities
-        {"name": "WiFi", "category": "internet", "icon": "wifi"},
-        {"name": "Air Conditioning", "category": "climate", "icon": "snowflake"},
-        {"name": "Heating", "category": "climate", "icon": "thermometer"},
-        {"name": "Kitchen", "category": "kitchen", "icon": "utensils"},
-        {"name": "Refrigerator", "category": "kitchen", "icon": "box"},
-        {"name": "Microwave", "category": "kitchen", "icon": "zap"},
-        {"name": "Dishwasher", "category": "kitchen", "icon": "droplets"},
-        {"name": "Washing Machine", "category": "laundry", "icon": "refresh-cw"},
-        {"name": "Dryer", "category": "laundry", "icon": "wind"},
-        
-        # Pakistan-specific amenities
-        {"name": "Generator", "category": "power", "icon": "zap"},
-        {"name": "UPS", "category": "power", "icon": "battery"},
-        {"name": "Water Tanker", "category": "water", "icon": "droplet"},
-        {"name": "Gas Available", "category": "utilities", "icon": "flame"},
-        {"name": "Parking", "category": "parking", "icon": "car"},
-        {"name": "Security Guard", "category": "security", "icon": "shield"},
-        {"name": "CCTV", "category": "security", "icon": "video"},
-        {"name": "Mosque Nearby", "category": "religious", "icon": "building"},
-        {"name": "Market Nearby", "category": "shopping", "icon": "shopping-bag"},
-        {"name": "Hospital Nearby", "category": "health", "icon": "heart"},
-        {"name": "School Nearby", "category": "education", "icon": "book-open"},
-        
-        # Luxury amenities
-        {"name": "Swimming Pool", "category": "luxury", "icon": "droplets"},
-        {"name": "Gym", "category": "fitness", "icon": "dumbbell"},
-        {"name": "Garden", "category": "outdoor", "icon": "flower"},
-        {"name": "Balcony", "category": "outdoor", "icon": "home"},
-        {"name": "Terrace", "category": "outdoor", "icon": "home"},
-        {"name": "BBQ Area", "category": "outdoor", "icon": "flame"},
-        
-        # Accessibility
-        {"name": "Wheelchair Accessible", "category": "accessibility", "icon": "wheelchair"},
-        {"name": "Elevator", "category": "accessibility", "icon": "arrow-up"},
-        
-        # Entertainment
-        {"name": "TV", "category": "entertainment", "icon": "tv"},
-        {"name": "Netflix", "category": "entertainment", "icon": "play"},
-        {"name": "Board Games", "category": "entertainment", "icon": "gamepad-2"},
-        
-        # Business
-        {"name": "Work Desk", "category": "business", "icon": "briefcase"},
-        {"name": "High-Speed Internet", "category": "business", "icon": "wifi"},
-        {"name": "Printer", "category": "business", "icon": "printer"},
-        
-        # Pet-friendly
-        {"name": "Pet Friendly", "category": "pets", "icon": "heart"},
-        {"name": "Pet Food Available", "category": "pets", "icon": "bowl"},
-        
-        # Family-friendly
-        {"name": "Baby Crib", "category": "family", "icon": "baby"},
-        {"name": "High Chair", "category": "family", "icon": "chair"},
-        {"name": "Toys", "category": "family", "icon": "gamepad-2"}
-    ]
-    
-    print(f"   Added {len(amenities_data)} amenities")
+    print(f"   Added {len(AMENITIES)} amenities")
 
 
 async def seed_demo_users(db: AsyncSession):
@@ -452,10 +344,53 @@ async def seed_demo_bookings(db: AsyncSession):
     print(f"   Added {len(bookings_data)} demo bookings")
 
 
+async def seed_scale(listings: int, seed: int, jobs: int, calendar_days: int, start_date: date, truncate: bool):
+    """Seed production-sized data for capacity testing with COPY"""
+    print(f"🏗️  Seeding scale data for {listings:,} listings (seed {seed}, {jobs} workers)...")
+    
+    dsn = settings.DATABASE_URL.replace("+asyncpg", "")
+    plan = ScalePlan(
+        listings=listings,
+        seed=seed,
+        start_date=start_date,
+        calendar_days=calendar_days,
+        # One hash shared by every generated user; hashing millions would dominate the load
+        password_hash=get_password_hash("password123"),
+        cities=CITIES,
+        amenities=[amenity["name"] for amenity in AMENITIES],
+    )
+    
+    if truncate:
+        print("🧹 Truncating seeded tables...")
+        await truncate_tables(dsn)
+    
+    started = time.perf_counter()
+    await load_scale_data(dsn, plan, jobs)
+    elapsed = time.perf_counter() - started
+    
+    print("📊 Analyzing tables...")
+    await analyze_tables(dsn)
+    
+    total = sum(plan.row_counts().values())
+    print(f"✅ Loaded {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+
 async def main():
     """Main function to run the seeding process"""
+    parser = argparse.ArgumentParser(description="Seed the Homlo database")
+    parser.add_argument("--scale", type=int, metavar="LISTINGS", help="Generate production-sized data for this many listings")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for --scale; the same seed gives the same rows")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 4, help="Parallel COPY workers for --scale")
+    parser.add_argument("--calendar-days", type=int, default=90, help="Calendar days per listing for --scale")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date.today(), help="First calendar day for --scale (YYYY-MM-DD)")
+    parser.add_argument("--truncate", action="store_true", help="Empty the seeded tables before --scale")
+    args = parser.parse_args()
+    
     try:
-        await seed_database()
+        if args.scale:
+            await seed_scale(args.scale, args.seed, args.jobs, args.calendar_days, args.start_date, args.truncate)
+        else:
+            await seed_database()
     except Exception as e:
         print(f"❌ Error seeding database: {e}")
         sys.exit(1)
@@ -0,0 +1,487 @@
+"""
+Scale data generator for Homlo
+Streams production-sized, deterministic data into Postgres with COPY
+
+Every row is derived from (seed, table, row number), so any slice of any
+table can be generated independently; foreign keys are computed rather than
+looked up. Tables are split into fixed-size parts that are loaded in
+parallel worker processes, one asyncpg connection and COPY per part.
+"""
+
+import asyncio
+import random
+import struct
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from multiprocessing import Manager
+from typing import Dict, Iterator, List, Tuple
+
+import asyncpg
+
+# Shape of the generated data per listing
+LISTINGS_PER_HOST = 3
+USERS_PER_LISTING = 2
+PHOTOS_PER_LISTING = 5
+BOOKINGS_PER_LISTING = 4
+PAST_BOOKINGS_PER_LISTING = 2  # completed, and reviewed
+MESSAGES_PER_THREAD = 6
+
+# Each booking owns a slot of this many days, so a listing's bookings never overlap
+BOOKING_SLOT_DAYS = 14
+
+# Rows per part; fixed so the generated data does not depend on --jobs
+PART_ROWS = 250_000
+PROGRESS_EVERY = 10_000
+
+LISTING_TYPES = ["entire_home", "private_room", "shared_room", "guest_house", "farmhouse", "studio", "co_living"]
+VERIFICATION_LEVELS = ["none", "email", "phone", "cnic"]
+LANGUAGES = ["English", "Urdu", "Punjabi", "Sindhi", "Pashto", "Balochi", "Saraiki"]
+FIRST_NAMES = [
+    "Ahmed", "Fatima", "Usman", "Ayesha", "Ali", "Zainab", "Hassan", "Maryam", "Bilal", "Hira",
+    "Omar", "Sana", "Hamza", "Amna", "Imran", "Nadia", "Faisal", "Sara", "Kamran", "Iqra",
+]
+LAST_NAMES = [
+    "Khan", "Ali", "Hassan", "Malik", "Sheikh", "Qureshi", "Butt", "Chaudhry", "Siddiqui", "Raza",
+    "Baloch", "Shah", "Abbasi", "Mirza", "Javed", "Iqbal",
+]
+MESSAGE_TEXTS = [
+    "Assalam o Alaikum, is the place available for these dates?",
+    "Yes, it is available. Looking forward to hosting you.",
+    "Is there a generator or UPS during load shedding?",
+    "Yes, there is a UPS for lights and fans.",
+    "What time is check-in?",
+    "Check-in is after 2 PM, I will share directions the day before.",
+]
+REVIEW_TEXTS = [
+    "Great stay, very clean and the host was helpful.",
+    "Good location, close to the market. Would stay again.",
+    "Comfortable place, exactly as described.",
+    "Nice view and quiet neighbourhood.",
+]
+
+# Tables in load order; tables in the same wave only reference earlier waves
+WAVES = [
+    ["users"],
+    ["listings"],
+    ["listing_photos", "pricing_rules", "calendars", "bookings"],
+    ["message_threads", "reviews"],
+    ["messages"],
+]
+
+COLUMNS = {
+    "users": [
+        "id", "email", "phone", "password_hash", "name", "roles", "about", "languages",
+        "verification_level", "guest_score", "created_at", "updated_at",
+    ],
+    "listings": [
+        "id", "host_id", "title", "slug", "description", "city", "area", "geog", "type",
+        "max_guests", "bedrooms", "beds", "bathrooms", "amenities", "house_rules",
+        "instant_book", "status", "created_at", "updated_at",
+    ],
+    "listing_photos": ["id", "listing_id", "key", "alt_text", "order", "width", "height", "created_at"],
+    "pricing_rules": [
+        "id", "listing_id", "base_price_pkr", "weekend_price_pkr", "cleaning_fee_pkr",
+        "deposit_pkr", "min_nights", "max_nights", "created_at", "updated_at",
+    ],
+    "calendars": ["id", "listing_id", "date", "is_blocked", "created_at"],
+    "bookings": [
+        "id", "listing_id", "guest_id", "check_in", "check_out", "guests_count", "status",
+        "total_pkr", "currency", "payment_status", "cancellation_policy", "created_at", "updated_at",
+    ],
+    "message_threads": ["id", "listing_id", "guest_id", "host_id", "last_message_at", "created_at"],
+    "messages": ["id", "thread_id", "sender_id", "text", "read_at", "created_at"],
+    "reviews": [
+        "id", "booking_id", "reviewer_id", "reviewee_id", "listing_id", "overall", "cleanliness",
+        "accuracy", "communication", "location", "value", "text", "photos", "status",
+        "created_at", "updated_at",
+    ],
+}
+TABLE_NUMBERS = {table: number for number, table in enumerate(COLUMNS, start=1)}
+
+_MASK64 = (1 << 64) - 1
+
+
+@dataclass
+class ScalePlan:
+    """Sizes and inputs of a scale seed; identical plans produce identical rows"""
+
+    listings: int
+    seed: int
+    start_date: date
+    calendar_days: int
+    password_hash: str
+    cities: List[dict] = field(default_factory=list)
+    amenities: List[str] = field(default_factory=list)
+
+    @property
+    def hosts(self) -> int:
+        return max(self.listings // LISTINGS_PER_HOST, 1)
+
+    @property
+    def users(self) -> int:
+        return max(self.listings * USERS_PER_LISTING, self.hosts + 1)
+
+    def row_counts(self) -> Dict[str, int]:
+        """Number of rows generated per table"""
+        bookings = self.listings * BOOKINGS_PER_LISTING
+        return {
+            "users": self.users,
+            "listings": self.listings,
+            "listing_photos": self.listings * PHOTOS_PER_LISTING,
+            "pricing_rules": self.listings,
+            "calendars": self.listings * self.calendar_days,
+            "bookings": bookings,
+            "message_threads": bookings,
+            "messages": bookings * MESSAGES_PER_THREAD,
+            "reviews": self.listings * PAST_BOOKINGS_PER_LISTING,
+        }
+
+
+def _hash(value: int) -> int:
+    """splitmix64 finalizer, a cheap deterministic hash of an integer"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def row_id(plan: ScalePlan, table: str, number: int) -> uuid.UUID:
+    """Deterministic primary key of a generated row"""
+    return uuid.UUID(int=((plan.seed & 0xFFFFFFFF) << 96) | (TABLE_NUMBERS[table] << 64) | number)
+
+
+def _timestamp(day: date, hour: int = 12) -> datetime:
+    return datetime.combine(day, dt_time(hour % 24))
+
+
+def _base_price(plan: ScalePlan, listing: int) -> int:
+    """Nightly base price of a listing in PKR"""
+    return 3000 + 500 * (_hash(plan.seed * 31 + listing) % 40)
+
+
+def _booking(plan: ScalePlan, number: int) -> Tuple[int, int, int, date, date]:
+    """(listing, slot, guest, check_in, check_out) of a booking
+
+    Past slots start two slots before start_date and are completed.
+    """
+    listing, slot = divmod(number, BOOKINGS_PER_LISTING)
+    h = _hash((plan.seed << 40) ^ number)
+    guest = plan.hosts + h % (plan.users - plan.hosts)
+    slot_start = plan.start_date + timedelta(days=(slot - PAST_BOOKINGS_PER_LISTING) * BOOKING_SLOT_DAYS)
+    check_in = slot_start + timedelta(days=(h >> 20) % 7)
+    check_out = check_in + timedelta(days=1 + (h >> 24) % 6)
+    return listing, slot, guest, check_in, check_out
+
+
+def _host_of(listing: int, plan: ScalePlan) -> int:
+    return listing % plan.hosts
+
+
+def _users(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    for i in range(start, stop):
+        is_host = i < plan.hosts
+        created = _timestamp(plan.start_date - timedelta(days=rng.randrange(30, 1000)), rng.randrange(24))
+        yield (
+            row_id(plan, "users", i),
+            f"user{i}@scale.homlo.pk",
+            f"+92{3_000_000_000 + i}",
+            plan.password_hash,
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            ["host", "guest"] if is_host else ["guest"],
+            "Host on Homlo." if is_host else None,
+            rng.sample(LANGUAGES, rng.randint(1, 3)),
+            rng.choice(VERIFICATION_LEVELS),
+            round(rng.uniform(3.5, 5.0), 1),
+            created,
+            created,
+        )
+
+
+def _listings(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    for i in range(start, stop):
+        city = plan.cities[_hash(plan.seed * 7 + i) % len(plan.cities)]
+        area = rng.choice(city["areas"])
+        kind = rng.choice(LISTING_TYPES)
+        title = f"{kind.replace('_', ' ').title()} in {area}, {city['name']}"
+        bedrooms = rng.randint(1, 5)
+        created = _timestamp(plan.start_date - timedelta(days=rng.randrange(1, 900)), rng.randrange(24))
+        yield (
+            row_id(plan, "listings", i),
+            row_id(plan, "users", _host_of(i, plan)),
+            title,
+            f"{title.lower().replace(',', '').replace(' ', '-')}-{i}",
+            f"{title}. Comfortable stay for up to {bedrooms * 2} guests.",
+            city["name"],
+            area,
+            (city["longitude"] + rng.uniform(-0.05, 0.05), city["latitude"] + rng.uniform(-0.05, 0.05)),
+            kind,
+            bedrooms * 2,
+            bedrooms,
+            bedrooms + rng.randint(0, 2),
+            max(1, bedrooms - rng.randint(0, 1)),
+            rng.sample(plan.amenities, rng.randint(4, 12)),
+            "No smoking, No parties",
+            rng.random() < 0.6,
+            "active",
+            created,
+            created,
+        )
+
+
+def _listing_photos(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    for i in range(start, stop):
+        listing, order = divmod(i, PHOTOS_PER_LISTING)
+        listing_id = row_id(plan, "listings", listing)
+        yield (
+            row_id(plan, "listing_photos", i),
+            listing_id,
+            f"listings/{listing_id}/{order}.jpg",
+            f"Photo {order + 1}",
+            order,
+            1920,
+            rng.choice((1080, 1280, 1440)),
+            _timestamp(plan.start_date),
+        )
+
+
+def _pricing_rules(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    for i in range(start, stop):
+        base = _base_price(plan, i)
+        created = _timestamp(plan.start_date)
+        yield (
+            row_id(plan, "pricing_rules", i),
+            row_id(plan, "listings", i),
+            Decimal(base),
+            Decimal(base + 500 * rng.randint(0, 4)),
+            Decimal(500 * rng.randint(0, 4)),
+            Decimal(1000 * rng.randint(0, 10)),
+            rng.choice((1, 1, 1, 2, 3)),
+            rng.choice((None, 14, 30, 90)),
+            created,
+            created,
+        )
+
+
+def _calendars(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    created = _timestamp(plan.start_date)
+    for i in range(start, stop):
+        listing, day = divmod(i, plan.calendar_days)
+        yield (
+            row_id(plan, "calendars", i),
+            row_id(plan, "listings", listing),
+            plan.start_date + timedelta(days=day),
+            rng.random() < 0.05,
+            created,
+        )
+
+
+def _bookings(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    for i in range(start, stop):
+        listing, slot, guest, check_in, check_out = _booking(plan, i)
+        if slot < PAST_BOOKINGS_PER_LISTING:
+            status, payment_status = "completed", "completed"
+        else:
+            status = rng.choice(("confirmed", "confirmed", "pending", "cancelled"))
+            payment_status = {"confirmed": "completed", "pending": "pending", "cancelled": "refunded"}[status]
+        created = _timestamp(check_in - timedelta(days=BOOKING_SLOT_DAYS))
+        yield (
+            row_id(plan, "bookings", i),
+            row_id(plan, "listings", listing),
+            row_id(plan, "users", guest),
+            check_in,
+            check_out,
+            rng.randint(1, 4),
+            status,
+            Decimal(_base_price(plan, listing) * (check_out - check_in).days),
+            "PKR",
+            payment_status,
+            rng.choice(("flexible", "moderate", "strict")),
+            created,
+            created,
+        )
+
+
+def _message_threads(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    for i in range(start, stop):
+        listing, _, guest, check_in, _ = _booking(plan, i)
+        created = _timestamp(check_in - timedelta(days=BOOKING_SLOT_DAYS))
+        yield (
+            row_id(plan, "message_threads", i),
+            row_id(plan, "listings", listing),
+            row_id(plan, "users", guest),
+            row_id(plan, "users", _host_of(listing, plan)),
+            created + timedelta(hours=MESSAGES_PER_THREAD - 1),
+            created,
+        )
+
+
+def _messages(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    for i in range(start, stop):
+        thread, position = divmod(i, MESSAGES_PER_THREAD)
+        listing, _, guest, check_in, _ = _booking(plan, thread)
+        sender = guest if position % 2 == 0 else _host_of(listing, plan)
+        created = _timestamp(check_in - timedelta(days=BOOKING_SLOT_DAYS), position)
+        yield (
+            row_id(plan, "messages", i),
+            row_id(plan, "message_threads", thread),
+            row_id(plan, "users", sender),
+            MESSAGE_TEXTS[position % len(MESSAGE_TEXTS)],
+            created + timedelta(minutes=rng.randint(1, 59)),
+            created,
+        )
+
+
+def _reviews(plan: ScalePlan, rng: random.Random, start: int, stop: int) -> Iterator[tuple]:
+    for i in range(start, stop):
+        listing, slot = divmod(i, PAST_BOOKINGS_PER_LISTING)
+        booking = listing * BOOKINGS_PER_LISTING + slot
+        _, _, guest, _, check_out = _booking(plan, booking)
+        scores = [rng.choice((3, 4, 4, 5, 5, 5)) for _ in range(6)]
+        created = _timestamp(check_out + timedelta(days=rng.randint(0, 5)))
+        yield (
+            row_id(plan, "reviews", i),
+            row_id(plan, "bookings", booking),
+            row_id(plan, "users", guest),
+            row_id(plan, "users", _host_of(listing, plan)),
+            row_id(plan, "listings", listing),
+            *scores,
+            rng.choice(REVIEW_TEXTS),
+            [],
+            "approved",
+            created,
+            created,
+        )
+
+
+GENERATORS = {
+    "users": _users,
+    "listings": _listings,
+    "listing_photos": _listing_photos,
+    "pricing_rules": _pricing_rules,
+    "calendars": _calendars,
+    "bookings": _bookings,
+    "message_threads": _message_threads,
+    "messages": _messages,
+    "reviews": _reviews,
+}
+
+
+def generate_rows(plan: ScalePlan, table: str, start: int, stop: int) -> Iterator[tuple]:
+    """Rows [start, stop) of a table, in COLUMNS order"""
+    rng = random.Random(f"{plan.seed}:{table}:{start}")
+    return GENERATORS[table](plan, rng, start, stop)
+
+
+def encode_point(point: Tuple[float, float]) -> bytes:
+    """Encode (longitude, latitude) as EWKB for binary COPY into a geography column"""
+    longitude, latitude = point
+    return struct.pack("<BIIdd", 1, 0x20000001, 4326, longitude, latitude)
+
+
+async def _copy_part(dsn: str, plan: ScalePlan, table: str, start: int, stop: int, progress) -> int:
+    """COPY one part of a table over a dedicated connection"""
+    conn = await asyncpg.connect(dsn)
+    try:
+        if table == "listings":
+            await conn.set_type_codec(
+                "geography", schema="public", encoder=encode_point, decoder=bytes, format="binary"
+            )
+
+        def records():
+            for count, row in enumerate(generate_rows(plan, table, start, stop), start=1):
+                if count % PROGRESS_EVERY == 0:
+                    progress[(table, start)] = count
+                yield row
+
+        await conn.copy_records_to_table(table, records=records(), columns=COLUMNS[table])
+        progress[(table, start)] = stop - start
+        return stop - start
+    finally:
+        await conn.close()
+
+
+def copy_part(dsn: str, plan: ScalePlan, table: str, start: int, stop: int, progress) -> int:
+    """Process pool entry point for _copy_part"""
+    return asyncio.run(_copy_part(dsn, plan, table, start, stop, progress))
+
+
+def _report(counts: Dict[str, int], progress, started: Dict[str, float], tables: List[str]) -> None:
+    """Print one progress line per table of the current wave"""
+    done = {table: 0 for table in tables}
+    for (table, _), rows in progress.items():
+        if table in done:
+            done[table] += rows
+    for table in tables:
+        elapsed = max(time.perf_counter() - started[table], 1e-9)
+        print(
+            f"   {table:<16} {done[table]:>13,}/{counts[table]:,} rows "
+            f"({done[table] / elapsed:,.0f} rows/s)"
+        )
+
+
+async def truncate_tables(dsn: str) -> None:
+    """Empty every table the scale seed writes to"""
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(f"TRUNCATE {', '.join(COLUMNS)} CASCADE")
+    finally:
+        await conn.close()
+
+
+async def analyze_tables(dsn: str) -> None:
+    """Refresh planner statistics after the load"""
+    conn = await asyncpg.connect(dsn)
+    try:
+        for table in COLUMNS:
+            await conn.execute(f"ANALYZE {table}")
+    finally:
+        await conn.close()
+
+
+async def load_scale_data(dsn: str, plan: ScalePlan, jobs: int, report_every: float = 2.0) -> Dict[str, float]:
+    """Load every table wave by wave, parts of the same wave in parallel
+
+    Returns the rows/sec achieved per table.
+    """
+    counts = plan.row_counts()
+    loop = asyncio.get_running_loop()
+    rates: Dict[str, float] = {}
+
+    with Manager() as manager, ProcessPoolExecutor(max_workers=jobs) as pool:
+        progress = manager.dict()
+        for wave in WAVES:
+            started = {table: time.perf_counter() for table in wave}
+            finished: Dict[str, float] = {}
+            parts: Dict[str, List[asyncio.Future]] = {table: [] for table in wave}
+
+            def mark_finished(table: str) -> None:
+                if all(future.done() for future in parts[table]):
+                    finished.setdefault(table, time.perf_counter())
+
+            for table in wave:
+                for start in range(0, counts[table], PART_ROWS):
+                    stop = min(start + PART_ROWS, counts[table])
+                    future = loop.run_in_executor(pool, copy_part, dsn, plan, table, start, stop, progress)
+                    future.add_done_callback(lambda _, table=table: mark_finished(table))
+                    parts[table].append(future)
+                if not parts[table]:
+                    finished[table] = started[table]
+
+            pending = {future for futures in parts.values() for future in futures}
+            while pending:
+                _, pending = await asyncio.wait(pending, timeout=report_every)
+                if pending:
+                    _report(counts, progress, started, [table for table in wave if table not in finished])
+
+            for table in wave:
+                for future in parts[table]:
+                    future.result()
+                elapsed = max(finished[table] - started[table], 1e-9)
+                rates[table] = counts[table] / elapsed
+                print(f"   ✔ {table:<16} {counts[table]:>13,} rows in {elapsed:7.1f}s ({rates[table]:,.0f} rows/s)")
+
+    return rates